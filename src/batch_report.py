@@ -0,0 +1,219 @@
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import glob
+import html
+import json
+import os
+import traceback
+from data_reader import DataReader
+from make_stats import MakeStats
+from figure_renderer import FigureRenderer
+import report_pipeline
+from report_pipeline import get_account_names
+
+
+def find_files(inputs: list[str]) -> list[str]:
+    """Returns csv files from directories, glob patterns and paths
+
+    Args:
+        inputs (list[str]): directories, glob patterns or paths of csv files
+
+    Returns:
+        list[str]: sorted paths of csv files without duplicates
+    """
+
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.update(glob.glob(os.path.join(item, "*.csv")))
+        else:
+            paths.update(path for path in glob.glob(item) if os.path.isfile(path))
+
+    return sorted(paths)
+
+
+def write_html(output_dir: str, account: str, stats: dict, charts: list[str]) -> None:
+    """Writes a static html report of one account
+
+    Args:
+        output_dir (str): directory of the account
+        account (str): name of the account
+        stats (dict): all statistics shown in the report
+        charts (list[str]): names of saved charts
+    """
+
+    tables = {
+        "Stats - Net profit" : stats["profit_stats"].to_html(index=False),
+        "Stats - Week net profit" : stats["week_data"].to_html(),
+        "Stats - Drawdown" : stats["drawdown_stats"].to_html(index=False),
+        "Stats - Duration [minute]" : stats["duration_time"].to_html(index=False)
+    }
+
+    body = [f"<h1>Trading report - {html.escape(account)}</h1>"]
+    body += [f"<h3>{title}</h3>{table}" for title, table in tables.items()]
+    body += [f'<img src="charts/{chart}.png" alt="{chart}" style="max-width: 48%;">' for chart in charts]
+
+    with open(os.path.join(output_dir, "report.html"), "w", encoding="utf-8") as file:
+        file.write("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"></head><body>\n"
+                   + "\n".join(body) + "\n</body></html>\n")
+
+
+def process_file(path: str, account: str, output_dir: str, header: dict,
+                 date_format: str|None, balance: float, charts: bool = True) -> dict:
+    """Generates the report of one account export (errors are returned, not raised)
+
+    Args:
+        path (str): path of the csv file
+        account (str): name of the account
+        output_dir (str): main output directory
+        header (dict): user column names mapped to system column names
+        date_format (str | None): date format of 'Open time' and 'Close time' columns (None detects it)
+        balance (float): starting value of account
+        charts (bool, optional): save png charts and html report. Defaults to True.
+
+    Returns:
+        dict: row of the summary index
+    """
+
+    account_dir = os.path.join(output_dir, account)
+    try:
+        data_reader = DataReader()
+        df_data = data_reader.load_file_chunked(path, header, date_format)
+        df_data = data_reader.format_data_frame(df_data, date_format, balance)
+        summary = MakeStats().get_report_summary(df_data)
+        stats = report_pipeline.get_stats(summary)
+
+        os.makedirs(account_dir, exist_ok=True)
+        with open(os.path.join(account_dir, "summary.json"), "w", encoding="utf-8") as file:
+            json.dump(summary.to_dict(), file, indent=4)
+
+        pd.concat([stats["profit_stats"].add_prefix("Profit "),
+                   stats["duration_time"].add_prefix("Duration "),
+                   stats["drawdown_stats"]], axis=1).to_csv(os.path.join(account_dir, "stats.csv"), index=False)
+        stats["week_data"].to_csv(os.path.join(account_dir, "week_stats.csv"), index_label="Week day")
+
+        if charts:
+            # Charts are rendered in this process, files are already spread over the pool
+            images = FigureRenderer(max_workers=1).render(report_pipeline.get_chart_jobs(df_data, stats))
+            os.makedirs(os.path.join(account_dir, "charts"), exist_ok=True)
+            for name, image in images.items():
+                with open(os.path.join(account_dir, "charts", f"{name}.png"), "wb") as file:
+                    file.write(image)
+            write_html(account_dir, account, stats, list(images))
+
+        win_rate, loss_rate = stats["win_rate"]
+        return {
+            "Account" : account,
+            "File" : path,
+            "Status" : "ok",
+            "Transations" : summary.transations_number,
+            "Net profit" : round(summary.profit_sum, 2),
+            "Final balance" : round(balance + summary.profit_sum, 2),
+            "Win rate" : win_rate,
+            "Loss rate" : loss_rate,
+            "Max drawdown" : round(summary.max_drawdown, 2),
+            "Max drawdown %" : round(summary.max_drawdown_pct, 2),
+            "Malformed rows" : len(df_data.attrs.get("malformed_rows", [])),
+            "Error" : ""
+        }
+
+    except Exception as e:
+        return {
+            "Account" : account,
+            "File" : path,
+            "Status" : "error",
+            "Error" : f"{type(e).__name__}: {e}",
+            "Traceback" : traceback.format_exc()
+        }
+
+
+def run_batch(paths: list[str], output_dir: str, header: dict, date_format: str|None,
+              balance: float, workers: int|None = None, charts: bool = True) -> pd.DataFrame:
+    """Generates reports of many account exports in a pool of processes
+
+    Args:
+        paths (list[str]): paths of csv files
+        output_dir (str): main output directory
+        header (dict): user column names mapped to system column names
+        date_format (str): date format of 'Open time' and 'Close time' columns
+        balance (float): starting value of every account
+        workers (int | None, optional): number of processes. Defaults to number of CPU cores.
+        charts (bool, optional): save png charts and html report. Defaults to True.
+
+    Returns:
+        pd.DataFrame: summary index of all accounts
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    accounts = get_account_names(paths)
+    rows = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_file, path, account, output_dir, header,
+                                   date_format, balance, charts): (path, account)
+                   for path, account in accounts.items()}
+
+        for future in as_completed(futures):
+            path, account = futures[future]
+            try:
+                row = future.result()
+            except Exception as e:
+                # e.g. killed worker process - only this file fails
+                row = {"Account" : account, "File" : path, "Status" : "error",
+                       "Error" : f"{type(e).__name__}: {e}"}
+
+            print(f"[{row['Status']}] {account} {row['Error']}".rstrip(), flush=True)
+            rows.append(row)
+
+    df_index = pd.DataFrame(rows)
+    if df_index.shape[0]:
+        df_index = df_index.sort_values(by="Account").reset_index(drop=True)
+    if "Transations" in df_index:
+        df_index["Transations"] = df_index["Transations"].astype("Int64")
+
+    with open(os.path.join(output_dir, "index.json"), "w", encoding="utf-8") as file:
+        json.dump(df_index.to_dict(orient="records"), file, indent=4, default=str)
+    df_index.drop(columns=["Traceback"], errors="ignore").to_csv(os.path.join(output_dir, "index.csv"), index=False)
+
+    return df_index
+
+
+def main() -> None:
+    """Command line entry point"""
+
+    parser = argparse.ArgumentParser(description="Generate trading reports for many xStation5 csv exports")
+    parser.add_argument("inputs", nargs="+", help="directories, glob patterns or paths of csv files")
+    parser.add_argument("-o", "--output", default="reports", help="output directory (default: reports)")
+    parser.add_argument("-c", "--config", help="json file with 'header', 'date_format' and 'balance'")
+    parser.add_argument("--date-format", help="date format of 'Open time' and 'Close time' columns (default: auto detect)")
+    parser.add_argument("--balance", type=float, help="starting value of every account")
+    parser.add_argument("--header", action="append", default=[], metavar="USER=SYSTEM",
+                        help="rename user column to system column (can be repeated)")
+    parser.add_argument("--workers", type=int, help="number of processes (default: number of CPU cores)")
+    parser.add_argument("--no-charts", action="store_true", help="save only json and csv statistics")
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as file:
+            config = json.load(file)
+
+    header = dict(config.get("header", {}))
+    header.update(dict(item.split("=", 1) for item in args.header))
+    date_format = args.date_format or config.get("date_format")
+    balance = args.balance if args.balance is not None else float(config.get("balance", 0.0))
+
+    paths = find_files(args.inputs)
+    if not paths:
+        parser.error("no csv files found")
+
+    df_index = run_batch(paths, args.output, header, date_format, balance, args.workers, not args.no_charts)
+    failed = int((df_index["Status"] != "ok").sum())
+    print(f"{len(paths) - failed}/{len(paths)} reports saved to {args.output}")
+
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+import pandas as pd
+import numpy as np
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from data_reader import DataReader
+from make_stats import MakeStats
+from figure_renderer import render_figure
+import report_pipeline
+
+
+# Date format of the generated exports (same as xStation5)
+DATE_FORMAT = "%d.%m.%Y %H:%M:%S"
+
+# Rows generated and written at once
+GENERATOR_CHUNK = 1_000_000
+
+SYMBOLS = ["EURUSD", "US500", "DE30", "GOLD", "OIL.WTI", "GBPUSD", "USDJPY",
+           "US100", "BITCOIN", "EURPLN", "W20", "SILVER", "NATGAS", "AAPL.US"]
+TYPES = ["BUY", "SELL", "BUY LIMIT", "SELL LIMIT", "BUY STOP", "SELL STOP"]
+LOTS = [0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0]
+
+# Allowed ratio of current to baseline results of every stage (patterns of stage names, the first match wins)
+DEFAULT_THRESHOLD = 1.25
+STAGE_THRESHOLDS = {
+    "figure_*" : 1.5, # rendering of charts is the noisiest stage
+    "simulate_monte_carlo_*" : 1.5
+}
+
+
+def generate_export(rows: int, path: str, seed: int = 0) -> str:
+    """Writes a deterministic csv file in the xStation5 format
+
+    Args:
+        rows (int): number of transactions
+        path (str): path of the csv file
+        seed (int, optional): seed of the random generator. Defaults to 0.
+
+    Returns:
+        str: path of the csv file
+    """
+
+    rng = np.random.default_rng(seed)
+
+    # Popularity of symbols and types is skewed like in real accounts
+    symbol_weights = 1 / np.arange(1, len(SYMBOLS) + 1)
+    symbol_weights /= symbol_weights.sum()
+    type_weights = np.array([0.45, 0.4, 0.05, 0.05, 0.03, 0.02])
+
+    start = pd.Timestamp("2015-01-01").value
+    step = 15 * 60 * 10**9 # average 15 minutes between transactions
+
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        for chunk_start in range(0, rows, GENERATOR_CHUNK):
+            size = min(GENERATOR_CHUNK, rows - chunk_start)
+
+            open_time = start + (chunk_start + np.arange(size)) * step + rng.integers(0, step, size)
+            duration = (rng.lognormal(mean=4.0, sigma=1.8, size=size) * 60 * 10**9).astype(np.int64)
+            open_price = np.round(rng.uniform(1, 5000, size), 5)
+
+            # Many small wins and fewer large losses (skewed t distribution)
+            profit = np.round(rng.standard_t(3, size) * 25 + rng.normal(2, 5, size), 2)
+            rollover = np.round(np.where(rng.random(size) < 0.1, -rng.exponential(1.5, size), 0), 2)
+
+            df_chunk = pd.DataFrame({
+                "Symbol" : rng.choice(SYMBOLS, size, p=symbol_weights),
+                "Position" : chunk_start + np.arange(size) + 100_000_000,
+                "Type" : rng.choice(TYPES, size, p=type_weights),
+                "Lots" : rng.choice(LOTS, size),
+                "Open time" : pd.to_datetime(open_time).strftime(DATE_FORMAT),
+                "Open price" : open_price,
+                "Close time" : pd.to_datetime(open_time + duration).strftime(DATE_FORMAT),
+                "Close price" : np.round(open_price * (1 + rng.normal(0, 0.01, size)), 5),
+                "Profit" : profit,
+                "Net profit" : np.round(profit + rollover, 2),
+                "Rollover" : rollover,
+                "Comment" : ""
+            })
+            df_chunk.to_csv(file, sep=";", index=False, header=chunk_start == 0)
+
+    return path
+
+
+def measure(function, memory: bool = True) -> tuple[object, dict]:
+    """Runs a function and measures its wall time, CPU time and peak allocation
+
+    Time is measured on a run without tracemalloc (tracing slows down python code many times),
+    peak allocation on a second traced run.
+
+    Args:
+        function: measured function without arguments
+        memory (bool, optional): measure peak allocation. Defaults to True.
+
+    Returns:
+        tuple[object, dict]: result of the function and measurements
+    """
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    result = function()
+    wall_time, cpu_time = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    measurements = {"seconds" : round(wall_time, 6), "cpu_seconds" : round(cpu_time, 6), "peak_mb" : None}
+
+    if memory:
+        tracemalloc.start()
+        try:
+            function()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        measurements["peak_mb"] = round(peak / 1024**2, 3)
+
+    return result, measurements
+
+
+def run_benchmark(rows: int, work_dir: str, figures: bool = True, memory: bool = True,
+                  seed: int = 0) -> dict[str, dict]:
+    """Measures every stage of the report pipeline on a generated export
+
+    Args:
+        rows (int): number of transactions
+        work_dir (str): directory of the generated csv file
+        figures (bool, optional): measure rendering of charts. Defaults to True.
+        memory (bool, optional): measure peak allocation. Defaults to True.
+        seed (int, optional): seed of the generator. Defaults to 0.
+
+    Returns:
+        dict[str, dict]: name of stage mapped to measurements
+    """
+
+    path = os.path.join(work_dir, f"export_{rows}_{seed}.csv")
+    if not os.path.exists(path):
+        generate_export(rows, path, seed)
+
+    data_reader = DataReader()
+    make_stats = MakeStats()
+    results = {}
+
+    df_loaded, results["load_file_chunked"] = measure(lambda: data_reader.load_file_chunked(path, {}, DATE_FORMAT), memory)
+    # Formatting edits the data frame in place, every run gets its own copy
+    df_data, results["format_data_frame"] = measure(lambda: data_reader.format_data_frame(df_loaded.copy(), DATE_FORMAT, 1000.0), memory)
+
+    summary, results["get_report_summary"] = measure(lambda: make_stats.get_report_summary(df_data), memory)
+    _, results["get_aggregate_cube"] = measure(lambda: make_stats.get_aggregate_cube(df_data), memory)
+    # Views of the summary are measured without the aggregation pass (it is shared by all of them)
+    for method in ["get_profit_stats", "score_by_week_day", "get_win_rate", "get_transtions_duration",
+                   "get_unique_operation_types", "get_drawdown_stats", "get_assets", "get_operations_type",
+                   "get_lot_amount"]:
+        _, results[method] = measure(lambda: getattr(make_stats, method)(df_data, summary), memory)
+
+    _, results["get_rolling_stats"] = measure(lambda: make_stats.get_rolling_stats(df_data), memory)
+
+    net_profit = df_data["Net profit"].to_numpy()
+    _, results["simulate_monte_carlo_1000"] = measure(lambda: make_stats.simulate_monte_carlo(net_profit, 1000.0, 1000), memory)
+
+    if figures:
+        stats = report_pipeline.get_stats(make_stats.get_report_summary(df_data))
+        for name, (method, args, kwargs) in report_pipeline.get_chart_jobs(df_data, stats).items():
+            _, results[f"figure_{name}"] = measure(lambda: render_figure(method, args, kwargs), memory)
+
+    for result in results.values():
+        result["rows"] = rows
+
+    return results
+
+
+def parse_thresholds(values: list[str]) -> tuple[float, dict[str, float]]:
+    """Parses thresholds of the command line
+
+    Args:
+        values (list[str]): default ratio (e.g. "1.25") or ratios of stages (e.g. "load_file_chunked=1.1",
+            "figure_*=2")
+
+    Raises:
+        argparse.ArgumentTypeError: when a ratio is not a number
+
+    Returns:
+        tuple[float, dict[str, float]]: default ratio and patterns of stage names mapped to ratios
+    """
+
+    threshold = DEFAULT_THRESHOLD
+    stage_thresholds = {}
+    for value in values:
+        stage, _, ratio = value.rpartition("=")
+        try:
+            ratio = float(ratio)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Threshold is not a number: {value}")
+        if stage:
+            stage_thresholds[stage] = ratio
+        else:
+            threshold = ratio
+
+    # Thresholds of the command line are checked before the default ones
+    return threshold, stage_thresholds | {stage: ratio for stage, ratio in STAGE_THRESHOLDS.items()
+                                          if stage not in stage_thresholds}
+
+
+def get_threshold(stage: str, threshold: float, stage_thresholds: dict[str, float]) -> float:
+    """Returns the allowed ratio of the stage
+
+    Args:
+        stage (str): name of the stage
+        threshold (float): ratio of stages without their own threshold
+        stage_thresholds (dict[str, float]): patterns of stage names mapped to ratios
+
+    Returns:
+        float: allowed ratio of current to baseline time and memory
+    """
+
+    for pattern, ratio in stage_thresholds.items():
+        if fnmatch.fnmatchcase(stage, pattern):
+            return ratio
+
+    return threshold
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float, min_seconds: float,
+                     stage_thresholds: dict[str, float] | None = None) -> list[str]:
+    """Compares results with the baseline
+
+    Args:
+        results (dict): current results (rows mapped to stages)
+        baseline (dict): stored results in the same layout
+        threshold (float): allowed ratio of current to baseline time and memory
+        min_seconds (float): times below this value are treated as noise
+        stage_thresholds (dict[str, float] | None, optional): patterns of stage names mapped to their own
+            ratios. Defaults to None.
+
+    Returns:
+        list[str]: descriptions of regressions
+    """
+
+    regressions = []
+    for rows, stages in results.items():
+        for stage, current in stages.items():
+            previous = baseline.get(rows, {}).get(stage)
+            if previous is None:
+                continue
+
+            threshold_stage = get_threshold(stage, threshold, stage_thresholds or {})
+            if current["seconds"] > min_seconds and current["seconds"] > previous["seconds"] * threshold_stage:
+                regressions.append(f"{stage} ({rows} rows): {previous['seconds']:.4f}s -> {current['seconds']:.4f}s")
+            if current["peak_mb"] and previous["peak_mb"] and current["peak_mb"] > 1 \
+                    and current["peak_mb"] > previous["peak_mb"] * threshold_stage:
+                regressions.append(f"{stage} ({rows} rows): {previous['peak_mb']:.1f}MB -> {current['peak_mb']:.1f}MB")
+
+    return regressions
+
+
+def main() -> None:
+    """Command line entry point"""
+
+    parser = argparse.ArgumentParser(description="Benchmark of the report pipeline on generated xStation5 exports")
+    parser.add_argument("--rows", type=float, nargs="+", default=[1e3, 1e4, 1e5],
+                        help="sizes of generated exports (default: 1e3 1e4 1e5)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generator")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "stock_report_benchmark"),
+                        help="directory of generated csv files (kept between runs)")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="json file with results")
+    parser.add_argument("--baseline", help="json file with results to compare with")
+    parser.add_argument("--threshold", nargs="+", default=[],
+                        help=f"allowed slowdown ratio (default: {DEFAULT_THRESHOLD}) and ratios of stages "
+                             f"as STAGE=RATIO, names can be patterns (default: "
+                             f"{' '.join(f'{stage}={ratio}' for stage, ratio in STAGE_THRESHOLDS.items())})")
+    parser.add_argument("--min-seconds", type=float, default=0.01, help="ignore faster stages (default: 0.01)")
+    parser.add_argument("--no-figures", action="store_true", help="skip rendering of charts")
+    parser.add_argument("--no-memory", action="store_true", help="skip measuring of peak allocation")
+    args = parser.parse_args()
+    try:
+        threshold, stage_thresholds = parse_thresholds(args.threshold)
+    except argparse.ArgumentTypeError as error:
+        parser.error(str(error))
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    results = {}
+    for rows in sorted(int(rows) for rows in args.rows):
+        results[str(rows)] = run_benchmark(rows, args.work_dir, not args.no_figures,
+                                           not args.no_memory, args.seed)
+        for stage, result in results[str(rows)].items():
+            peak = "" if result["peak_mb"] is None else f"{result['peak_mb']:>10.1f}MB"
+            print(f"{rows:>10} {stage:<30} {result['seconds']:>10.4f}s {peak}", flush=True)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump({"python" : platform.python_version(), "pandas" : pd.__version__,
+                   "numpy" : np.__version__, "results" : results}, file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+
+        regressions = find_regressions(results, baseline, threshold, args.min_seconds, stage_thresholds)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,145 @@
 import pandas as pd
-from dataclasses import dataclass
+import numpy as np
+from dataclasses import dataclass, field
+from date_parser import DateParser
+
+
+# Columns used by the report with their types in the csv file
+REPORT_COLUMNS = {
+    "Position" : "Int64",
+    "Symbol" : "object",
+    "Type" : "object",
+    "Lots" : "float64",
+    "Open time" : "object",
+    "Close time" : "object",
+    "Net profit" : "float64"
+}
+
+# Columns which can be missing in the file or have empty values (used only in append mode)
+OPTIONAL_COLUMNS = ["Position"]
+
+# Keys of a transaction when positions are not known
+TRANSACTION_KEYS = ["Open time", "Close time", "Symbol"]
+
+# Types changed in compact mode (text columns with few unique values are coded)
+COMPACT_COLUMNS = {
+    "Symbol" : "category",
+    "Type" : "category"
+}
+
+# Number of csv rows read at once in chunked mode
+CHUNK_SIZE = 250_000
+
+# Days of the week in order of datetime.weekday()
+WEEK_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", 
+             "Friday", "Saturday", "Sunday"]
+
+# Result of the transaction (code 0 - profit, 1 - loss)
+SCORES = ["Profit", "Minus"]
+
+# Columns with dates of the transaction
+DATE_COLUMNS = ["Close time", "Open time"]
 
 
 @dataclass
 class DataReader():
+    date_parser: DateParser = field(default_factory=DateParser, repr=False)
+
+    def load_file_chunked(self, uploaded_file, new_header: dict, date_format: str|None,
+                          chunk_size: int = CHUNK_SIZE, compact: bool = False) -> pd.DataFrame:
+        """Function to load only the report columns of a large csv file in chunks
+
+        Args:
+            uploaded_file: csv file with data
+            new_header (dict): user column names mapped to system column names
+            date_format (str | None): date format of 'Open time' and 'Close time' columns
+                (None detects it from the first chunk)
+            chunk_size (int, optional): number of rows read at once. Defaults to CHUNK_SIZE.
+            compact (bool, optional): categorical 'Symbol', 'Type' and 'Lots'. Defaults to False.
 
-    def load_file(self, uploaded_file) -> pd.DataFrame:
-        """Function to load csv to DataFrame
+        Returns:
+            pd.DataFrame: loaded columns with system names, parsed dates and sorted by close time
+                (rows with malformed dates are dropped, their file row numbers are kept
+                in attrs["malformed_rows"])
+        """
+        
+        # Names of the report columns in the user file
+        user_header = {system: user for user, system in new_header.items()}
+        file_columns = {user_header.get(column, column): column for column in REPORT_COLUMNS}
+        column_types = REPORT_COLUMNS | COMPACT_COLUMNS if compact else REPORT_COLUMNS
+        
+        # Optional columns missing in the file are skipped by usecols and added empty to every chunk
+        chunks = pd.read_csv(uploaded_file, sep=";", decimal=".", engine="c",
+                             usecols=lambda column: column in file_columns,
+                             dtype={user: column_types[system] for user, system in file_columns.items()},
+                             chunksize=chunk_size)
+        
+        # Only the parsed chunk is kept in memory, raw text is dropped after each step
+        df_chunks = []
+        malformed_rows = []
+        for df_chunk in chunks:
+            # Renaming of the axis does not copy the data
+            df_chunk.columns = [file_columns[column] for column in df_chunk.columns]
+            missing = [column for column in REPORT_COLUMNS if column not in df_chunk.columns]
+            if set(missing) - set(OPTIONAL_COLUMNS):
+                raise ValueError(f"Missing columns in the file: {', '.join(missing)}")
+            for column in missing:
+                df_chunk[column] = pd.Series(pd.NA, index=df_chunk.index, dtype=column_types[column])
+            
+            # Format detected in the first chunk is used for the rest of the file
+            date_format, malformed = self.date_parser.parse_columns(df_chunk, DATE_COLUMNS, date_format)
+            if malformed.any():
+                malformed_rows.extend(df_chunk.index[malformed].tolist())
+                df_chunk = df_chunk[~malformed].copy()
+            if compact:
+                df_chunk["Lots"] = df_chunk["Lots"].astype("category")
+            # Sorting of a chunk copies only the chunk (exports are often already in order of closing)
+            if not df_chunk["Close time"].is_monotonic_increasing:
+                df_chunk.sort_values(by="Close time", kind="stable", inplace=True)
+            df_chunks.append(df_chunk)
+            
+        if not df_chunks:
+            return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in column_types.items()})
+        
+        df = self.concat_frames(df_chunks)
+        del df_chunks
+        
+        # Overlapping chunks are merged - stable sort of sorted runs, then one column is copied at a time
+        if not df["Close time"].is_monotonic_increasing:
+            order = np.argsort(df["Close time"].to_numpy(), kind="stable")
+            for column in df.columns:
+                df[column] = df[column].array.take(order)
+        
+        # Index of chunks continues between chunks, so it is a row number of the file
+        df.attrs["date_format"] = date_format
+        df.attrs["malformed_rows"] = malformed_rows
+        
+        return df
+    
+    
+    def concat_frames(self, frames: list[pd.DataFrame]) -> pd.DataFrame:
+        """Function joins data frames and keeps categorical columns categorical
 
         Args:
-            uploaded_file: csv file with data 
+            frames (list[pd.DataFrame]): data frames with the same columns
 
         Returns:
-            pd.DataFrame: loaded csv file to DataFrame
+            pd.DataFrame: joined data frame with a new index
         """
         
-        return pd.read_csv(uploaded_file, sep=";", decimal=".") \
-                .sort_values(by="Close time") \
-                .reset_index(drop=True)
+        # Different categories in frames would turn the joined column into objects
+        categorical = [column for column in frames[0].columns
+                       if isinstance(frames[0][column].dtype, pd.CategoricalDtype)]
+        if categorical and len(frames) > 1:
+            categories = {column: pd.api.types.union_categoricals([frame[column] for frame in frames]).categories
+                          for column in categorical}
+            # Frames can be shared (e.g. cached stages), recoded columns are set on shallow copies only
+            frames = [frame.copy(deep=False) for frame in frames]
+            for frame in frames:
+                for column in categorical:
+                    frame[column] = frame[column].cat.set_categories(categories[column])
+        
+        return pd.concat(frames, ignore_index=True)
                                     
         
     def rename_header(self, df: pd.DataFrame, new_header: dict) -> pd.DataFrame:
@@ -31,50 +153,230 @@ class DataReader():
             pd.DataFrame: data frame with new header name
         """
         
-        return df.rename(columns=new_header)
+        # Only the axis is changed, columns are not copied
+        return df.rename(columns=new_header, copy=False)
     
     
-    def format_data_frame(self, df: pd.DataFrame, date_format: str|None, balance: float) -> pd.DataFrame:
+    def format_data_frame(self, df: pd.DataFrame, date_format: str|None, balance: float,
+                          peak: float|None = None, drawdown_length: int = 0,
+                          compact: bool = False) -> pd.DataFrame:
         """Function adjusts all the most important elements of the data frame
 
         Args:
             df (pd.DataFrame): data frame to edit
-            date_format (str): date format to set new format
+            date_format (str | None): date format of text dates (None detects it from a sample)
             balance (float): starting value of account
+            peak (float | None, optional): running peak before the first transaction. Defaults to balance.
+            drawdown_length (int, optional): drawdown length before the first transaction. Defaults to 0.
+            compact (bool, optional): categorical 'Week day' and 'Score', narrow types of
+                derived columns. Defaults to False.
 
         Returns:
-            pd.DataFrame: final version of the data frame
+            pd.DataFrame: final version of the data frame (rows with malformed dates are dropped)
         """
 
-        # Formating date to selected format
-        df["Close time"] = pd.to_datetime(df["Close time"], format=date_format)
-        df["Open time"]  = pd.to_datetime(df["Open time"],  format=date_format)
-        
-        day = {
-            0 : "Monday",
-            1 : "Tuesday",
-            2 : "Wednesday",
-            3 : "Thursday",
-            4 : "Friday",
-            5 : "Saturday",
-            6 : "Sunday"
-        }
+        # Formating date to selected format (already parsed columns are skipped)
+        date_format, malformed = self.date_parser.parse_columns(df, DATE_COLUMNS, date_format)
+        if malformed.any():
+            malformed_rows = df.attrs.get("malformed_rows", []) + df.index[malformed].tolist()
+            df = df[~malformed].reset_index(drop=True)
+            df.attrs["malformed_rows"] = malformed_rows
+        
         # Get day of the week
-        df["Week day"] = df["Close time"].dt.date.map(lambda x: x.weekday()).map(day)
+        week_day = df["Close time"].dt.weekday.to_numpy()
+        if compact:
+            df["Week day"] = pd.Categorical.from_codes(week_day, categories=WEEK_DAYS, ordered=True)
+        else:
+            df["Week day"] = np.array(WEEK_DAYS, dtype=object)[week_day]
         
-        # Set balance of account after closed transaction
-        df["Balance"] = balance
-        df.loc[0, "Balance"] = df["Balance"][0] + df["Net profit"][0]
-
-        for i in range(1, df.shape[0]):
-            df.loc[i, "Balance"] = df["Balance"][i-1] + df["Net profit"][i]
+        # Set balance of account after closed transaction with drawdown from the running peak
+        self.set_equity_curve(df, balance, peak, drawdown_length, compact)
             
         # Calcutalte of session time in minutes
         df["Deltatime"] = (df["Close time"] - df["Open time"])
         df["Deltatime"] = df["Deltatime"].dt.total_seconds()/60 # minute
         
         # Check if transaction was succes or fail
-        df["Score"] = df["Net profit"].map(lambda x: "Minus" if x < 0 else "Profit")
+        score = (df["Net profit"].to_numpy() < 0).astype(np.int8)
+        if compact:
+            df["Score"] = pd.Categorical.from_codes(score, categories=SCORES)
+        else:
+            df["Score"] = np.array(SCORES, dtype=object)[score]
+        
+        # Precision of derived columns is enough with narrow types (money columns stay float64)
+        if compact:
+            df["Deltatime"] = df["Deltatime"].astype(np.float32)
+            for column in ["Symbol", "Type", "Lots"]:
+                if not isinstance(df[column].dtype, pd.CategoricalDtype):
+                    df[column] = df[column].astype("category")
+        
+        return df
+    
+    
+    def set_equity_curve(self, df: pd.DataFrame, balance: float, peak: float|None = None,
+                         drawdown_length: int = 0, compact: bool = False) -> None:
+        """Function sets the equity curve columns of the data frame in place (other columns are not touched)
+
+        Args:
+            df (pd.DataFrame): data frame with 'Net profit' column in order of closing
+            balance (float): starting value of account
+            peak (float | None, optional): running peak before the first transaction. Defaults to balance.
+            drawdown_length (int, optional): drawdown length before the first transaction. Defaults to 0.
+            compact (bool, optional): narrow types of drawdown columns. Defaults to False.
+        """
+        
+        equity_curve = self.get_equity_curve(df["Net profit"].to_numpy(dtype=np.float64), balance,
+                                             peak, drawdown_length)
+        if compact:
+            equity_curve["Drawdown %"] = equity_curve["Drawdown %"].astype(np.float32)
+            equity_curve["Drawdown length"] = equity_curve["Drawdown length"].astype(np.int32)
+        
+        # Whole columns are replaced, so a shallow copy does not change the frame it was made from
+        for column, values in equity_curve.items():
+            df[column] = values
+    
+    
+    def get_equity_curve(self, net_profit: np.ndarray, balance: float,
+                         peak: float|None = None, drawdown_length: int = 0) -> dict[str, np.ndarray]:
+        """Function calculates the equity curve of the account in one cumulative pass
+
+        Args:
+            net_profit (np.ndarray): net profit of every closed transaction in order of closing
+            balance (float): starting value of account
+            peak (float | None, optional): running peak before the first transaction. Defaults to balance.
+            drawdown_length (int, optional): drawdown length before the first transaction. Defaults to 0.
+
+        Returns:
+            dict[str, np.ndarray]: columns "Balance", "Peak", "Drawdown", "Drawdown %" and
+                "Drawdown length" (number of transactions since the last peak)
+        """
+        
+        balance_values = balance + np.cumsum(net_profit)
+        
+        # Running peak also includes the starting balance (or the peak of the previous history)
+        start_peak = balance if peak is None else max(peak, balance)
+        peak = np.maximum(np.maximum.accumulate(balance_values), start_peak)
+        drawdown = balance_values - peak
+        drawdown_pct = np.divide(drawdown, peak, out=np.zeros_like(drawdown), where=peak > 0) * 100
+        
+        # Index of the last transaction which set a new peak (negative means a peak before this data)
+        positions = np.arange(balance_values.size)
+        last_peak = np.maximum.accumulate(np.where(drawdown >= 0, positions, -1 - drawdown_length))
+        drawdown_length = positions - last_peak
+        
+        return {
+            "Balance" : balance_values,
+            "Peak" : peak,
+            "Drawdown" : drawdown,
+            "Drawdown %" : drawdown_pct,
+            "Drawdown length" : drawdown_length
+        }
+    
+    
+    def concat_accounts(self, frames: list[pd.DataFrame], accounts: list[str]) -> pd.DataFrame:
+        """Function joins formatted data frames of accounts into one data frame with 'Account' column
+
+        Args:
+            frames (list[pd.DataFrame]): formatted data frames of accounts
+            accounts (list[str]): unique names of accounts in the same order
+
+        Returns:
+            pd.DataFrame: joined data frame (rows of one account stay together)
+        """
+        
+        df = self.concat_frames(frames)
+        
+        # Account is coded once from the sizes of frames instead of hashing names of every row
+        sizes = [frame.shape[0] for frame in frames]
+        df["Account"] = pd.Categorical.from_codes(np.repeat(np.arange(len(accounts)), sizes), categories=accounts)
         
         return df
-    
\ No newline at end of file
+    
+    
+    def get_combined_equity_curve(self, df: pd.DataFrame, balance: float) -> pd.DataFrame:
+        """Function calculates the equity curve of all accounts together in order of closing time
+
+        Args:
+            df (pd.DataFrame): joined formatted data frames of accounts with 'Account' column
+            balance (float): starting value of every account
+
+        Returns:
+            pd.DataFrame: 'Close time', equity curve columns of the portfolio ("Balance", "Peak",
+                "Drawdown", "Drawdown %", "Drawdown length") and balance of every account
+                at the same moments ("Balance <account>")
+        """
+        
+        accounts = df["Account"].cat.categories
+        order = np.argsort(df["Close time"].to_numpy(), kind="stable")
+        codes = df["Account"].cat.codes.to_numpy()[order]
+        
+        # Portfolio starts with the sum of balances, every transaction changes it by its net profit
+        equity_curve = self.get_equity_curve(df["Net profit"].to_numpy(dtype=np.float64)[order],
+                                             balance * len(accounts))
+        
+        # Balance of an account is carried forward until its next transaction
+        account_balance = np.full((order.size, len(accounts)), np.nan)
+        account_balance[np.arange(order.size), codes] = df["Balance"].to_numpy(dtype=np.float64)[order]
+        account_balance = pd.DataFrame(account_balance, columns=[f"Balance {account}" for account in accounts])
+        account_balance = account_balance.ffill().fillna(balance)
+        
+        df_equity = pd.DataFrame({"Close time" : df["Close time"].to_numpy()[order], **equity_curve})
+        
+        return pd.concat([df_equity, account_balance], axis=1)
+    
+    
+    def append_history(self, df_history: pd.DataFrame, df_new: pd.DataFrame, date_format: str|None,
+                       balance: float, compact: bool = False) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Function appends new closed transactions to the formatted history of the account
+
+        Args:
+            df_history (pd.DataFrame): formatted history of the account (sorted by close time)
+            df_new (pd.DataFrame): loaded export which can overlap with the history
+            date_format (str): date format of 'Open time' and 'Close time' columns
+            balance (float): starting value of account (used only for an empty history)
+            compact (bool, optional): format new transactions in compact mode. Defaults to False.
+
+        Returns:
+            tuple[pd.DataFrame, pd.DataFrame]: merged history and formatted new transactions only
+        """
+        
+        if df_history.shape[0] == 0:
+            df_new = self.format_data_frame(df_new.reset_index(drop=True), date_format, balance, compact=compact)
+            return df_new, df_new
+        
+        # Transactions can repeat only in the overlapping part of the history
+        df_new = df_new.sort_values(by="Close time", kind="stable").reset_index(drop=True)
+        if df_new.shape[0]:
+            overlap_start = df_history["Close time"].searchsorted(df_new["Close time"].iloc[0])
+            df_overlap = df_history.iloc[overlap_start:]
+            df_new = df_new[~self.get_repeated(df_new, df_overlap)].reset_index(drop=True)
+        
+        if df_new.shape[0] and df_new["Close time"].iloc[0] < df_history["Close time"].iloc[-1]:
+            raise ValueError("New transactions are older than the last transaction in the history")
+        
+        # Equity curve continues from the last state of the history
+        last_row = df_history.iloc[-1]
+        df_new = self.format_data_frame(df_new, date_format, last_row["Balance"],
+                                        last_row["Peak"], int(last_row["Drawdown length"]), compact)
+        
+        return self.concat_frames([df_history, df_new]), df_new
+
+
+    def get_repeated(self, df_new: pd.DataFrame, df_overlap: pd.DataFrame) -> np.ndarray:
+        """Function finds new transactions which are already in the history
+
+        Args:
+            df_new (pd.DataFrame): loaded transactions of the new export
+            df_overlap (pd.DataFrame): transactions of the history closed in the time of the export
+
+        Returns:
+            np.ndarray: mask of repeated transactions (by 'Position', or by open time, close time and
+                symbol when some positions are empty or missing in the file)
+        """
+
+        if df_new["Position"].notna().all() and df_overlap["Position"].notna().all():
+            return df_new["Position"].isin(df_overlap["Position"]).to_numpy()
+
+        # Categories of text columns can differ between files, so the keys are compared as values
+        keys = [df[TRANSACTION_KEYS].astype({"Symbol" : object}) for df in (df_new, df_overlap)]
+        return pd.MultiIndex.from_frame(keys[0]).isin(pd.MultiIndex.from_frame(keys[1]))
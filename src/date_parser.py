@@ -0,0 +1,232 @@
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass, field
+import re
+
+
+# Supported date formats (first ones win when a sample matches several formats)
+DATE_FORMATS = [
+    "%d.%m.%Y %H:%M:%S",
+    "%d.%m.%Y %H:%M",
+    "%d-%m-%Y %H:%M:%S",
+    "%d-%m-%Y %H:%M",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M",
+    "%Y.%m.%d %H:%M:%S",
+    "%Y.%m.%d %H:%M"
+]
+
+# Number of digits of fields in fixed width formats
+FIELD_WIDTHS = {"%Y" : 4, "%m" : 2, "%d" : 2, "%H" : 2, "%M" : 2, "%S" : 2}
+
+
+@dataclass
+class DateParser():
+    sample_size: int = 1000
+    cache_size: int = 500_000 # parsed strings kept per format
+    _cache: dict[str, pd.Series] = field(default_factory=dict, repr=False)
+
+    def detect_format(self, values: np.ndarray | pd.Series) -> str | None:
+        """Detects the date format from a sample of values
+
+        Args:
+            values (np.ndarray | pd.Series): text dates
+
+        Returns:
+            str | None: format which parses the most of the sample or None if no format matches
+        """
+
+        sample = pd.Series(values).dropna()
+        sample = sample.iloc[:self.sample_size].astype(str).to_numpy(dtype=object)
+        if sample.size == 0:
+            return None
+
+        best_format, best_parsed = None, 0
+        for date_format in DATE_FORMATS:
+            parsed = np.count_nonzero(~np.isnat(self.parse_values(sample, date_format)))
+            if parsed > best_parsed:
+                best_format, best_parsed = date_format, parsed
+            if parsed == sample.size:
+                break
+
+        return best_format
+
+
+    def get_fields(self, date_format: str) -> list[tuple[str, int, int]] | None:
+        """Returns positions of fields in a fixed width format
+
+        Args:
+            date_format (str): date format
+
+        Returns:
+            list[tuple[str, int, int]] | None: field, start and end of every part
+                (None if the format has no fixed width)
+        """
+
+        fields = []
+        position = 0
+        for part in re.findall(r"%.|[^%]+", date_format):
+            if part.startswith("%"):
+                if part not in FIELD_WIDTHS:
+                    return None
+                fields.append((part, position, position + FIELD_WIDTHS[part]))
+                position += FIELD_WIDTHS[part]
+            else:
+                fields.append((part, position, position + len(part)))
+                position += len(part)
+
+        return fields
+
+
+    def parse_fixed_width(self, values: np.ndarray, date_format: str) -> np.ndarray | None:
+        """Parses dates by arithmetic on digits (works only for fixed width formats)
+
+        Args:
+            values (np.ndarray): text dates
+            date_format (str): date format
+
+        Returns:
+            np.ndarray | None: datetime64[ns] values with NaT for invalid dates
+                (None if the format has no fixed width)
+        """
+
+        fields = self.get_fields(date_format)
+        if fields is None:
+            return None
+
+        width = fields[-1][2]
+        try:
+            encoded = np.asarray(values, dtype=f"S{width + 1}")
+        except (UnicodeEncodeError, ValueError):
+            return None
+
+        # Text is seen as a matrix of bytes, one row per date
+        valid = np.char.str_len(encoded) == width
+        chars = encoded.view(np.uint8).reshape(-1, width + 1)[:, :width]
+
+        parts = {}
+        for part, start, end in fields:
+            block = chars[:, start:end]
+            if part in FIELD_WIDTHS:
+                digits = block.astype(np.int64) - ord("0")
+                valid &= np.all((digits >= 0) & (digits <= 9), axis=1)
+                parts[part] = digits @ (10 ** np.arange(end - start - 1, -1, -1))
+            else:
+                valid &= np.all(block == np.frombuffer(part.encode(), dtype=np.uint8), axis=1)
+
+        year = parts.get("%Y", np.full(len(chars), 1970))
+        month = parts.get("%m", np.ones(len(chars), dtype=np.int64))
+        day = parts.get("%d", np.ones(len(chars), dtype=np.int64))
+        hour = parts.get("%H", np.zeros(len(chars), dtype=np.int64))
+        minute = parts.get("%M", np.zeros(len(chars), dtype=np.int64))
+        second = parts.get("%S", np.zeros(len(chars), dtype=np.int64))
+        valid &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31) \
+                 & (hour <= 23) & (minute <= 59) & (second <= 59)
+
+        # Calendar arithmetic of numpy (day after the end of the month changes the month)
+        month_start = (np.where(valid, year, 1970) - 1970).astype("datetime64[Y]") \
+                      + (np.where(valid, month, 1) - 1).astype("timedelta64[M]")
+        date = month_start.astype("datetime64[D]") + (np.where(valid, day, 1) - 1).astype("timedelta64[D]")
+        valid &= date.astype("datetime64[M]") == month_start
+
+        seconds = hour * 3600 + minute * 60 + second
+        result = date.astype("datetime64[ns]") + seconds.astype("timedelta64[s]")
+        result[~valid] = np.datetime64("NaT")
+
+        return result
+
+
+    def parse_values(self, values: np.ndarray, date_format: str) -> np.ndarray:
+        """Parses text dates without raising errors
+
+        Args:
+            values (np.ndarray): text dates
+            date_format (str): date format
+
+        Returns:
+            np.ndarray: datetime64[ns] values with NaT for malformed dates
+        """
+
+        result = self.parse_fixed_width(values, date_format)
+        if result is None:
+            return pd.to_datetime(pd.Series(values, dtype=object), format=date_format,
+                                  errors="coerce").to_numpy(dtype="datetime64[ns]")
+
+        # Rare values out of the fixed width (e.g. day without leading zero) are parsed by pandas
+        retry = np.isnat(result) & pd.notna(values)
+        if retry.any():
+            result[retry] = pd.to_datetime(pd.Series(values[retry], dtype=object), format=date_format,
+                                           errors="coerce").to_numpy(dtype="datetime64[ns]")
+
+        return result
+
+
+    def parse_unique(self, uniques: np.ndarray, date_format: str) -> np.ndarray:
+        """Parses unique text dates with the cache of already parsed values
+
+        Args:
+            uniques (np.ndarray): unique text dates
+            date_format (str): date format
+
+        Returns:
+            np.ndarray: datetime64[ns] values with NaT for malformed dates
+        """
+
+        cache = self._cache.get(date_format)
+        if cache is None or cache.empty:
+            result = self.parse_values(uniques, date_format)
+            missing = np.ones(len(uniques), dtype=bool)
+        else:
+            result = cache.reindex(uniques).to_numpy(dtype="datetime64[ns]")
+            missing = ~pd.Index(uniques).isin(cache.index)
+            if missing.any():
+                result[missing] = self.parse_values(uniques[missing], date_format)
+
+        # Newest values are kept when the cache is full
+        if missing.any() and self.cache_size > 0:
+            new_values = pd.Series(result[missing], index=uniques[missing])
+            cache = new_values if cache is None else pd.concat([cache, new_values])
+            self._cache[date_format] = cache.iloc[-self.cache_size:]
+
+        return result
+
+
+    def parse_columns(self, df: pd.DataFrame, columns: list[str],
+                      date_format: str | None = None) -> tuple[str | None, np.ndarray]:
+        """Parses date columns in place, every distinct text is parsed only once
+
+        Args:
+            df (pd.DataFrame): data frame with text dates
+            columns (list[str]): names of date columns (already parsed columns are skipped)
+            date_format (str | None, optional): date format, None detects it from a sample. Defaults to None.
+
+        Returns:
+            tuple[str | None, np.ndarray]: used format and mask of rows with malformed dates
+        """
+
+        malformed = np.zeros(df.shape[0], dtype=bool)
+        columns = [column for column in columns if not pd.api.types.is_datetime64_any_dtype(df[column])]
+        if not columns:
+            return date_format, malformed
+
+        # All columns are parsed in one pass over their distinct values
+        values = np.concatenate([df[column].to_numpy(dtype=object) for column in columns])
+        if date_format is None:
+            date_format = self.detect_format(values)
+            if date_format is None:
+                raise ValueError("Unknown date format")
+
+        codes, uniques = pd.factorize(values)
+        parsed = self.parse_unique(np.asarray(uniques, dtype=object), date_format)
+        parsed = np.append(parsed, np.datetime64("NaT", "ns"))[codes] # code -1 is a missing value
+
+        # Missing dates are malformed as well (rows without dates can not be placed on the time axis)
+        malformed_values = np.isnat(parsed)
+        for number, column in enumerate(columns):
+            rows = slice(number * df.shape[0], (number + 1) * df.shape[0])
+            df[column] = parsed[rows]
+            malformed |= malformed_values[rows]
+
+        return date_format, malformed
@@ -0,0 +1,104 @@
+import matplotlib
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+import multiprocessing
+import io
+import os
+import threading
+from make_stats import MakeStats
+
+
+# Number of processes rendering charts (can be changed with environment variable)
+RENDER_WORKERS = int(os.environ.get("STOCK_REPORT_RENDER_WORKERS", os.cpu_count() or 1))
+
+# Style of the charts in the report
+CHART_STYLE = "seaborn-v0_8-pastel"
+
+
+def render_figure(method: str, args: tuple, kwargs: dict, style: str = CHART_STYLE) -> bytes:
+    """Builds one chart with a MakeStats plotting method, saves it as png and closes the figure
+
+    Args:
+        method (str): name of the MakeStats plotting method
+        args (tuple): positional arguments of the method
+        kwargs (dict): keyword arguments of the method
+        style (str, optional): matplotlib style of the chart. Defaults to CHART_STYLE.
+
+    Returns:
+        bytes: png image of chart
+    """
+
+    with plt.style.context(style):
+        fig = getattr(MakeStats(), method)(*args, **kwargs)
+        try:
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format="png", bbox_inches="tight", dpi=200)
+        finally:
+            # Figure is released even if saving fails
+            plt.close(fig)
+
+    return buffer.getvalue()
+
+
+@dataclass
+class FigureRenderer():
+    max_workers: int = RENDER_WORKERS
+    style: str = CHART_STYLE
+    _executor: ProcessPoolExecutor | None = field(default=None, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        """Returns the pool of rendering processes (created on first use)
+
+        Returns:
+            ProcessPoolExecutor: pool of rendering processes
+        """
+
+        # Spawned processes do not inherit threads of the streamlit server, sessions share one pool
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+
+    def render(self, jobs: dict[str, tuple[str, tuple, dict]]) -> dict[str, bytes]:
+        """Renders charts concurrently in the pool of processes
+
+        Args:
+            jobs (dict[str, tuple[str, tuple, dict]]): name of chart mapped to MakeStats method, args and kwargs
+
+        Returns:
+            dict[str, bytes]: name of chart mapped to png image
+        """
+
+        if self.max_workers <= 1:
+            return {name: render_figure(method, args, kwargs, self.style)
+                    for name, (method, args, kwargs) in jobs.items()}
+
+        executor = self.get_executor()
+        futures = {name: executor.submit(render_figure, method, args, kwargs, self.style)
+                   for name, (method, args, kwargs) in jobs.items()}
+
+        try:
+            return {name: future.result() for name, future in futures.items()}
+
+        except BrokenProcessPool:
+            # Next render starts a new pool (unless another session already did)
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+
+
+    def shutdown(self) -> None:
+        """Stops the pool of rendering processes"""
+
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
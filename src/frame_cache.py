@@ -0,0 +1,155 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+import tempfile
+
+
+# Settings of the disk cache (can be changed with environment variables)
+CACHE_DIR = os.environ.get("STOCK_REPORT_DISK_CACHE_DIR",
+                           os.path.join(os.path.expanduser("~"), ".stock_report_cache"))
+CACHE_MAX_BYTES = int(os.environ.get("STOCK_REPORT_DISK_CACHE_MAX_BYTES", 2 * 1024**3))
+
+# Version of the saved data frames, changed with every change of their columns or types
+FORMAT_VERSION = 1
+
+
+@dataclass
+class FrameCache():
+    cache_dir: str = CACHE_DIR
+    max_bytes: int = CACHE_MAX_BYTES
+
+    def get_key(self, file_hash: str, *settings) -> str:
+        """Returns a key of the cached data frame
+
+        Args:
+            file_hash (str): content hash of the file
+            settings: parse settings used to build the data frame (header, date format, types of columns)
+
+        Returns:
+            str: key of the cache entry
+        """
+
+        # Files saved by an older version of the app get other keys and are evicted as unused
+        return hashlib.blake2b(repr((FORMAT_VERSION, file_hash, settings)).encode(), digest_size=16).hexdigest()
+
+
+    def get_path(self, key: str) -> str:
+        """Returns a path of the cache entry
+
+        Args:
+            key (str): key of the cache entry
+
+        Returns:
+            str: path to the feather file
+        """
+
+        return os.path.join(self.cache_dir, f"{key}.feather")
+
+
+    def load(self, key: str) -> pd.DataFrame | None:
+        """Loads a cached data frame by memory-mapping the feather file
+
+        Args:
+            key (str): key of the cache entry
+
+        Returns:
+            pd.DataFrame | None: cached data frame or None if there is no entry (or it is damaged)
+        """
+
+        path = self.get_path(key)
+        try:
+            table = feather.read_table(path, memory_map=True)
+            # Modification time is used as the last access time for LRU eviction
+            os.utime(path)
+
+        except (FileNotFoundError, OSError):
+            return None
+
+        except (pa.ArrowException, ValueError):
+            # Truncated or damaged file is removed, the caller builds the data frame again
+            self.invalidate(key)
+            return None
+
+        df = table.to_pandas(split_blocks=True)
+        df.attrs = json.loads(table.schema.metadata.get(b"attrs", b"{}"))
+        return df
+
+
+    def store(self, key: str, df: pd.DataFrame) -> None:
+        """Saves a data frame in the cache and evicts the least recently used entries
+
+        Args:
+            key (str): key of the cache entry
+            df (pd.DataFrame): data frame to save
+        """
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(key)
+
+        table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+        # Feather keeps only columns, attrs (e.g. malformed rows) are saved in the schema metadata
+        table = table.replace_schema_metadata({**table.schema.metadata, b"attrs": json.dumps(df.attrs).encode()})
+
+        # Uncompressed file can be memory-mapped without copying, atomic replace hides partial writes
+        # (every writer has its own temporary file, sessions are threads of one process)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{key}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            feather.write_feather(table, tmp_path, compression="uncompressed")
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        self.evict()
+
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache fits in max_bytes"""
+
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".feather"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+    def invalidate(self, key: str) -> None:
+        """Removes one entry from the cache
+
+        Args:
+            key (str): key of the cache entry
+        """
+
+        try:
+            os.remove(self.get_path(key))
+        except FileNotFoundError:
+            pass
+
+
+    def clear(self) -> None:
+        """Removes all entries from the cache"""
+
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".feather"):
+                self.invalidate(entry.name[:-len(".feather")])
@@ -0,0 +1,219 @@
+from dataclasses import dataclass, field, asdict
+from contextvars import ContextVar
+import pandas as pd
+import json
+import logging
+import threading
+import time
+import tracemalloc
+
+
+logger = logging.getLogger("stock_report.instrumentation")
+
+# Tracing of memory is global for the process, it runs while any session is inside a traced stage
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started = False # tracing started here (not e.g. with python -X tracemalloc)
+_tracing_joins = 0 # number of started users, a change means another session joined
+
+
+def start_tracing() -> None:
+    """Starts tracing of memory for one more user (only the first user really starts it)"""
+
+    global _tracing_users, _tracing_started, _tracing_joins
+    with _tracing_lock:
+        _tracing_users += 1
+        _tracing_joins += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+
+
+def stop_tracing() -> None:
+    """Releases tracing of memory (the last user stops it, if it was started by start_tracing)"""
+
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+
+@dataclass(slots=True)
+class StageRecord():
+    name: str
+    wall_seconds: float
+    cpu_seconds: float
+    peak_mb: float | None # allocated on top of the memory used before the stage (None when shared)
+    rows: int | None
+    started_at: float # unix time
+
+
+class NullStage():
+    """Stage used when instrumentation is disabled (does nothing)"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "NullStage":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def __setattr__(self, name, value) -> None:
+        # Setting rows of a disabled stage is ignored
+        return None
+
+
+NULL_STAGE = NullStage()
+
+
+class Stage():
+    """Measured stage of the pipeline (use as a context manager)"""
+
+    __slots__ = ("profiler", "name", "rows", "started_at", "wall_start", "cpu_start",
+                 "memory_start", "children_peak", "tracing", "tracing_joins")
+
+    def __init__(self, profiler: "Profiler", name: str, rows: int | None) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.rows = rows
+        self.children_peak = 0
+
+    def __enter__(self) -> "Stage":
+        # The outermost stage keeps tracing on until its end (also when the script is stopped inside)
+        self.tracing = self.profiler.trace_memory and not self.profiler._stack
+        if self.tracing:
+            start_tracing()
+
+        # Peak of tracemalloc is global for the process, so it is reset only when no other session traces
+        self.memory_start = None
+        if self.profiler.trace_memory and tracemalloc.is_tracing():
+            with _tracing_lock:
+                if _tracing_users <= 1:
+                    self.memory_start = tracemalloc.get_traced_memory()[0]
+                    self.tracing_joins = _tracing_joins
+                    tracemalloc.reset_peak()
+        self.profiler._stack.append(self)
+
+        self.started_at = time.time()
+        # CPU time of this thread only (other sessions run in other threads of the same process)
+        self.cpu_start = time.thread_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        wall_seconds = time.perf_counter() - self.wall_start
+        cpu_seconds = time.thread_time() - self.cpu_start
+
+        self.profiler._stack.pop()
+        peak_mb = None
+        if self.memory_start is not None:
+            # Allocations of a session which joined during the stage would be counted as well
+            with _tracing_lock:
+                if _tracing_joins != self.tracing_joins:
+                    self.memory_start = None
+        if self.memory_start is not None:
+            # Peak of a nested stage was reset, so the maximum of children is also checked
+            peak = max(tracemalloc.get_traced_memory()[1], self.children_peak)
+            if self.profiler._stack:
+                parent = self.profiler._stack[-1]
+                parent.children_peak = max(parent.children_peak, peak)
+            peak_mb = round((peak - self.memory_start) / 1024**2, 3)
+
+        if self.tracing:
+            stop_tracing()
+
+        self.profiler.add(StageRecord(self.name, round(wall_seconds, 6), round(cpu_seconds, 6),
+                                      peak_mb, self.rows, self.started_at))
+
+
+@dataclass
+class Profiler():
+    enabled: bool = True
+    trace_memory: bool = False
+    log: bool = False
+    records: list[StageRecord] = field(default_factory=list)
+    _stack: list[Stage] = field(default_factory=list, repr=False)
+
+    def stage(self, name: str, rows: int | None = None) -> Stage | NullStage:
+        """Returns a measured stage
+
+        Args:
+            name (str): name of the stage
+            rows (int | None, optional): number of processed rows (can be set later). Defaults to None.
+
+        Returns:
+            Stage | NullStage: context manager measuring the stage
+        """
+
+        if not self.enabled:
+            return NULL_STAGE
+
+        return Stage(self, name, rows)
+
+
+    def add(self, record: StageRecord) -> None:
+        """Saves a measurement of the stage
+
+        Args:
+            record (StageRecord): measurement of the stage
+        """
+
+        self.records.append(record)
+        if self.log:
+            logger.info(json.dumps({"event" : "stage", **asdict(record)}))
+
+
+    def to_frame(self) -> pd.DataFrame:
+        """Returns all measurements as a data frame
+
+        Returns:
+            pd.DataFrame: one row per stage
+        """
+
+        return pd.DataFrame([asdict(record) for record in self.records],
+                            columns=["name", "wall_seconds", "cpu_seconds", "peak_mb", "rows", "started_at"])
+
+
+    def to_json(self) -> str:
+        """Returns all measurements as json
+
+        Returns:
+            str: json list with one object per stage
+        """
+
+        return json.dumps([asdict(record) for record in self.records], indent=4)
+
+
+# Profiler of the current script run (streamlit runs every session in its own thread)
+current_profiler: ContextVar[Profiler | None] = ContextVar("current_profiler", default=None)
+
+
+def activate(profiler: Profiler | None) -> None:
+    """Sets the profiler used by stage() in the current thread
+
+    Args:
+        profiler (Profiler | None): profiler or None to disable instrumentation
+    """
+
+    current_profiler.set(profiler)
+
+
+def stage(name: str, rows: int | None = None) -> Stage | NullStage:
+    """Returns a measured stage of the active profiler (no-op without an active profiler)
+
+    Args:
+        name (str): name of the stage
+        rows (int | None, optional): number of processed rows (can be set later). Defaults to None.
+
+    Returns:
+        Stage | NullStage: context manager measuring the stage
+    """
+
+    profiler = current_profiler.get()
+    if profiler is None:
+        return NULL_STAGE
+
+    return profiler.stage(name, rows)
@@ -0,0 +1,167 @@
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator
+import functools
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+import urllib.parse
+
+
+# Model of the AI-Support page (can be changed with environment variables)
+LLM_BACKEND = os.environ.get("STOCK_REPORT_LLM_BACKEND", "ollama") # "ollama" or "fake"
+LLM_MODEL = os.environ.get("STOCK_REPORT_LLM_MODEL", "llama2")
+OLLAMA_URL = os.environ.get("STOCK_REPORT_OLLAMA_URL", "http://localhost:11434")
+REQUEST_TIMEOUT = float(os.environ.get("STOCK_REPORT_LLM_TIMEOUT", 300)) # seconds without data from Ollama
+
+# Answers of the fake backend (chosen by the prompt, streamed word by word)
+FAKE_RESPONSES = [
+    "The expectancy of a strategy is the average win times the win rate minus the average loss times the loss rate.",
+    "A drawdown is the fall of the balance from its running peak, usually shown in percent of the peak.",
+    "The profit factor is the sum of winning transactions divided by the absolute sum of losing transactions."
+]
+FAKE_DELAY = float(os.environ.get("STOCK_REPORT_LLM_FAKE_DELAY", 0.05)) # seconds between streamed chunks
+
+
+@dataclass
+class OllamaStream():
+    """Stream of the answer of the Ollama server (/api/generate, one json object per line)
+
+    cancel() can be called from another thread, it closes the connection (also while Ollama is still
+    reading the prompt), so Ollama stops generating.
+    """
+
+    prompt: str # whole prompt (system message, history and question)
+    model: str = LLM_MODEL
+    url: str = OLLAMA_URL
+    timeout: float = REQUEST_TIMEOUT # seconds of waiting for data
+    _socket: socket.socket | None = field(default=None, init=False, repr=False)
+    _cancelled: threading.Event = field(default_factory=threading.Event, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __iter__(self) -> Iterator[str]:
+        """Sends the prompt and streams the answer
+
+        Raises:
+            RuntimeError: when Ollama returns an error (e.g. the model is not installed)
+            OSError: when the server is not available
+
+        Yields:
+            str: chunks (tokens) of the answer
+        """
+
+        address = urllib.parse.urlsplit(self.url)
+        connection_class = http.client.HTTPSConnection if address.scheme == "https" else http.client.HTTPConnection
+        connection = connection_class(address.hostname, address.port, timeout=self.timeout)
+        try:
+            connection.connect()
+            # Socket is kept for cancel() (the connection drops it when the response is read to the end)
+            with self._lock:
+                self._socket = connection.sock
+            if self._cancelled.is_set():
+                return
+
+            connection.request("POST", f"{address.path.rstrip('/')}/api/generate",
+                               body=json.dumps({"model" : self.model, "prompt" : self.prompt, "stream" : True}).encode(),
+                               headers={"Content-Type" : "application/json"})
+            response = connection.getresponse()
+            if response.status != 200:
+                # Ollama describes the error in the body (e.g. a model which is not pulled)
+                try:
+                    message = json.loads(response.read()).get("error", response.reason)
+                except ValueError:
+                    message = response.reason
+                raise RuntimeError(f"Ollama error {response.status}: {message}")
+
+            for line in response:
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(data["error"])
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    return
+
+        except (OSError, http.client.HTTPException):
+            # Closed connection of a cancelled stream is its normal end
+            if self._cancelled.is_set():
+                return
+            raise
+
+        finally:
+            connection.close()
+
+
+    def cancel(self) -> None:
+        """Stops the stream from any thread (a blocked read of the answer ends at once)"""
+
+        self._cancelled.set()
+        with self._lock:
+            sock = self._socket
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def stream_fake(prompt: str, delay: float = FAKE_DELAY) -> Iterator[str]:
+    """Streams a canned answer (for tests of the page without Ollama)
+
+    Args:
+        prompt (str): whole prompt (the same prompt always gets the same answer)
+        delay (float, optional): seconds between chunks. Defaults to FAKE_DELAY.
+
+    Yields:
+        str: words of the answer
+    """
+
+    answer = FAKE_RESPONSES[sum(prompt.encode()) % len(FAKE_RESPONSES)]
+    for word in answer.split(" "):
+        time.sleep(delay)
+        yield f"{word} "
+
+
+def get_stream_function(backend: str = LLM_BACKEND, model: str = LLM_MODEL,
+                        url: str = OLLAMA_URL) -> Callable[[str], Iterable[str]]:
+    """Returns the function streaming answers of the model of the AI-Support page
+
+    Args:
+        backend (str, optional): "ollama" (Ollama server or its stand-in, see ollama_stub.py) or "fake"
+            (canned answers without any server). Defaults to LLM_BACKEND.
+        model (str, optional): name of the Ollama model. Defaults to LLM_MODEL.
+        url (str, optional): address of the Ollama server. Defaults to OLLAMA_URL.
+
+    Raises:
+        ValueError: when the backend is unknown
+
+    Returns:
+        Callable[[str], Iterable[str]]: function returning the stream of the answer to a prompt
+            (a stream with cancel() can be stopped from another thread)
+    """
+
+    if backend == "ollama":
+        return functools.partial(OllamaStream, model=model, url=url)
+
+    if backend == "fake":
+        return stream_fake
+
+    raise ValueError(f"Unknown LLM backend: {backend}")
+
+
+def get_model_name(backend: str = LLM_BACKEND, model: str = LLM_MODEL) -> str:
+    """Returns the name of the model shown on the page and used in keys of cached answers
+
+    Args:
+        backend (str, optional): name of the backend. Defaults to LLM_BACKEND.
+        model (str, optional): name of the Ollama model. Defaults to LLM_MODEL.
+
+    Returns:
+        str: name of the model
+    """
+
+    return model if backend == "ollama" else backend
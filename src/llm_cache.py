@@ -0,0 +1,277 @@
+from dataclasses import dataclass, field
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+
+# Settings of the answer cache (can be changed with environment variables)
+CACHE_DIR = os.environ.get("STOCK_REPORT_LLM_CACHE_DIR",
+                           os.path.join(os.path.expanduser("~"), ".stock_report_cache", "llm"))
+CACHE_TTL = int(os.environ.get("STOCK_REPORT_LLM_CACHE_TTL", 7 * 24 * 3600)) # seconds
+CACHE_MAX_ENTRIES = int(os.environ.get("STOCK_REPORT_LLM_CACHE_MAX_ENTRIES", 256)) # in memory
+CACHE_MAX_BYTES = int(os.environ.get("STOCK_REPORT_LLM_CACHE_MAX_BYTES", 64 * 1024**2)) # on disk
+REPLAY_DELAY = float(os.environ.get("STOCK_REPORT_LLM_REPLAY_DELAY", 0.01)) # seconds between replayed chunks
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Returns the prompt without differences which do not change the question
+
+    Args:
+        prompt (str): text of the user
+
+    Returns:
+        str: prompt without letter case and repeated or surrounding whitespace
+    """
+
+    return " ".join(prompt.split()).casefold()
+
+
+def split_chunks(text: str) -> list[str]:
+    """Splits the answer into words with their trailing whitespace (similar to tokens of a stream)
+
+    Args:
+        text (str): whole answer
+
+    Returns:
+        list[str]: chunks which joined give the answer
+    """
+
+    return re.findall(r"\s+|\S+\s*", text)
+
+
+@dataclass
+class ResponseCache():
+    cache_dir: str | None = CACHE_DIR # None keeps answers only in memory
+    ttl: float = CACHE_TTL
+    max_entries: int = CACHE_MAX_ENTRIES
+    max_bytes: int = CACHE_MAX_BYTES
+    replay_delay: float = REPLAY_DELAY
+    hits: int = 0
+    misses: int = 0
+    _entries: OrderedDict = field(default_factory=OrderedDict, repr=False) # key -> (created_at, answer)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def get_key(self, prompt: str, model: str, system_prompt: str, *context: str) -> str:
+        """Returns a key of the cached answer
+
+        Args:
+            prompt (str): question of the user (normalized before hashing)
+            model (str): name of the model
+            system_prompt (str): system message of the model
+            context (str): other parts of the prompt changing the answer
+
+        Returns:
+            str: key of the cache entry
+        """
+
+        payload = json.dumps([normalize_prompt(prompt), model, system_prompt, *context])
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+    def get_path(self, key: str) -> str:
+        """Returns a path of the cache entry on disk
+
+        Args:
+            key (str): key of the cache entry
+
+        Returns:
+            str: path to the json file
+        """
+
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+
+    def get(self, key: str) -> str | None:
+        """Returns the cached answer from memory or disk (answers older than ttl are removed)
+
+        Args:
+            key (str): key of the cache entry
+
+        Returns:
+            str | None: cached answer or None if there is no valid entry
+        """
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        entry = self.load(key)
+        if entry is None or now - entry[0] > self.ttl:
+            if entry is not None:
+                self.invalidate(key)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Answer from disk is kept in memory for the next questions
+        with self._lock:
+            self.hits += 1
+            self.add(key, entry)
+        return entry[1]
+
+
+    def add(self, key: str, entry: tuple[float, str]) -> None:
+        """Adds an entry to the memory tier and removes the least recently used ones (lock must be held)
+
+        Args:
+            key (str): key of the cache entry
+            entry (tuple[float, str]): creation time and answer
+        """
+
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+    def load(self, key: str) -> tuple[float, str] | None:
+        """Loads an entry from disk
+
+        Args:
+            key (str): key of the cache entry
+
+        Returns:
+            tuple[float, str] | None: creation time and answer or None if there is no readable entry
+        """
+
+        if self.cache_dir is None:
+            return None
+
+        path = self.get_path(key)
+        try:
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+            # Modification time is used as the last access time for LRU eviction
+            os.utime(path)
+            return data["created_at"], data["answer"]
+
+        except (FileNotFoundError, OSError, ValueError, KeyError):
+            return None
+
+
+    def put(self, key: str, answer: str, model: str = "") -> None:
+        """Saves the answer in memory and on disk
+
+        Args:
+            key (str): key of the cache entry
+            answer (str): whole answer of the model
+            model (str, optional): name of the model (saved for inspection of the files). Defaults to "".
+        """
+
+        entry = (time.time(), answer)
+        with self._lock:
+            self.add(key, entry)
+
+        if self.cache_dir is None:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(key)
+        # Atomic replace hides partial writes from other sessions
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"created_at" : entry[0], "model" : model, "answer" : answer}, file)
+        os.replace(tmp_path, path)
+
+        self.evict()
+
+
+    def stream(self, key: str, generate: Callable[[], Iterable[str]], model: str = "") -> Iterator[str]:
+        """Streams the cached answer or the answer of the model (saved only when the stream is finished)
+
+        Args:
+            key (str): key of the cache entry
+            generate (Callable[[], Iterable[str]]): function starting the stream of the model
+            model (str, optional): name of the model. Defaults to "".
+
+        Yields:
+            str: chunks of the answer
+        """
+
+        answer = self.get(key)
+        if answer is not None:
+            # Cached answer is replayed as a stream, so the page shows it the same way
+            for chunk in split_chunks(answer):
+                yield chunk
+                if self.replay_delay:
+                    time.sleep(self.replay_delay)
+            return
+
+        chunks = []
+        for chunk in generate():
+            chunks.append(chunk)
+            yield chunk
+        self.put(key, "".join(chunks), model)
+
+
+    def evict(self) -> None:
+        """Removes answers older than ttl from memory and disk, then the least recently used answers
+        until the files fit in max_bytes"""
+
+        now = time.time()
+        with self._lock:
+            for key in [key for key, (created_at, _) in self._entries.items() if now - created_at > self.ttl]:
+                del self._entries[key]
+
+        if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return
+
+        # Files not used for ttl are expired (a used one is checked by its creation time when it is read)
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                if now - stat.st_mtime > self.ttl:
+                    self.invalidate(entry.name[:-len(".json")])
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, entry.name[:-len(".json")]))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            self.invalidate(key)
+            total_size -= size
+
+
+    def invalidate(self, key: str) -> None:
+        """Removes one answer from memory and disk
+
+        Args:
+            key (str): key of the cache entry
+        """
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+        if self.cache_dir is None:
+            return
+        try:
+            os.remove(self.get_path(key))
+        except FileNotFoundError:
+            pass
+
+
+    def clear(self) -> None:
+        """Removes all answers from memory and disk"""
+
+        with self._lock:
+            self._entries.clear()
+
+        if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return
+
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json"):
+                self.invalidate(entry.name[:-len(".json")])
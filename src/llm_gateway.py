@@ -0,0 +1,340 @@
+import pandas as pd
+from dataclasses import dataclass, field
+from collections import OrderedDict, deque
+from typing import Callable, Iterable, Iterator
+from resource_manager import QueueFullError
+import itertools
+import os
+import queue
+import threading
+import time
+
+
+# Limits of the model shared by all sessions (can be changed with environment variables)
+LLM_WORKERS = int(os.environ.get("STOCK_REPORT_LLM_WORKERS", 1))
+LLM_MAX_QUEUE = int(os.environ.get("STOCK_REPORT_LLM_MAX_QUEUE", 32))
+
+# Interval of checking cancellation and the position of a waiting request
+POLL_INTERVAL = 0.25 # seconds
+
+# Number of finished requests kept for metrics
+METRICS_HISTORY = 100
+
+
+@dataclass(slots=True)
+class RequestMetrics():
+    request_id: int
+    session_id: str
+    status: str # "queued", "running", "done", "cancelled" or "error"
+    queued_at: float # monotonic time
+    started_at: float | None = None
+    first_token_at: float | None = None
+    finished_at: float | None = None
+    tokens: int = 0 # streamed chunks
+
+    def get_queue_wait(self) -> float | None:
+        """Returns seconds from sending the request to the start of the model"""
+
+        return None if self.started_at is None else self.started_at - self.queued_at
+
+    def get_ttft(self) -> float | None:
+        """Returns time to first token - seconds from sending the request (queue included)"""
+
+        return None if self.first_token_at is None else self.first_token_at - self.queued_at
+
+    def get_tokens_per_second(self) -> float | None:
+        """Returns speed of generation after the first token"""
+
+        if self.first_token_at is None or self.finished_at is None or self.finished_at <= self.first_token_at:
+            return None
+        return (self.tokens - 1) / (self.finished_at - self.first_token_at)
+
+    def to_dict(self) -> dict:
+        """Returns the metrics with derived values (seconds rounded to milliseconds)"""
+
+        def rounded(value: float | None) -> float | None:
+            return None if value is None else round(value, 3)
+
+        return {"request_id" : self.request_id, "session_id" : self.session_id, "status" : self.status,
+                "queue_wait" : rounded(self.get_queue_wait()), "ttft" : rounded(self.get_ttft()),
+                "tokens" : self.tokens, "tokens_per_second" : rounded(self.get_tokens_per_second())}
+
+
+@dataclass(eq=False)
+class LLMRequest():
+    prompt: str
+    metrics: RequestMetrics
+    chunks: queue.Queue = field(default_factory=queue.Queue, repr=False) # str, exception or None at the end
+    cancelled: threading.Event = field(default_factory=threading.Event, repr=False)
+    source: Iterable[str] | None = field(default=None, repr=False) # stream of the model while running
+
+
+@dataclass
+class LLMGateway():
+    generate: Callable[[str], Iterable[str]] # streams the answer to a prompt (see llm_backend)
+    workers: int = LLM_WORKERS
+    max_queue: int = LLM_MAX_QUEUE
+    _sessions: OrderedDict = field(default_factory=OrderedDict, repr=False) # session -> deque of waiting requests
+    _running: dict[str, list[LLMRequest]] = field(default_factory=dict, repr=False)
+    _finished: deque = field(default_factory=lambda: deque(maxlen=METRICS_HISTORY), repr=False)
+    _condition: threading.Condition = field(default_factory=threading.Condition, repr=False)
+    _ids: Iterator[int] = field(default_factory=itertools.count, repr=False)
+    _threads: list[threading.Thread] = field(default_factory=list, repr=False)
+
+    def __post_init__(self) -> None:
+        # Daemon workers do not block closing of the server
+        for number in range(self.workers):
+            thread = threading.Thread(target=self.work, name=f"llm-gateway-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+
+    def submit(self, session_id: str, prompt: str) -> LLMRequest:
+        """Adds a request to the queue, earlier requests of the session are cancelled
+
+        Args:
+            session_id (str): id of the user session (sessions are served in turn)
+            prompt (str): whole prompt
+
+        Raises:
+            QueueFullError: when the queue of waiting requests is full
+
+        Returns:
+            LLMRequest: request with the stream of chunks
+        """
+
+        self.cancel_session(session_id)
+
+        with self._condition:
+            if sum(len(requests) for requests in self._sessions.values()) >= self.max_queue:
+                raise QueueFullError(f"Queue of the model is full ({self.max_queue} waiting)")
+            request = LLMRequest(prompt, RequestMetrics(next(self._ids), session_id, "queued", time.monotonic()))
+            self._sessions.setdefault(session_id, deque()).append(request)
+            self._condition.notify()
+
+        return request
+
+
+    def cancel(self, request: LLMRequest) -> None:
+        """Stops the request (a waiting request is removed, a running one closes its stream at once
+        when the stream has cancel(), otherwise it stops at its next chunk)
+
+        Args:
+            request (LLMRequest): request of the gateway
+        """
+
+        request.cancelled.set()
+        with self._condition:
+            source = request.source
+            waiting = self._sessions.get(request.metrics.session_id)
+            if waiting is not None and request in waiting:
+                waiting.remove(request)
+                if not waiting:
+                    del self._sessions[request.metrics.session_id]
+                self.finish(request, "cancelled")
+
+        # Worker can wait for the first token for a long time, closing the stream frees it
+        if hasattr(source, "cancel"):
+            source.cancel()
+
+
+    def cancel_session(self, session_id: str) -> None:
+        """Stops all requests of the session (e.g. after a new question or when the user leaves)
+
+        Args:
+            session_id (str): id of the user session
+        """
+
+        with self._condition:
+            requests = list(self._sessions.get(session_id, ())) + self._running.get(session_id, [])
+        for request in requests:
+            self.cancel(request)
+
+
+    def get_position(self, request: LLMRequest) -> int:
+        """Returns the position of the request in the fair queue (0 when it is not waiting)
+
+        Args:
+            request (LLMRequest): request of the gateway
+
+        Returns:
+            int: number of requests served before this one, plus one
+        """
+
+        # Sessions are served in turn - first requests of all sessions, then second ones and so on
+        with self._condition:
+            sessions = [list(requests) for requests in self._sessions.values()]
+
+        position = 0
+        for round_number in range(max((len(requests) for requests in sessions), default=0)):
+            for requests in sessions:
+                if round_number < len(requests):
+                    position += 1
+                    if requests[round_number] is request:
+                        return position
+
+        return 0
+
+
+    def next_request(self) -> LLMRequest:
+        """Takes the next request - the first one of the session waiting the longest for its turn
+
+        Returns:
+            LLMRequest: request moved to running
+        """
+
+        with self._condition:
+            while not self._sessions:
+                self._condition.wait()
+
+            session_id, waiting = next(iter(self._sessions.items()))
+            request = waiting.popleft()
+            del self._sessions[session_id]
+            # Session with more requests goes to the end of the turn
+            if waiting:
+                self._sessions[session_id] = waiting
+
+            request.metrics.status = "running"
+            request.metrics.started_at = time.monotonic()
+            self._running.setdefault(session_id, []).append(request)
+
+        return request
+
+
+    def finish(self, request: LLMRequest, status: str) -> None:
+        """Ends the request and saves its metrics (condition must be held)
+
+        Args:
+            request (LLMRequest): request of the gateway
+            status (str): final status of the request
+        """
+
+        running = self._running.get(request.metrics.session_id, [])
+        if request in running:
+            running.remove(request)
+            if not running:
+                del self._running[request.metrics.session_id]
+
+        request.metrics.status = status
+        request.metrics.finished_at = time.monotonic()
+        self._finished.append(request.metrics)
+        request.chunks.put(None)
+
+
+    def work(self) -> None:
+        """Loop of a worker thread - streams answers of the model to the queues of requests"""
+
+        while True:
+            request = self.next_request()
+            status = "done"
+            stream = None
+            try:
+                source = self.generate(request.prompt)
+                # Request cancelled before its stream was known is stopped here, later ones by cancel()
+                with self._condition:
+                    request.source = source
+                if request.cancelled.is_set() and hasattr(source, "cancel"):
+                    source.cancel()
+
+                stream = iter(source)
+                for chunk in stream:
+                    if request.cancelled.is_set():
+                        status = "cancelled"
+                        break
+                    if request.metrics.first_token_at is None:
+                        request.metrics.first_token_at = time.monotonic()
+                    request.metrics.tokens += 1
+                    request.chunks.put(chunk)
+                else:
+                    status = "cancelled" if request.cancelled.is_set() else "done"
+
+            except Exception as e:
+                if request.cancelled.is_set():
+                    status = "cancelled"
+                else:
+                    status = "error"
+                    request.chunks.put(e)
+
+            finally:
+                # Closing the stream closes the connection with the model
+                if hasattr(stream, "close"):
+                    stream.close()
+                with self._condition:
+                    request.source = None
+                    self.finish(request, status)
+
+
+    def stream(self, session_id: str, prompt: str,
+               on_wait: Callable[[int], None] | None = None) -> Iterator[str]:
+        """Sends the prompt and streams the answer, leaving the stream early cancels the request
+
+        Args:
+            session_id (str): id of the user session
+            prompt (str): whole prompt
+            on_wait (Callable[[int], None] | None, optional): called with the position in the queue while
+                waiting and with 0 before the first chunk. Defaults to None.
+
+        Raises:
+            QueueFullError: when the queue of waiting requests is full
+            Exception: error of the model
+
+        Yields:
+            str: chunks of the answer
+        """
+
+        request = self.submit(session_id, prompt)
+        waiting = True
+        try:
+            while True:
+                try:
+                    chunk = request.chunks.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    if waiting and on_wait is not None:
+                        on_wait(self.get_position(request))
+                    continue
+
+                if waiting:
+                    waiting = False
+                    if on_wait is not None:
+                        on_wait(0)
+                if chunk is None:
+                    return
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+
+        finally:
+            # Script stopped by a new question or a closed page also cancels the request
+            if request.metrics.finished_at is None:
+                self.cancel(request)
+
+
+    def get_metrics(self, session_id: str | None = None) -> pd.DataFrame:
+        """Returns metrics of the finished requests (the newest first)
+
+        Args:
+            session_id (str | None, optional): only requests of the session. Defaults to None.
+
+        Returns:
+            pd.DataFrame: status, queue wait, time to first token, tokens and tokens per second
+        """
+
+        with self._condition:
+            metrics = [request.to_dict() for request in reversed(self._finished)
+                       if session_id is None or request.session_id == session_id]
+
+        return pd.DataFrame(metrics, columns=["request_id", "session_id", "status", "queue_wait", "ttft",
+                                              "tokens", "tokens_per_second"])
+
+
+    def get_state(self) -> dict:
+        """Returns the current load of the gateway
+
+        Returns:
+            dict: numbers of workers, running and queued requests
+        """
+
+        with self._condition:
+            return {"workers" : self.workers,
+                    "running" : sum(len(requests) for requests in self._running.values()),
+                    "queued" : sum(len(requests) for requests in self._sessions.values())}
@@ -1,52 +1,695 @@
 import pandas as pd
 import numpy as np
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+from concurrent.futures import Executor
 import matplotlib.pyplot as plt
+from data_reader import WEEK_DAYS
+
+
+# Maximum number of points drawn on a line chart (about the pixel width of the saved chart)
+LINE_MAX_POINTS = 1500
+
+# Memory of simulated equity curves processed at once in Monte Carlo simulation
+SIMULATION_CHUNK_BYTES = 64 * 1024**2
+
+# Number of transactions at which equity curves of simulations are kept for percentile bands
+BAND_POINTS = 250
+
+# Label of an empty symbol or type in the aggregate cube
+BLANK_LABEL = "(blank)"
+
+
+@dataclass(slots=True)
+class ReportSummary():
+    transations_number: int
+    profit_min: float
+    profit_max: float
+    profit_sum: float
+    week_count: np.ndarray # per day of the week
+    week_min: np.ndarray
+    week_max: np.ndarray
+    week_sum: np.ndarray
+    wins: int
+    losses: int
+    duration_min: float # minute
+    duration_max: float
+    duration_sum: float
+    symbols: pd.Series # counted values
+    types: pd.Series
+    lots: pd.Series
+    max_drawdown: float
+    max_drawdown_pct: float
+    longest_drawdown: int # transactions
+    
+    def get_profit_stats(self) -> pd.DataFrame:
+        """Returns a DataFrame with the rounded profit value
+
+        Returns:
+            pd.DataFrame: data frame with stats of profit
+        """
+        
+        return pd.DataFrame({
+            "Min" : round(self.profit_min, 2),
+            "Max" : round(self.profit_max, 2),
+            "Sum" : round(self.profit_sum, 2),
+            "Mean" : round(self.profit_sum/self.transations_number, 2) if self.transations_number else np.nan
+        }, index=[0])
+    
+    
+    def score_by_week_day(self) -> pd.DataFrame:
+        """Get profit statistics grouped by day of the week (days without transactions are filled with 0)
+
+        Returns:
+            pd.DataFrame: statistics grouped by day of the week
+        """
+        
+        has_data = self.week_count > 0
+        
+        return pd.DataFrame({
+            "Min" : np.where(has_data, self.week_min, 0),
+            "Max" : np.where(has_data, self.week_max, 0),
+            "Sum" : self.week_sum
+        }, index=WEEK_DAYS).round(2)
+    
+    
+    def get_win_rate(self) -> tuple[float, float]:
+        """Calculating win and lose rate
+
+        Returns:
+            tuple[float, float]: rounded values of win and loss rate
+        """
+        
+        if not self.transations_number:
+            return 0.0, 0.0
+        
+        return round((self.wins/self.transations_number)*100, 2), round((self.losses/self.transations_number)*100, 2)
+    
+    
+    def get_transtions_duration(self) -> pd.DataFrame:
+        """Returns a DataFrame with the rounded value of the transaction duration
+
+        Returns:
+            pd.DataFrame: data frame with stats of deltatime
+        """
+        
+        return pd.DataFrame({
+            "Min" : round(self.duration_min, 2), # minute
+            "Max" : round(self.duration_max, 2),
+            "Sum" : round(self.duration_sum, 2),
+            "Mean" : round(self.duration_sum/self.transations_number, 2) if self.transations_number else np.nan
+        }, index=[0])
+    
+    
+    def get_unique_operation_types(self) -> pd.Series:
+        """Returns a series with the number of two transaction types (BUY/SELL)
+
+        Returns:
+            pd.Series: series with counted only two types
+        """
+        
+        # Mapping is done on unique types only, not on every transaction
+        operation_types = self.types.index.map(lambda x: "Sell" if "sell" in x.lower() else "Buy")
+        
+        return self.types.groupby(operation_types).sum() \
+                .sort_values(ascending=False, kind="stable") \
+                .rename_axis("Type")
+    
+    
+    def get_drawdown_stats(self) -> pd.DataFrame:
+        """Returns a DataFrame with the drawdown summary of the equity curve
+
+        Returns:
+            pd.DataFrame: data frame with max drawdown (absolute and %) and the longest drawdown in transactions
+        """
+        
+        return pd.DataFrame({
+            "Max drawdown" : round(self.max_drawdown, 2),
+            "Max drawdown %" : round(self.max_drawdown_pct, 2),
+            "Longest drawdown" : self.longest_drawdown # transactions
+        }, index=[0])
+    
+    
+    def merge(self, other: "ReportSummary") -> "ReportSummary":
+        """Merges partial statistics of two consecutive parts of the history
+
+        Args:
+            other (ReportSummary): statistics of transactions closed after this part
+
+        Returns:
+            ReportSummary: statistics of both parts
+        """
+        
+        def add_counts(left: pd.Series, right: pd.Series) -> pd.Series:
+            counts = left.add(right, fill_value=0).astype(np.int64)
+            return counts.sort_values(ascending=False, kind="stable").rename_axis(left.index.name).rename("count")
+        
+        return ReportSummary(
+            transations_number = self.transations_number + other.transations_number,
+            profit_min = float(np.fmin(self.profit_min, other.profit_min)),
+            profit_max = float(np.fmax(self.profit_max, other.profit_max)),
+            profit_sum = self.profit_sum + other.profit_sum,
+            week_count = self.week_count + other.week_count,
+            week_min = np.minimum(self.week_min, other.week_min),
+            week_max = np.maximum(self.week_max, other.week_max),
+            week_sum = self.week_sum + other.week_sum,
+            wins = self.wins + other.wins,
+            losses = self.losses + other.losses,
+            duration_min = float(np.fmin(self.duration_min, other.duration_min)),
+            duration_max = float(np.fmax(self.duration_max, other.duration_max)),
+            duration_sum = self.duration_sum + other.duration_sum,
+            symbols = add_counts(self.symbols, other.symbols),
+            types = add_counts(self.types, other.types),
+            lots = add_counts(self.lots, other.lots),
+            # Drawdown of the second part is already measured from the peak of the whole history
+            max_drawdown = min(self.max_drawdown, other.max_drawdown),
+            max_drawdown_pct = min(self.max_drawdown_pct, other.max_drawdown_pct),
+            longest_drawdown = max(self.longest_drawdown, other.longest_drawdown)
+        )
+    
+    
+    def to_dict(self) -> dict:
+        """Returns the summary as plain python values (e.g. for json)
+
+        Returns:
+            dict: values of all fields (missing values as None)
+        """
+        
+        values = {}
+        for field_name in self.__slots__:
+            value = getattr(self, field_name)
+            if isinstance(value, pd.Series):
+                value = {str(key): int(count) for key, count in value.items()}
+            elif isinstance(value, np.ndarray):
+                value = [item if np.isfinite(item) else None for item in value.tolist()]
+            elif isinstance(value, (float, np.floating)):
+                value = float(value) if np.isfinite(value) else None
+            elif isinstance(value, np.integer):
+                value = int(value)
+            values[field_name] = value
+            
+        return values
+
+
+@dataclass(slots=True)
+class AggregateCube():
+    symbols: list # labels of the axes
+    types: list
+    count: np.ndarray # symbol x type x day of the week x hour of closing
+    sum: np.ndarray
+    min: np.ndarray
+    max: np.ndarray
+    wins: np.ndarray
+    
+    # Names of the axes used in roll-ups
+    AXES = ("symbol", "type", "week_day", "hour")
+    
+    def rollup(self, keep: list[str], symbols: list | None = None,
+               types: list | None = None) -> dict[str, np.ndarray]:
+        """Aggregates cells of the cube over all axes which are not kept
+
+        Args:
+            keep (list[str]): kept axes ("symbol", "type", "week_day", "hour") in the cube order
+            symbols (list | None, optional): only these symbols, None takes all. Defaults to None.
+            types (list | None, optional): only these types, None takes all. Defaults to None.
+
+        Returns:
+            dict[str, np.ndarray]: "count", "sum", "min", "max" and "wins" of the kept axes
+        """
+        
+        # Drilldown selects a slice of the cube before reducing it
+        symbol_mask = np.ones(len(self.symbols), dtype=bool) if symbols is None else np.isin(self.symbols, symbols)
+        type_mask = np.ones(len(self.types), dtype=bool) if types is None else np.isin(self.types, types)
+        axes = tuple(number for number, axis in enumerate(self.AXES) if axis not in keep)
+        
+        cells = {}
+        for name, reduce in [("count", np.sum), ("sum", np.sum), ("min", np.min), ("max", np.max), ("wins", np.sum)]:
+            values = getattr(self, name)[symbol_mask][:, type_mask]
+            if values.size == 0:
+                # Empty selection keeps the shape of the kept axes
+                shape = [values.shape[number] for number in range(4) if number not in axes]
+                values = np.full(shape, {"min" : np.inf, "max" : -np.inf}.get(name, 0))
+            else:
+                values = reduce(values, axis=axes)
+            cells[name] = values
+        
+        return cells
+    
+    
+    def score_by_week_day(self) -> pd.DataFrame:
+        """Get profit statistics grouped by day of the week (days without transactions are filled with 0)
+
+        Returns:
+            pd.DataFrame: statistics grouped by day of the week
+        """
+        
+        cells = self.rollup(["week_day"])
+        has_data = cells["count"] > 0
+        
+        return pd.DataFrame({
+            "Min" : np.where(has_data, cells["min"], 0),
+            "Max" : np.where(has_data, cells["max"], 0),
+            "Sum" : cells["sum"]
+        }, index=WEEK_DAYS).round(2)
+    
+    
+    def count_by(self, axis: str) -> pd.Series:
+        """Returns the number of transactions of every symbol or type
+
+        Args:
+            axis (str): "symbol" or "type"
+
+        Returns:
+            pd.Series: counted values sorted from the most common
+        """
+        
+        labels = self.symbols if axis == "symbol" else self.types
+        counts = self.rollup([axis])["count"].astype(np.int64)
+        order = np.argsort(-counts, kind="stable")
+        order = order[counts[order] > 0]
+        
+        return pd.Series(counts[order], index=pd.Index(np.asarray(labels, dtype=object)[order],
+                         name="Symbol" if axis == "symbol" else "Type"), name="count")
+    
+    
+    def get_heatmap(self, value: str = "Sum", symbols: list | None = None,
+                    types: list | None = None) -> pd.DataFrame:
+        """Returns a statistic of every day of the week and hour of closing
+
+        Args:
+            value (str, optional): "Sum", "Count", "Mean", "Min", "Max" or "Win rate %". Defaults to "Sum".
+            symbols (list | None, optional): only these symbols, None takes all. Defaults to None.
+            types (list | None, optional): only these types, None takes all. Defaults to None.
+
+        Returns:
+            pd.DataFrame: days of the week in rows, hours in columns (NaN without transactions)
+        """
+        
+        cells = self.rollup(["week_day", "hour"], symbols, types)
+        count = cells["count"]
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = {
+                "Sum" : cells["sum"],
+                "Count" : count,
+                "Mean" : cells["sum"] / count,
+                "Min" : cells["min"],
+                "Max" : cells["max"],
+                "Win rate %" : cells["wins"] / count * 100
+            }[value]
+        
+        values = np.where(count > 0, values, np.nan)
+        if value in ("Sum", "Count"):
+            values = np.where(count > 0, values, 0)
+        
+        return pd.DataFrame(values, index=WEEK_DAYS, columns=pd.RangeIndex(24, name="Hour")).round(2)
+    
+    
+    def expand(self, symbols: list, types: list) -> "AggregateCube":
+        """Places the cube in larger axes (new cells are empty)
+
+        Args:
+            symbols (list): labels of the symbol axis which include all current labels
+            types (list): labels of the type axis which include all current labels
+
+        Returns:
+            AggregateCube: cube with the new axes
+        """
+        
+        symbol_positions = pd.Index(symbols).get_indexer(self.symbols)
+        type_positions = pd.Index(types).get_indexer(self.types)
+        cells = {}
+        for name, empty in [("count", 0), ("sum", 0.0), ("min", np.inf), ("max", -np.inf), ("wins", 0)]:
+            values = getattr(self, name)
+            cells[name] = np.full((len(symbols), len(types), 7, 24), empty, dtype=values.dtype)
+            cells[name][np.ix_(symbol_positions, type_positions)] = values
+            
+        return AggregateCube(list(symbols), list(types), **cells)
+    
+    
+    def merge(self, other: "AggregateCube") -> "AggregateCube":
+        """Merges cubes of two parts of the history
+
+        Args:
+            other (AggregateCube): cube of other transactions
+
+        Returns:
+            AggregateCube: cube of both parts
+        """
+        
+        symbols = self.symbols + [symbol for symbol in other.symbols if symbol not in set(self.symbols)]
+        types = self.types + [operation for operation in other.types if operation not in set(self.types)]
+        left, right = self.expand(symbols, types), other.expand(symbols, types)
+        
+        return AggregateCube(
+            symbols = symbols,
+            types = types,
+            count = left.count + right.count,
+            sum = left.sum + right.sum,
+            min = np.minimum(left.min, right.min),
+            max = np.maximum(left.max, right.max),
+            wins = left.wins + right.wins
+        )
+
+
+@dataclass(slots=True)
+class MonteCarloResult():
+    balance: float # starting value of account
+    ruin_balance: float # balance treated as ruin of the account
+    final_balance: np.ndarray # per simulation
+    max_drawdown: np.ndarray
+    max_drawdown_pct: np.ndarray
+    ruined: np.ndarray
+    band_positions: np.ndarray # transaction numbers of kept balances
+    band_balance: np.ndarray # simulation x band position
+    
+    def get_stats(self, percentiles: tuple = (5, 25, 50, 75, 95)) -> pd.DataFrame:
+        """Returns percentiles of the final balance and drawdown of simulations
+
+        Args:
+            percentiles (tuple, optional): returned percentiles. Defaults to (5, 25, 50, 75, 95).
+
+        Returns:
+            pd.DataFrame: percentiles in rows, statistics in columns
+        """
+        
+        return pd.DataFrame({
+            "Final balance" : np.percentile(self.final_balance, percentiles),
+            "Max drawdown" : np.percentile(self.max_drawdown, percentiles),
+            "Max drawdown %" : np.percentile(self.max_drawdown_pct, percentiles)
+        }, index=pd.Index([f"{percentile}%" for percentile in percentiles], name="Percentile")).round(2)
+    
+    
+    def get_risk(self) -> pd.DataFrame:
+        """Returns probabilities of ruin and of a loss
+
+        Returns:
+            pd.DataFrame: data frame with risk of ruin and probability of ending below the starting balance
+        """
+        
+        return pd.DataFrame({
+            "Simulations" : self.final_balance.size,
+            "Risk of ruin %" : round(float(self.ruined.mean()) * 100, 2),
+            "Ruin balance" : round(self.ruin_balance, 2),
+            "Loss probability %" : round(float((self.final_balance < self.balance).mean()) * 100, 2)
+        }, index=[0])
+    
+    
+    def get_bands(self, percentiles: tuple = (5, 25, 50, 75, 95)) -> pd.DataFrame:
+        """Returns percentile bands of the balance of simulations
+
+        Args:
+            percentiles (tuple, optional): returned percentiles. Defaults to (5, 25, 50, 75, 95).
+
+        Returns:
+            pd.DataFrame: transaction numbers in rows, percentiles in columns
+        """
+        
+        return pd.DataFrame(np.percentile(self.band_balance, percentiles, axis=0).T,
+                            index=pd.Index(self.band_positions, name="Transation"),
+                            columns=[f"{percentile}%" for percentile in percentiles])
 
 
 @dataclass
 class MakeStats():
     
-    def score_by_week_day(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Get profit statistics grouped by day of the week
+    def count_values(self, values: pd.Series) -> pd.Series:
+        """Counts values of a column with hashing (same result as value_counts)
 
         Args:
-            df (pd.DataFrame): DataFrame with statistics from trading
+            values (pd.Series): column of the data frame
 
         Returns:
-            pd.DataFrame: statistics grouped by day of the week
+            pd.Series: counted values sorted from the most common
+        """
+        
+        codes, uniques = pd.factorize(values, sort=False)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        order = np.argsort(-counts, kind="stable")
+        
+        return pd.Series(counts[order], index=pd.Index(np.asarray(uniques)[order], name=values.name), name="count")
+    
+    
+    def count_group_values(self, values: pd.Series, codes: np.ndarray, groups: int) -> list[pd.Series]:
+        """Counts values of a column separately in every group with one pass of hashing
+
+        Args:
+            values (pd.Series): column of the data frame
+            codes (np.ndarray): group code of every row (0 ... groups - 1)
+            groups (int): number of groups
+
+        Returns:
+            list[pd.Series]: counted values of every group sorted from the most common
+        """
+        
+        value_codes, uniques = pd.factorize(values, sort=False)
+        uniques = np.asarray(uniques)
+        known = value_codes >= 0
+        counts = np.bincount(codes[known] * len(uniques) + value_codes[known],
+                             minlength=groups * len(uniques)).reshape(groups, len(uniques))
+        
+        group_counts = []
+        for row in counts:
+            order = np.argsort(-row, kind="stable")
+            order = order[row[order] > 0]
+            group_counts.append(pd.Series(row[order], index=pd.Index(uniques[order], name=values.name), name="count"))
+            
+        return group_counts
+    
+    
+    def reduce_groups(self, ufunc: np.ufunc, values: np.ndarray, starts: np.ndarray,
+                      counts: np.ndarray, empty: float) -> np.ndarray:
+        """Reduces contiguous groups of sorted values (e.g. minimum of every group)
+
+        Args:
+            ufunc (np.ufunc): reducing function, e.g. np.minimum
+            values (np.ndarray): values sorted by group
+            starts (np.ndarray): position of the first value of every group
+            counts (np.ndarray): number of values in every group
+            empty (float): result of groups without values
+
+        Returns:
+            np.ndarray: reduced value of every group
+        """
+        
+        result = np.full(counts.size, empty, dtype=np.float64)
+        present = counts > 0
+        if present.any():
+            # Empty groups between starts have no values, so every segment belongs to one group
+            result[present] = ufunc.reduceat(values, starts[present])
+        
+        return result
+    
+    
+    def get_group_summaries(self, df: pd.DataFrame, codes: np.ndarray, groups: int) -> list[ReportSummary]:
+        """Calculates statistics of the report for every group (e.g. account) in one vectorized pass
+
+        Args:
+            df (pd.DataFrame): data frame with trading data
+            codes (np.ndarray): group code of every row (0 ... groups - 1)
+            groups (int): number of groups
+
+        Returns:
+            list[ReportSummary]: aggregated statistics of every group
         """
         
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", 
-                            "Friday", "Saturday", "Sunday"]
+        codes = np.asarray(codes, dtype=np.intp)
+        net_profit = df["Net profit"].to_numpy(dtype=np.float64)
+        deltatime = df["Deltatime"].to_numpy(dtype=np.float64)
+        drawdown = df["Drawdown"].to_numpy(dtype=np.float64)
+        drawdown_pct = df["Drawdown %"].to_numpy(dtype=np.float64)
+        drawdown_length = df["Drawdown length"].to_numpy(dtype=np.float64)
+        
+        # Grouping by day of the week with integer codes (group and day in one code)
+        week_codes = pd.Categorical(df["Week day"], categories=WEEK_DAYS).codes.astype(np.intp)
+        group_week_codes = codes * 7 + week_codes
+        week_count = np.bincount(group_week_codes, minlength=groups * 7).reshape(groups, 7)
+        week_sum = np.bincount(group_week_codes, weights=net_profit, minlength=groups * 7).reshape(groups, 7)
+        week_min = np.full(groups * 7, np.inf)
+        week_max = np.full(groups * 7, -np.inf)
+        np.minimum.at(week_min, group_week_codes, net_profit)
+        np.maximum.at(week_max, group_week_codes, net_profit)
+        week_min, week_max = week_min.reshape(groups, 7), week_max.reshape(groups, 7)
+        
+        counts = np.bincount(codes, minlength=groups)
+        profit_sum = np.bincount(codes, weights=net_profit, minlength=groups)
+        duration_sum = np.bincount(codes, weights=deltatime, minlength=groups)
+        wins = np.bincount(codes, weights=net_profit >= 0, minlength=groups).astype(np.int64)
         
-        # Get missing day of a week to fill it with value 0
-        missing_days = list(set(days).difference(set(df["Week day"].unique())))
+        # Extremes are reduced over contiguous groups (rows of one account are usually together)
+        if groups > 1 and np.any(codes[1:] < codes[:-1]):
+            order = np.argsort(codes, kind="stable")
+            net_profit, deltatime = net_profit[order], deltatime[order]
+            drawdown, drawdown_pct, drawdown_length = drawdown[order], drawdown_pct[order], drawdown_length[order]
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        profit_min = self.reduce_groups(np.minimum, net_profit, starts, counts, np.nan)
+        profit_max = self.reduce_groups(np.maximum, net_profit, starts, counts, np.nan)
+        duration_min = self.reduce_groups(np.minimum, deltatime, starts, counts, np.nan)
+        duration_max = self.reduce_groups(np.maximum, deltatime, starts, counts, np.nan)
+        max_drawdown = self.reduce_groups(np.minimum, drawdown, starts, counts, 0.0)
+        max_drawdown_pct = self.reduce_groups(np.minimum, drawdown_pct, starts, counts, 0.0)
+        longest_drawdown = self.reduce_groups(np.maximum, drawdown_length, starts, counts, 0)
+        
+        symbols = self.count_group_values(df["Symbol"], codes, groups)
+        types = self.count_group_values(df["Type"], codes, groups)
+        lots = self.count_group_values(df["Lots"], codes, groups)
+        
+        return [ReportSummary(
+            transations_number = int(counts[group]),
+            profit_min = float(profit_min[group]),
+            profit_max = float(profit_max[group]),
+            profit_sum = float(profit_sum[group]),
+            week_count = week_count[group],
+            week_min = week_min[group],
+            week_max = week_max[group],
+            week_sum = week_sum[group],
+            wins = int(wins[group]),
+            losses = int(counts[group] - wins[group]),
+            duration_min = float(duration_min[group]),
+            duration_max = float(duration_max[group]),
+            duration_sum = float(duration_sum[group]),
+            symbols = symbols[group],
+            types = types[group],
+            lots = lots[group],
+            max_drawdown = float(max_drawdown[group]),
+            max_drawdown_pct = float(max_drawdown_pct[group]),
+            longest_drawdown = int(longest_drawdown[group])
+        ) for group in range(groups)]
+    
+    
+    def get_aggregate_cube(self, df: pd.DataFrame) -> AggregateCube:
+        """Aggregates transactions by symbol, type, day of the week and hour of closing in one pass
 
-        df_grouped_by_day = df.groupby(["Week day"])["Net profit"].agg(["min", "max", "sum"])
-        df_grouped_by_day = pd.concat([df_grouped_by_day, pd.DataFrame({"min" : 0, "max" : 0, "sum" : 0}, 
-                                                                                index=missing_days)]).loc[days]
-        df_grouped_by_day = df_grouped_by_day.apply(lambda x: round(x, 2))
-        df_grouped_by_day.rename(columns={"min":"Min", "max":"Max", "sum":"Sum"}, inplace=True)
+        Args:
+            df (pd.DataFrame): data frame with trading data
 
-        return df_grouped_by_day
+        Returns:
+            AggregateCube: count, sum, min, max and wins of net profit in every cell
+        """
+        
+        net_profit = df["Net profit"].to_numpy(dtype=np.float64)
+        # Empty symbol or type is a label of its own (-1 code would be an invalid index of the cube)
+        symbol_codes, symbols = pd.factorize(df["Symbol"], sort=False, use_na_sentinel=False)
+        type_codes, types = pd.factorize(df["Type"], sort=False, use_na_sentinel=False)
+        close_time = df["Close time"].dt
+        
+        # One integer code of the cell for every transaction
+        shape = (len(symbols), len(types), 7, 24)
+        codes = np.ravel_multi_index((symbol_codes, type_codes, close_time.weekday.to_numpy(),
+                                      close_time.hour.to_numpy()), shape)
+        size = int(np.prod(shape))
+        
+        cell_min = np.full(size, np.inf)
+        cell_max = np.full(size, -np.inf)
+        np.minimum.at(cell_min, codes, net_profit)
+        np.maximum.at(cell_max, codes, net_profit)
+        
+        return AggregateCube(
+            symbols = [BLANK_LABEL if pd.isna(symbol) else symbol for symbol in np.asarray(symbols, dtype=object)],
+            types = [BLANK_LABEL if pd.isna(operation) else operation for operation in np.asarray(types, dtype=object)],
+            count = np.bincount(codes, minlength=size).reshape(shape),
+            sum = np.bincount(codes, weights=net_profit, minlength=size).reshape(shape),
+            min = cell_min.reshape(shape),
+            max = cell_max.reshape(shape),
+            wins = np.bincount(codes, weights=net_profit >= 0, minlength=size).astype(np.int64).reshape(shape)
+        )
+    
     
+    def get_report_summary(self, df: pd.DataFrame) -> ReportSummary:
+        """Calculates all statistics of the report in one vectorized pass
+
+        Args:
+            df (pd.DataFrame): data frame with trading data
+
+        Returns:
+            ReportSummary: aggregated statistics of the report
+        """
+        
+        return self.get_group_summaries(df, np.zeros(df.shape[0], dtype=np.intp), 1)[0]
     
-    def get_win_rate(self, df: pd.DataFrame) -> tuple[float, float]:
+    
+    def get_account_summaries(self, df: pd.DataFrame) -> dict[str, ReportSummary]:
+        """Calculates statistics of every account in one grouped pass over the joined data
+
+        Args:
+            df (pd.DataFrame): joined data frames of accounts with categorical 'Account' column
+
+        Returns:
+            dict[str, ReportSummary]: name of account mapped to its statistics
+        """
+        
+        accounts = df["Account"].cat
+        summaries = self.get_group_summaries(df, accounts.codes.to_numpy(), len(accounts.categories))
+        
+        return dict(zip(accounts.categories, summaries))
+    
+    
+    def get_combined_summary(self, summaries: list[ReportSummary], df_equity: pd.DataFrame) -> ReportSummary:
+        """Combines statistics of accounts into statistics of the portfolio
+
+        Args:
+            summaries (list[ReportSummary]): statistics of every account
+            df_equity (pd.DataFrame): combined equity curve with 'Drawdown', 'Drawdown %' and 'Drawdown length'
+
+        Returns:
+            ReportSummary: statistics of all transactions of all accounts
+        """
+        
+        summary = summaries[0]
+        for other in summaries[1:]:
+            summary = summary.merge(other)
+        
+        # Drawdown of the portfolio comes from the combined curve, not from the separate accounts
+        size = df_equity.shape[0]
+        return replace(summary,
+                       max_drawdown = float(df_equity["Drawdown"].min()) if size else 0.0,
+                       max_drawdown_pct = float(df_equity["Drawdown %"].min()) if size else 0.0,
+                       longest_drawdown = int(df_equity["Drawdown length"].max()) if size else 0)
+    
+    
+    def update_report_summary(self, summary: ReportSummary, df_new: pd.DataFrame) -> ReportSummary:
+        """Updates statistics of the report with new transactions only
+
+        Args:
+            summary (ReportSummary): statistics of the stored history
+            df_new (pd.DataFrame): formatted transactions appended to the history
+
+        Returns:
+            ReportSummary: statistics of the whole history
+        """
+        
+        return summary.merge(self.get_report_summary(df_new))
+    
+    
+    def score_by_week_day(self, df: pd.DataFrame, summary: ReportSummary|None = None) -> pd.DataFrame:
+        """Get profit statistics grouped by day of the week
+
+        Args:
+            df (pd.DataFrame): DataFrame with statistics from trading
+            summary (ReportSummary | None, optional): statistics already aggregated from df
+                (without it df is aggregated again). Defaults to None.
+
+        Returns:
+            pd.DataFrame: statistics grouped by day of the week
+        """
+        
+        summary = self.get_report_summary(df) if summary is None else summary
+        return summary.score_by_week_day()
+    
+    
+    def get_win_rate(self, df: pd.DataFrame, summary: ReportSummary|None = None) -> tuple[float, float]:
         """Calculating win and lose rate
 
         Args:
             df (pd.DataFrame): DataFrame with statistics from trading
+            summary (ReportSummary | None, optional): statistics already aggregated from df
+                (without it df is aggregated again). Defaults to None.
 
         Returns:
             tuple[float, float]: rounded values of win and loss rate
         """
         
-        score_counted = df["Score"].value_counts()
-        win_rate = round((score_counted["Profit"]/len(df))*100, 2)
-        loss_rate = round((score_counted["Minus"]/len(df))*100, 2)
-
-        return win_rate, loss_rate
+        summary = self.get_report_summary(df) if summary is None else summary
+        return summary.get_win_rate()
     
     
     def get_transations_number(self, df: pd.DataFrame) -> int:
@@ -62,16 +705,20 @@ class MakeStats():
         return df.shape[0]    
     
     
-    def get_assets(self, df: pd.DataFrame) -> pd.Series:
+    def get_assets(self, df: pd.DataFrame, summary: ReportSummary|None = None) -> pd.Series:
         """Returns a Series with the number of assets
 
         Args:
             df (pd.DataFrame): data frame with trading data
+            summary (ReportSummary | None, optional): statistics already aggregated from df
+                (without it df is aggregated again). Defaults to None.
 
         Returns:
             pd.Series: series with counted symbols
         """
-        return df["Symbol"].value_counts()
+        
+        summary = self.get_report_summary(df) if summary is None else summary
+        return summary.symbols
     
     
     def get_unique_assets(self, df: pd.DataFrame):
@@ -87,83 +734,374 @@ class MakeStats():
         return df["Symbol"].unique()
     
     
-    def get_operations_type(self, df: pd.DataFrame) -> pd.Series:
+    def get_operations_type(self, df: pd.DataFrame, summary: ReportSummary|None = None) -> pd.Series:
         """Returns a series with the number of transaction types
 
         Args:
             df (pd.DataFrame): data frame with trading data
+            summary (ReportSummary | None, optional): statistics already aggregated from df
+                (without it df is aggregated again). Defaults to None.
 
         Returns:
             pd.Series: series with counted types
         """
         
-        return df["Type"].value_counts()
+        summary = self.get_report_summary(df) if summary is None else summary
+        return summary.types
     
     
-    def get_unique_operation_types(self, df: pd.DataFrame) -> pd.Series:
+    def get_unique_operation_types(self, df: pd.DataFrame, summary: ReportSummary|None = None) -> pd.Series:
         """Returns a series with the number of two transaction types (BUY/SELL)
 
         Args:
             df (pd.DataFrame): data frame with trading data
+            summary (ReportSummary | None, optional): statistics already aggregated from df
+                (without it df is aggregated again). Defaults to None.
 
         Returns:
             pd.Series: series with counted only two types
         """
         
-        return df["Type"].map(lambda x: "Sell" if "sell" in x.lower() else "Buy").value_counts()  
+        summary = self.get_report_summary(df) if summary is None else summary
+        return summary.get_unique_operation_types()
     
     
-    def get_lot_amount(self, df: pd.DataFrame) -> pd.Series:
+    def get_lot_amount(self, df: pd.DataFrame, summary: ReportSummary|None = None) -> pd.Series:
         """Returns a series with the number of lot types
 
         Args:
             df (pd.DataFrame): data frame with trading data
+            summary (ReportSummary | None, optional): statistics already aggregated from df
+                (without it df is aggregated again). Defaults to None.
 
         Returns:
             pd.Series: series with counted lots
         """
         
-        return df["Lots"].value_counts()
+        summary = self.get_report_summary(df) if summary is None else summary
+        return summary.lots
     
     
-    def get_transtions_duration(self, df: pd.DataFrame) -> pd.DataFrame:
+    def get_transtions_duration(self, df: pd.DataFrame, summary: ReportSummary|None = None) -> pd.DataFrame:
         """Returns a DataFrame with the rounded value of the transaction duration
 
         Args:
             df (pd.DataFrame): data frame with trading data
+            summary (ReportSummary | None, optional): statistics already aggregated from df
+                (without it df is aggregated again). Defaults to None.
 
         Returns:
             pd.DataFrame: data frame with stats of deltatime
         """
         
-        return pd.DataFrame({
-            "Min" : round(df["Deltatime"].min(), 2), # minute
-            "Max" : round(df["Deltatime"].max(), 2),
-            "Sum" : round(df["Deltatime"].sum(), 2),
-            "Mean" : round(df["Deltatime"].mean(), 2)
-        }, index=[0]) 
+        summary = self.get_report_summary(df) if summary is None else summary
+        return summary.get_transtions_duration()
         
         
-    def get_profit_stats(self, df: pd.DataFrame) -> pd.DataFrame:
+    def get_profit_stats(self, df: pd.DataFrame, summary: ReportSummary|None = None) -> pd.DataFrame:
         """Returns a DataFrame with the rounded profit value
 
         Args:
             df (pd.DataFrame): data frame with trading data
+            summary (ReportSummary | None, optional): statistics already aggregated from df
+                (without it df is aggregated again). Defaults to None.
 
         Returns:
             pd.DataFrame: data frame with stats of profit
         """
         
-        return pd.DataFrame({
-            "Min" : round(df["Net profit"].min(), 2),
-            "Max" : round(df["Net profit"].max(), 2),
-            "Sum" : round(df["Net profit"].sum(), 2),
-            "Mean" : round(df["Net profit"].mean(), 2)
-        }, index=[0])
+        summary = self.get_report_summary(df) if summary is None else summary
+        return summary.get_profit_stats()
+        
+        
+    def get_drawdown_stats(self, df: pd.DataFrame, summary: ReportSummary|None = None) -> pd.DataFrame:
+        """Returns a DataFrame with the drawdown summary of the equity curve
+
+        Args:
+            df (pd.DataFrame): data frame with trading data
+            summary (ReportSummary | None, optional): statistics already aggregated from df
+                (without it df is aggregated again). Defaults to None.
+
+        Returns:
+            pd.DataFrame: data frame with max drawdown (absolute and %) and the longest drawdown in transactions
+        """
+
+        summary = self.get_report_summary(df) if summary is None else summary
+        return summary.get_drawdown_stats()
+
+
+    def get_equity_points(self, df: pd.DataFrame, max_points: int = 8) -> pd.DataFrame:
+        """Returns key points of the equity curve - start, end, the peak and the trough of the maximum
+        drawdown and the shape of the curve (Largest-Triangle-Three-Buckets)
+
+        Args:
+            df (pd.DataFrame): data frame with trading data
+            max_points (int, optional): number of points of the shape. Defaults to 8.
+
+        Returns:
+            pd.DataFrame: data frame with "Transation" (number), "Close time" and "Balance" of the points
+        """
+
+        if df.shape[0] == 0:
+            return pd.DataFrame({"Transation": [], "Close time": [], "Balance": []})
+
+        balance = df["Balance"].to_numpy(dtype=np.float64)
+        trough = int(np.argmin(df["Drawdown"].to_numpy()))
+        peak = trough - int(df["Drawdown length"].iloc[trough])
+        positions, _ = self.downsample_lttb(balance, max_points)
+        positions = np.unique(np.concatenate([positions, [max(peak, 0), trough]]))
+
+        return pd.DataFrame({"Transation": positions + 1,
+                             "Close time": df["Close time"].to_numpy()[positions],
+                             "Balance": balance[positions]})
+        
+        
+    def get_window_starts(self, df: pd.DataFrame, window: int | str) -> np.ndarray:
+        """Returns the position of the first transaction in the window ending at every transaction
+
+        Args:
+            df (pd.DataFrame): data frame with trading data sorted by 'Close time'
+            window (int | str): number of last transactions or time offset on 'Close time' (e.g. "30D")
+
+        Returns:
+            np.ndarray: start position of the window of every transaction
+        """
+        
+        positions = np.arange(df.shape[0])
+        if isinstance(window, (int, np.integer)):
+            return np.maximum(positions - int(window) + 1, 0)
+        
+        # Binary search of the oldest transaction closed inside the time window
+        close_time = df["Close time"].to_numpy()
+        return np.searchsorted(close_time, close_time - pd.Timedelta(window).to_timedelta64(), side="right")
+    
+    
+    def get_rolling_stats(self, df: pd.DataFrame, window: int | str = 100) -> pd.DataFrame:
+        """Calculates statistics of a sliding window from cumulative sums (cost does not depend on the window)
+
+        Args:
+            df (pd.DataFrame): data frame with trading data sorted by 'Close time'
+            window (int | str, optional): number of last transactions or time offset on 'Close time'
+                (e.g. "30D"). Defaults to 100.
+
+        Returns:
+            pd.DataFrame: statistics of the window ending at every transaction (count windows are
+                empty until they are full)
+        """
+        
+        net_profit = df["Net profit"].to_numpy(dtype=np.float64)
+        starts = self.get_window_starts(df, window)
+        
+        def window_sum(values: np.ndarray) -> np.ndarray:
+            # Sum of the window is a difference of two prefix sums
+            prefix = np.concatenate([[0.0], np.cumsum(values, dtype=np.float64)])
+            return prefix[1:] - prefix[starts]
+        
+        win = net_profit >= 0
+        trades = np.arange(1, net_profit.size + 1) - starts
+        wins = window_sum(win)
+        losses = trades - wins
+        win_sum = window_sum(np.where(win, net_profit, 0.0))
+        loss_sum = window_sum(np.where(win, 0.0, net_profit))
+        
+        # Values are centered before squaring, so large sums do not cancel out
+        centered = net_profit - (net_profit.mean() if net_profit.size else 0.0)
+        centered_sum = window_sum(centered)
+        squares_sum = window_sum(centered ** 2)
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            expectancy = (win_sum + loss_sum) / trades
+            variance = (squares_sum - centered_sum ** 2 / trades) / (trades - 1)
+            volatility = np.where(trades > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+            
+            df_rolling = pd.DataFrame({
+                "Close time" : df["Close time"].to_numpy(),
+                "Trades" : trades,
+                "Win rate %" : wins / trades * 100,
+                "Average win" : np.where(wins > 0, win_sum / wins, np.nan),
+                "Average loss" : np.where(losses > 0, loss_sum / losses, np.nan),
+                "Expectancy" : expectancy,
+                "Profit factor" : np.where(loss_sum < 0, win_sum / -loss_sum, np.nan),
+                "Volatility" : volatility,
+                "Sharpe ratio" : np.where(volatility > 0, expectancy / volatility, np.nan) # per transaction
+            })
+        
+        if isinstance(window, (int, np.integer)):
+            df_rolling.iloc[:int(window) - 1, 2:] = np.nan
+        
+        return df_rolling
+    
+    
+    def simulate_chunk(self, net_profit: np.ndarray, balance: float, ruin_balance: float, simulations: int,
+                       method: str, seed: np.random.SeedSequence, band_positions: np.ndarray) -> dict[str, np.ndarray]:
+        """Simulates a chunk of equity curves as one array (run in a worker process)
+
+        Args:
+            net_profit (np.ndarray): net profit of transactions of the history
+            balance (float): starting value of account
+            ruin_balance (float): balance treated as ruin of the account
+            simulations (int): number of simulations in the chunk
+            method (str): "bootstrap" (draw with replacement) or "permutation" (shuffle the order)
+            seed (np.random.SeedSequence): seed of the chunk
+            band_positions (np.ndarray): transaction numbers of kept balances
+
+        Returns:
+            dict[str, np.ndarray]: final balance, drawdowns, ruin and kept balances of every simulation
+        """
+        
+        rng = np.random.default_rng(seed)
+        if method == "permutation":
+            curves = rng.permuted(np.broadcast_to(net_profit, (simulations, net_profit.size)), axis=1)
+        else:
+            curves = net_profit[rng.integers(0, net_profit.size, (simulations, net_profit.size), dtype=np.int32)]
+        
+        # Buffers are reused in place, so the chunk needs about two curves arrays
+        np.cumsum(curves, axis=1, out=curves)
+        curves += balance
+        peak = np.maximum.accumulate(curves, axis=1)
+        np.maximum(peak, balance, out=peak)
+        lowest = curves.min(axis=1)
+        
+        result = {
+            "final_balance" : curves[:, -1].copy(),
+            "ruined" : lowest <= ruin_balance,
+            "band_balance" : curves[:, band_positions]
+        }
+        
+        np.subtract(curves, peak, out=curves)
+        result["max_drawdown"] = curves.min(axis=1)
+        
+        # Drawdown % is 0 while the peak is not positive (same as get_equity_curve)
+        np.divide(curves, peak, out=curves, where=peak > 0)
+        if balance <= 0:
+            curves[peak <= 0] = 0
+        result["max_drawdown_pct"] = curves.min(axis=1) * 100
+        
+        return result
+    
+    
+    def simulate_monte_carlo(self, net_profit: np.ndarray, balance: float, simulations: int = 10_000,
+                             method: str = "bootstrap", seed: int = 0, ruin_loss: float = 0.5,
+                             executor: Executor | None = None) -> MonteCarloResult:
+        """Simulates equity curves by resampling the transactions of the history
+
+        Simulations are split into chunks of limited memory, every chunk has its own seed derived
+        from the main seed, so results do not depend on the number of processes.
+
+        Args:
+            net_profit (np.ndarray): net profit of transactions of the history
+            balance (float): starting value of account
+            simulations (int, optional): number of simulations. Defaults to 10_000.
+            method (str, optional): "bootstrap" or "permutation". Defaults to "bootstrap".
+            seed (int, optional): seed of the simulation. Defaults to 0.
+            ruin_loss (float, optional): lost part of the starting balance treated as ruin. Defaults to 0.5.
+            executor (Executor | None, optional): pool of processes for chunks, None runs here. Defaults to None.
+
+        Returns:
+            MonteCarloResult: distribution of results of simulations
+        """
         
+        net_profit = np.ascontiguousarray(net_profit, dtype=np.float64)
+        size = max(net_profit.size, 1)
+        ruin_balance = balance * (1 - ruin_loss)
+        band_positions = np.unique(np.linspace(0, size - 1, min(BAND_POINTS, size)).astype(np.intp))
+        if net_profit.size == 0:
+            empty = np.zeros(0)
+            return MonteCarloResult(balance, ruin_balance, empty, empty, empty, empty.astype(bool),
+                                    np.zeros(0, dtype=np.intp), np.zeros((0, 0)))
         
+        chunk_size = max(1, min(simulations, SIMULATION_CHUNK_BYTES // (size * 8)))
+        chunks = [min(chunk_size, simulations - start) for start in range(0, simulations, chunk_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+        args = [(net_profit, balance, ruin_balance, chunk, method, chunk_seed, band_positions)
+                for chunk, chunk_seed in zip(chunks, seeds)]
+        
+        if executor is None:
+            results = [self.simulate_chunk(*chunk_args) for chunk_args in args]
+        else:
+            results = [future.result() for future in [executor.submit(self.simulate_chunk, *chunk_args)
+                                                      for chunk_args in args]]
+        
+        joined = {name: np.concatenate([result[name] for result in results]) for name in results[0]}
+        
+        return MonteCarloResult(balance=balance, ruin_balance=ruin_balance, band_positions=band_positions + 1, **joined)
+    
+    
+    def downsample_minmax(self, values: np.ndarray, max_points: int) -> tuple[np.ndarray, np.ndarray]:
+        """Reduces a series to the minimum and maximum of equal buckets (keeps peaks and troughs)
+
+        Args:
+            values (np.ndarray): values of the series
+            max_points (int): maximum number of returned points
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: positions and values of the selected points
+        """
+        
+        size = values.size
+        buckets = (max_points - 2) // 2 # first and last points are always kept
+        if size <= max_points or buckets < 1:
+            return np.arange(size), values
+        
+        # Last bucket is padded with NaN which are skipped by nanargmin/nanargmax
+        bucket_size = -(-size // buckets)
+        padded = np.full(-(-size // bucket_size) * bucket_size, np.nan)
+        padded[:size] = values
+        padded = padded.reshape(-1, bucket_size)
+        
+        offsets = np.arange(padded.shape[0]) * bucket_size
+        positions = np.concatenate([offsets + np.nanargmin(padded, axis=1),
+                                    offsets + np.nanargmax(padded, axis=1)])
+        positions = np.unique(np.concatenate([[0, size - 1], positions]))
+        
+        return positions, values[positions]
+    
+    
+    def downsample_lttb(self, values: np.ndarray, max_points: int) -> tuple[np.ndarray, np.ndarray]:
+        """Reduces a series with the Largest-Triangle-Three-Buckets algorithm
+
+        Args:
+            values (np.ndarray): values of the series
+            max_points (int): maximum number of returned points
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: positions and values of the selected points
+        """
+        
+        size = values.size
+        if size <= max_points or max_points < 3:
+            return np.arange(size), values
+        
+        # First and last points are always kept, the rest is split into max_points - 2 buckets
+        edges = np.linspace(1, size - 1, max_points - 1).astype(np.intp)
+        positions = np.empty(max_points, dtype=np.intp)
+        positions[0], positions[-1] = 0, size - 1
+        
+        selected = 0
+        for bucket in range(max_points - 2):
+            start, end = edges[bucket], edges[bucket + 1]
+            
+            # Average point of the next bucket (or the last point)
+            if bucket + 2 < edges.size:
+                next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+            else:
+                next_start, next_end = size - 1, size
+            next_x = (next_start + next_end - 1) / 2
+            next_y = values[next_start:next_end].mean()
+            
+            # Point which makes the largest triangle with the selected point and the next average
+            candidates = np.arange(start, end)
+            areas = np.abs((selected - next_x) * (values[start:end] - values[selected])
+                           - (selected - candidates) * (next_y - values[selected]))
+            selected = start + int(np.argmax(areas))
+            positions[bucket + 1] = selected
+        
+        return positions, values[positions]
+    
+    
     def plot_line(self, df_data: pd.Series | np.ndarray,
-                    xlabel: str, ylabel: str, title: str) -> plt.Figure: # type: ignore
+                    xlabel: str, ylabel: str, title: str,
+                    max_points: int | None = LINE_MAX_POINTS, method: str = "lttb") -> plt.Figure: # type: ignore
         """Function generate line chart
 
         Args:
@@ -171,13 +1109,23 @@ class MakeStats():
             xlabel (str): name of xlabel
             ylabel (str): name of ylabel
             title (str): title of chart
+            max_points (int | None, optional): maximum number of drawn points, None draws all. Defaults to LINE_MAX_POINTS.
+            method (str, optional): decimation of long series - "lttb" or "minmax". Defaults to "lttb".
 
         Returns:
             plt.Figure: figure of chart
         """
         
+        values = np.asarray(df_data, dtype=np.float64)
+        if max_points is None:
+            positions = np.arange(values.size)
+        elif method == "minmax":
+            positions, values = self.downsample_minmax(values, max_points)
+        else:
+            positions, values = self.downsample_lttb(values, max_points)
+        
         fig, ax = plt.subplots()
-        ax.plot(df_data)
+        ax.plot(positions, values)
 
         ax.grid(True, alpha=0.25)
         ax.set_title(title)
@@ -187,6 +1135,145 @@ class MakeStats():
         return fig
     
     
+    def plot_equity_curves(self, df_equity: pd.DataFrame, title: str,
+                           max_points: int | None = LINE_MAX_POINTS) -> plt.Figure: # type: ignore
+        """Function generate line chart of the combined equity curve and the balance of every account
+
+        Args:
+            df_equity (pd.DataFrame): combined equity curve with 'Close time', 'Balance' and 'Balance <account>' columns
+            title (str): title of chart
+            max_points (int | None, optional): maximum number of drawn points of every line, None draws all.
+                Defaults to LINE_MAX_POINTS.
+
+        Returns:
+            plt.Figure: figure of chart
+        """
+        
+        close_time = df_equity["Close time"].to_numpy()
+        lines = {"Combined" : "Balance"} | {column[len("Balance "):]: column for column in df_equity.columns
+                                            if column.startswith("Balance ")}
+        
+        fig, ax = plt.subplots()
+        for label, column in lines.items():
+            values = df_equity[column].to_numpy(dtype=np.float64)
+            if max_points is None:
+                positions = np.arange(values.size)
+            else:
+                positions, values = self.downsample_minmax(values, max_points)
+            ax.plot(close_time[positions], values, label=label, linewidth=2 if label == "Combined" else 1)
+        
+        ax.grid(True, alpha=0.25)
+        ax.legend()
+        ax.set_title(title)
+        ax.set_ylabel("Balance")
+        ax.set_xlabel("Close time", labelpad=10)
+        fig.autofmt_xdate()
+        
+        return fig
+    
+    
+    def plot_rolling_stats(self, df_rolling: pd.DataFrame, title: str,
+                           max_points: int | None = LINE_MAX_POINTS) -> plt.Figure: # type: ignore
+        """Function generate line charts of the rolling statistics
+
+        Args:
+            df_rolling (pd.DataFrame): rolling statistics from get_rolling_stats
+            title (str): title of chart
+            max_points (int | None, optional): maximum number of drawn points of every line, None draws all.
+                Defaults to LINE_MAX_POINTS.
+
+        Returns:
+            plt.Figure: figure with one chart per statistic
+        """
+        
+        close_time = df_rolling["Close time"].to_numpy()
+        columns = ["Win rate %", "Expectancy", "Profit factor", "Trades",
+                   "Average win", "Average loss", "Volatility", "Sharpe ratio"]
+        fig, axes = plt.subplots(2, 4, figsize=(16, 6), sharex=True)
+        
+        for ax, column in zip(axes.flat, columns):
+            values = df_rolling[column].to_numpy(dtype=np.float64)
+            if max_points is None:
+                positions = np.arange(values.size)
+            else:
+                # Lines are reduced without the empty beginning of the window
+                valid = np.flatnonzero(np.isfinite(values))
+                positions, _ = self.downsample_minmax(values[valid], max_points)
+                positions = valid[positions]
+            ax.plot(close_time[positions], values[positions])
+            ax.grid(True, alpha=0.25)
+            ax.set_title(column)
+            ax.tick_params(axis="x", labelrotation=45)
+        
+        fig.suptitle(title)
+        fig.tight_layout()
+        
+        return fig
+    
+    
+    def plot_heatmap(self, df_data: pd.DataFrame, title: str) -> plt.Figure: # type: ignore
+        """Function generate heatmap of a statistic by day of the week and hour
+
+        Args:
+            df_data (pd.DataFrame): days of the week in rows, hours in columns
+            title (str): title of chart
+
+        Returns:
+            plt.Figure: figure of chart
+        """
+        
+        values = df_data.to_numpy(dtype=np.float64)
+        fig, ax = plt.subplots(figsize=(12, 4))
+        
+        # Profit and loss have colors of the same strength around zero
+        limit = np.nanmax(np.abs(values)) if np.isfinite(values).any() else 1.0
+        diverging = np.nanmin(values, initial=0) < 0 if np.isfinite(values).any() else False
+        image = ax.imshow(values, aspect="auto", cmap="RdYlGn" if diverging else "viridis",
+                          vmin=-limit if diverging else None, vmax=limit if diverging else None)
+        fig.colorbar(image, ax=ax)
+        
+        ax.set_xticks(np.arange(df_data.shape[1]), labels=df_data.columns)
+        ax.set_yticks(np.arange(df_data.shape[0]), labels=df_data.index)
+        ax.set_title(title)
+        ax.set_xlabel("Hour of closing", labelpad=10)
+        
+        return fig
+    
+    
+    def plot_monte_carlo(self, df_bands: pd.DataFrame, balance: np.ndarray, title: str) -> plt.Figure: # type: ignore
+        """Function generate chart of percentile bands of simulated equity curves
+
+        Args:
+            df_bands (pd.DataFrame): percentile bands (transaction numbers in rows, percentiles in columns)
+            balance (np.ndarray): balance of the history at the same transactions
+            title (str): title of chart
+
+        Returns:
+            plt.Figure: figure of chart
+        """
+        
+        positions = df_bands.index.to_numpy()
+        columns = list(df_bands.columns)
+        fig, ax = plt.subplots()
+        
+        # Outer percentiles are drawn as wider and lighter bands around the median
+        for number in range(len(columns) // 2):
+            ax.fill_between(positions, df_bands[columns[number]], df_bands[columns[-1 - number]],
+                            alpha=0.2 + 0.2 * number, color="tab:blue", linewidth=0,
+                            label=f"{columns[number]} - {columns[-1 - number]}")
+        if len(columns) % 2:
+            ax.plot(positions, df_bands[columns[len(columns) // 2]], color="tab:blue", label=f"{columns[len(columns) // 2]} (median)")
+        ax.plot(positions, balance, color="black", linewidth=1, label="History")
+        
+        ax.grid(True, alpha=0.25)
+        ax.legend()
+        ax.set_title(title)
+        ax.set_ylabel("Balance")
+        ax.set_xlabel("Transation number", labelpad=10)
+        
+        return fig
+    
+    
     def plot_bars(self, df_data: pd.Series | pd.DataFrame,
                     xlabel: str, ylabel: str, 
                     title: str, direction: str = "v") -> plt.Figure: # type: ignore
@@ -219,6 +1306,66 @@ class MakeStats():
         return fig
     
     
+    def plot_durations(self, df: pd.DataFrame, top_value: int = 5, bins: int = 40,
+                       max_points: int = LINE_MAX_POINTS) -> plt.Figure: # type: ignore
+        """Function generate charts of the transaction duration distribution
+
+        Args:
+            df (pd.DataFrame): data frame with trading data
+            top_value (int, optional): number of the most common symbols with box summary. Defaults to 5.
+            bins (int, optional): number of histogram bins. Defaults to 40.
+            max_points (int, optional): maximum number of drawn transactions. Defaults to LINE_MAX_POINTS.
+
+        Returns:
+            plt.Figure: figure with histogram, box summary per symbol and duration of transactions
+        """
+        
+        deltatime = df["Deltatime"].to_numpy(dtype=np.float64)
+        fig, (ax_hist, ax_box, ax_trades) = plt.subplots(1, 3, figsize=(14, 4), width_ratios=[1, 1, 2])
+        
+        # Histogram with logarithmic bins (durations under one second are counted in the first bin)
+        if deltatime.size:
+            positive = deltatime[deltatime > 0]
+            min_time = max(positive.min(), 1/60) if positive.size else 1/60
+            max_time = max(deltatime.max(), min_time * 10)
+            counts, edges = np.histogram(np.clip(deltatime, min_time, None),
+                                         bins=np.logspace(np.log10(min_time), np.log10(max_time), bins + 1))
+            ax_hist.stairs(counts, edges, fill=True)
+        ax_hist.set_xscale("log")
+        ax_hist.grid(True, alpha=0.25)
+        ax_hist.set_title("Duration distribution")
+        ax_hist.set_ylabel("Transations")
+        ax_hist.set_xlabel("Time [minute]", labelpad=10)
+        
+        # Box summary from precomputed quantiles (whiskers at 5th and 95th percentile)
+        symbols = self.count_values(df["Symbol"]).index[:top_value]
+        df_top = df[df["Symbol"].isin(symbols)]
+        quantiles = df_top.groupby("Symbol", observed=True)["Deltatime"].quantile([0.05, 0.25, 0.5, 0.75, 0.95]).unstack()
+        box_stats = [{"label" : str(symbol),
+                      "whislo" : quantiles.loc[symbol, 0.05], "q1" : quantiles.loc[symbol, 0.25],
+                      "med" : quantiles.loc[symbol, 0.5],
+                      "q3" : quantiles.loc[symbol, 0.75], "whishi" : quantiles.loc[symbol, 0.95]}
+                     for symbol in symbols]
+        if box_stats:
+            ax_box.bxp(box_stats, showfliers=False)
+        ax_box.grid(True, alpha=0.25)
+        ax_box.set_title("Duration by asset")
+        ax_box.set_ylabel("Time [minute]")
+        ax_box.tick_params(axis="x", labelrotation=45)
+        
+        # Duration of every transaction reduced to the extreme values of buckets
+        positions, values = self.downsample_minmax(deltatime, max_points)
+        ax_trades.vlines(positions, 0, values, linewidth=0.8)
+        ax_trades.grid(True, alpha=0.25)
+        ax_trades.set_title("Time duration on single transation")
+        ax_trades.set_ylabel("Time [minute]")
+        ax_trades.set_xlabel("Transation", labelpad=10)
+        
+        fig.tight_layout()
+        
+        return fig
+    
+    
     def plot_pie(self, df_data: pd.Series | pd.DataFrame, title: str) -> plt.Figure: # type: ignore
         """Function generate pie chart
 
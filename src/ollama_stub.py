@@ -0,0 +1,181 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timezone
+import argparse
+import json
+import threading
+import time
+
+
+# Answer of the stand-in server (the question is repeated at the beginning)
+STUB_ANSWER = ("This answer comes from the stand-in server of Ollama. It streams one word at a time "
+               "in the same format as the real server, so the page can be tested without a model.")
+
+
+class OllamaStubHandler(BaseHTTPRequestHandler):
+    """Handler imitating the streaming API of Ollama (/api/generate and /api/tags)"""
+
+    # Set by make_server
+    model = "llama2"
+    token_delay = 0.05 # seconds between tokens
+    first_token_delay = 0.5 # seconds of "reading" the prompt
+
+    def log_message(self, format: str, *args) -> None:
+        # Requests are not printed (the server runs next to the tests)
+        return None
+
+
+    def send_json(self, data: dict, status: int = 200) -> None:
+        """Sends one json object as the whole response
+
+        Args:
+            data (dict): body of the response
+            status (int, optional): http status. Defaults to 200.
+        """
+
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def do_GET(self) -> None:
+        if self.path == "/api/tags":
+            self.send_json({"models" : [{"name" : f"{self.model}:latest", "model" : f"{self.model}:latest"}]})
+        else:
+            self.send_json({"error" : "not found"}, 404)
+
+
+    def do_POST(self) -> None:
+        if self.path != "/api/generate":
+            self.send_json({"error" : "not found"}, 404)
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if request.get("model", "").split(":")[0] != self.model:
+            self.send_json({"error" : f"model '{request.get('model')}' not found, try pulling it first"}, 404)
+            return
+
+        question = request.get("prompt", "").strip().splitlines()[-1:] or [""]
+        words = f"{question[0]} - {STUB_ANSWER}".split(" ")
+        started_at = time.perf_counter()
+        time.sleep(self.first_token_delay)
+
+        if not request.get("stream", True):
+            time.sleep(self.token_delay * len(words))
+            self.send_json(self.get_chunk(model=request["model"], response=" ".join(words), done=True,
+                                          eval_count=len(words), started_at=started_at))
+            return
+
+        # One json object per line, the end of the response closes the connection (HTTP/1.0)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for number, word in enumerate(words):
+                self.write_chunk(self.get_chunk(model=request["model"], response=word if number == 0 else f" {word}",
+                                                done=False))
+                time.sleep(self.token_delay)
+            self.write_chunk(self.get_chunk(model=request["model"], response="", done=True,
+                                            eval_count=len(words), started_at=started_at))
+
+        except (BrokenPipeError, ConnectionResetError):
+            # Client stopped reading - generation is cancelled like in Ollama
+            return
+
+
+    def get_chunk(self, model: str, response: str, done: bool, eval_count: int = 0,
+                  started_at: float | None = None) -> dict:
+        """Returns one object of the stream
+
+        Args:
+            model (str): name of the model
+            response (str): token of the answer
+            done (bool): True for the last object
+            eval_count (int, optional): number of tokens (only the last object). Defaults to 0.
+            started_at (float | None, optional): start of the request (only the last object). Defaults to None.
+
+        Returns:
+            dict: object in the format of Ollama
+        """
+
+        chunk = {"model" : model, "created_at" : datetime.now(timezone.utc).isoformat(),
+                 "response" : response, "done" : done}
+        if done:
+            total_duration = int((time.perf_counter() - started_at) * 1e9)
+            chunk |= {"total_duration" : total_duration, "eval_count" : eval_count,
+                      "eval_duration" : int(eval_count * self.token_delay * 1e9)}
+
+        return chunk
+
+
+    def write_chunk(self, data: dict) -> None:
+        """Writes one line of the stream and sends it at once
+
+        Args:
+            data (dict): object of the stream
+        """
+
+        self.wfile.write(json.dumps(data).encode() + b"\n")
+        self.wfile.flush()
+
+
+def make_server(host: str = "127.0.0.1", port: int = 11434, model: str = "llama2",
+                token_delay: float = 0.05, first_token_delay: float = 0.5) -> ThreadingHTTPServer:
+    """Returns the stand-in server of Ollama (every request is served in its own thread)
+
+    Args:
+        host (str, optional): address of the server. Defaults to "127.0.0.1".
+        port (int, optional): port of the server, 0 picks a free one. Defaults to 11434.
+        model (str, optional): name of the only served model. Defaults to "llama2".
+        token_delay (float, optional): seconds between tokens. Defaults to 0.05.
+        first_token_delay (float, optional): seconds before the first token. Defaults to 0.5.
+
+    Returns:
+        ThreadingHTTPServer: server (not started)
+    """
+
+    handler = type("OllamaStub", (OllamaStubHandler,), {"model" : model, "token_delay" : token_delay,
+                                                        "first_token_delay" : first_token_delay})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+
+    return server
+
+
+def start_server(**kwargs) -> ThreadingHTTPServer:
+    """Starts the stand-in server in a background thread
+
+    Args:
+        kwargs: settings of make_server
+
+    Returns:
+        ThreadingHTTPServer: running server (its address is server.server_address, stop with server.shutdown())
+    """
+
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, name="ollama-stub", daemon=True).start()
+
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stand-in server of the Ollama streaming API")
+    parser.add_argument("--host", default="127.0.0.1", help="address of the server")
+    parser.add_argument("--port", type=int, default=11434, help="port of the server")
+    parser.add_argument("--model", default="llama2", help="name of the served model")
+    parser.add_argument("--token-delay", type=float, default=0.05, help="seconds between tokens")
+    parser.add_argument("--first-token-delay", type=float, default=0.5, help="seconds before the first token")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.model, args.token_delay, args.first_token_delay)
+    print(f"Ollama stand-in serving '{args.model}' on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,17 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-from data_reader import DataReader
-from make_stats import MakeStats
-import matplotlib.pyplot as plt
+from data_reader import REPORT_COLUMNS
+from date_parser import DATE_FORMATS
+from trade_index import TradeIndex, SIDES
+from resource_manager import QueueFullError
+import report_pipeline
+import instrumentation
+import resource_manager
 from streamlit_extras.add_vertical_space import add_vertical_space
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 
 
-plt.style.use('seaborn-v0_8-pastel')
 st.set_page_config(
     page_title = "Trading report",
     page_icon = "📈",
@@ -20,12 +22,50 @@ st.set_page_config(
 # Adding line to sidebar
 with st.sidebar:
     st.write("")
+    
+    # Invalidate cached reports (memory and disk)
+    if st.button("Clear report cache"):
+        report_pipeline.clear_cache()
+        st.toast("Report cache cleared")
+    
+    # Optional timings of the pipeline stages (no measuring when disabled)
+    show_timings = st.toggle("Show pipeline timings")
+    if show_timings:
+        trace_memory = st.checkbox("Trace memory (slower)")
+        log_timings = st.checkbox("Write timings to logs")
+    timings_panel = st.container()
+    resources_panel = st.container()
+
+
+# Profiler of this run
+profiler = instrumentation.Profiler(enabled=show_timings,
+                                    trace_memory=show_timings and trace_memory,
+                                    log=show_timings and log_timings)
+instrumentation.activate(profiler)
+
+
+# Sections of the report (only the opened one is calculated)
+REPORT_SECTIONS = ["Summary", "Charts", "Durations", "Assets", "Heatmap", "Rolling", "Filters", "Monte Carlo",
+                   "Transations"]
+TABLE_PAGE_SIZES = [50, 100, 500, 1000]
 
 
 # Title of page
 st.subheader("Report Generator 📄", divider="blue")
 
 
+# Position of this session while other reports are generated
+queue_status = st.empty()
+
+def show_queue_position(position: int) -> None:
+    if position:
+        queue_status.info(f"Waiting for other reports - position in queue: {position}", icon="⏳")
+    else:
+        queue_status.empty()
+
+resource_manager.activate_waiter(show_queue_position)
+
+
 # Container with data settings
 container_input = st.container(border=True)
 left_input, right_input = container_input.columns(2)
@@ -33,51 +73,144 @@ left_input, right_input = container_input.columns(2)
 
 # Configuring the left input column
 with left_input:
-    uploaded_file = st.file_uploader("Upload file")
+    uploaded_files = st.file_uploader("Upload file", accept_multiple_files=True,
+                                      help="Several files are compared as accounts (or appended in order in the incremental mode)")
     
     
 # Configuring the right column
 with right_input:
     # DataFrame for renaming columns for user data
     header_settings = st.data_editor(
-        pd.DataFrame({"System columns": ["Symbol", "Type", "Lots", "Open time", "Close time", "Net profit"],
-                      "User columns": ["", "", "", "", "", ""]}),
+        pd.DataFrame({"System columns": list(REPORT_COLUMNS),
+                      "User columns": [""] * len(REPORT_COLUMNS)}),
         use_container_width=True,
         disabled=("System columns",),
         hide_index=True
     )
     # Choosing a date format in dataset
-    date_format = st.selectbox("Date format", ["%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M",
-                                               "%d-%m-%Y %H:%M:%S", "%d-%m-%Y %H:%M"])
+    date_format = st.selectbox("Date format", [None] + DATE_FORMATS,
+                               format_func=lambda date_format: "Auto detect" if date_format is None else date_format)
 
     # Balance input
     balance = st.number_input("Balance account", min_value=0.00, placeholder="Balance")
     
+    # Incremental mode - new exports are merged into the history of this session
+    append_mode = st.toggle("Append to history",
+                            help="Only new transactions (by 'Position', or by open time, close time and symbol "
+                                 "without positions) are added to the previous report")
+    if append_mode and st.session_state.get("history") is not None:
+        if st.button("Reset history"):
+            st.session_state["history"] = None
+    
    
 # Button to start generating report
 btn_start = st.button("Generate")
 
-# Objects for data reader and making statistics
-data_reader = DataReader()
-make_stats = MakeStats()
+# Report stays visible on next reruns, cached stages skip the unchanged work
+if btn_start:
+    st.session_state["generate_report"] = True
 
 # Generating a report
-if btn_start:
+if st.session_state.get("generate_report", False):
+    
+    # Run if files were uploaded and they are in csv format
+    if any(os.path.splitext(uploaded_file.name)[1] != ".csv" for uploaded_file in uploaded_files):
+        st.error("Need .csv file format")
+        st.stop()
     
-    # Run if file was uploaded and it is a csv format
-    if uploaded_file is not None:
-        if os.path.splitext(uploaded_file.name)[1] != ".csv":
-            st.error("Need .csv file format")
+    # Get column name for rename
+    header_settings = header_settings[header_settings["User columns"] != ""]
+    header = tuple(sorted(dict(header_settings[["User columns", "System columns"]].values).items()))
+    
+    # Accounts comparison - all files are aggregated in one grouped pass
+    if len(uploaded_files) > 1 and not append_mode:
+        # Number of the upload keeps files with the same name apart (only the base name is used)
+        accounts = report_pipeline.get_account_names([f"{number}/{uploaded_file.name}"
+                                                      for number, uploaded_file in enumerate(uploaded_files)])
+        files_bytes = tuple(uploaded_file.getvalue() for uploaded_file in uploaded_files)
+        files = tuple((account, report_pipeline.get_file_hash(file_bytes))
+                      for account, file_bytes in zip(accounts.values(), files_bytes))
+        accounts_args = (files, files_bytes, header, date_format, balance)
+        
+        try:
+            with instrumentation.stage("accounts_stage"):
+                result = report_pipeline.accounts_stage(*accounts_args)
+            
+            # Comparison of accounts is not one report for the AI-Support page
+            st.session_state["report_source"] = None
+            
+            for account, malformed_rows in result["malformed_rows"].items():
+                if malformed_rows:
+                    st.warning(f"{account}: skipped {len(malformed_rows)} rows with malformed dates")
+        
+        except pd.errors.ParserError:
+            st.error("File Reading Error")
+            st.stop()
+
+        except ValueError:
+            st.error("Value Error")
+            st.stop()
+
+        except QueueFullError:
+            st.error("Server is busy, try again in a moment")
+            st.stop()
+
+        except Exception as e:
+            st.error("Unknown Error")
             st.stop()
         
-        # Get column name for rename
-        header_settings = header_settings[header_settings["User columns"] != ""]
-        new_header = dict(header_settings[["User columns", "System columns"]].values)
+        with st.spinner("Generating..."):
+            with instrumentation.stage("accounts_figures_stage"):
+                figures = report_pipeline.accounts_figures_stage(*accounts_args)
+            
+            st.subheader("Accounts 📊", divider="blue")
+            accounts_stats = result["accounts"] | {"Combined" : result["combined"]}
+            
+            st.write("Stats - Accounts")
+            st.dataframe(report_pipeline.get_accounts_table(accounts_stats), use_container_width=True)
+            
+            # Balance of accounts and of the whole portfolio in time
+            st.image(figures["equity"], use_column_width=True)
+            
+            container_accounts = st.container()
+            left_accounts, right_accounts = container_accounts.columns(2)
+            
+            with left_accounts:
+                st.image(figures["week_data"], use_column_width=True)
+                st.write("Stats - Week net profit")
+                st.dataframe(report_pipeline.get_accounts_week_table(accounts_stats), use_container_width=True)
+                
+            with right_accounts:
+                st.image(figures["win_rate"], use_column_width=True)
+                st.write("Stats - Duration [minute]")
+                st.dataframe(pd.concat({account: stats["duration_time"].iloc[0] for account, stats in accounts_stats.items()},
+                                       axis=1).T.rename_axis("Account"), use_container_width=True)
+            
+            add_vertical_space(5)
+    
+    elif uploaded_files:
+        # Key of cached stages
+        uploaded_file = uploaded_files[-1]
+        file_bytes = uploaded_file.getvalue()
+        file_hash = report_pipeline.get_file_hash(file_bytes)
+        stage_args = (file_hash, file_bytes, header, date_format, balance)
         
         try:
-            df_data = data_reader.load_file(uploaded_file)
-            df_data = data_reader.rename_header(df_data, new_header)
-            df_data = data_reader.format_data_frame(df_data, date_format, balance)
+            if append_mode:
+                # Files are appended in the order of uploading
+                history = st.session_state.get("history")
+                for uploaded_file in uploaded_files:
+                    file_bytes = uploaded_file.getvalue()
+                    with instrumentation.stage("append_stage"):
+                        history = report_pipeline.append_stage(history, report_pipeline.get_file_hash(file_bytes),
+                                                               file_bytes, header, date_format, balance)
+                st.session_state["history"] = history
+                stats = history["stats"]
+            else:
+                # Only the statistics are calculated up front, transactions are read by sections which show them
+                with instrumentation.stage("stats_stage") as stage:
+                    stats = report_pipeline.stats_stage(*stage_args)
+                    stage.rows = stats["df_size"]
 
         except pd.errors.ParserError:
             st.error("File Reading Error")
@@ -87,123 +220,291 @@ if btn_start:
             st.error("Value Error")
             st.stop()
 
+        except QueueFullError:
+            st.error("Server is busy, try again in a moment")
+            st.stop()
+
         except Exception as e:
             st.error("Unknown Error")
             st.stop()
+        
+        # Report discussed on the AI-Support page (its summary is built there when needed from the shared
+        # stages or the disk cache, the content of the file is not kept in the session)
+        st.session_state["report_source"] = {"mode" : "history", "balance" : balance} if append_mode \
+                                            else {"mode" : "file", "stage_args" : (file_hash, None, header,
+                                                                                   date_format, balance)}
+        
+        # Rows with malformed dates are skipped, not the whole file
+        malformed_rows = stats.get("malformed_rows", [])
+        if malformed_rows:
+            st.warning(f"Skipped {len(malformed_rows)} rows with malformed dates (rows: "
+                       + ", ".join(str(row + 1) for row in malformed_rows[:10])
+                       + (", ..." if len(malformed_rows) > 10 else "") + ")")
+        
+        
+        def get_figures(names: tuple) -> dict[str, bytes]:
+            """Returns charts of the opened section (rendered once, then taken from the cache)"""
+            
+            with instrumentation.stage("figures_stage", stats["df_size"]):
+                if append_mode:
+                    return report_pipeline.history_figures_stage(history["fingerprint"], history, names)
+                return report_pipeline.figures_stage(*stage_args, names)
+        
+        
+        # Only the opened section is calculated and rendered
+        section = st.radio("Section", REPORT_SECTIONS, horizontal=True, key="report_section",
+                           label_visibility="collapsed")
+        add_vertical_space(1)
+        
+        try:
+            if section == "Summary":
+                container_summary = st.container()
+                left_summary, right_summary = container_summary.columns(2)
             
+                with left_summary, instrumentation.stage("tables summary"):
+                    st.write("Stats - Net profit")
+                    st.data_editor(stats["profit_stats"], use_container_width=True, hide_index=True, disabled=True)
+                
+                    add_vertical_space(0)
+                    st.write("Stats - Drawdown")
+                    st.data_editor(stats["drawdown_stats"], use_container_width=True, hide_index=True, disabled=True)
+                
+                with right_summary, instrumentation.stage("tables week"):
+                    st.write("Stats - Week net profit")
+                    st.data_editor(stats["week_data"], use_container_width=True, disabled=True)
+                
+                    add_vertical_space(0)
+                    st.write("Stats - Win/Loss rate %")
+                    st.data_editor(pd.DataFrame([stats["win_rate"]], columns=["Win", "Loss"]), use_container_width=True,
+                                   hide_index=True, disabled=True)
+        
+            # ----------------- #
+        
+            elif section == "Charts":
+                with st.spinner("Generating..."):
+                    figures = get_figures(("net_profit", "accumulated_profit", "balance", "win_rate", "week_data"))
             
-        with st.spinner("Generating..."):
-            st.dataframe(df_data, use_container_width=True, hide_index=True)
-            add_vertical_space(3)
-            st.subheader("Statistics 📊", divider="blue")
-            
-            profit_stats       = make_stats.get_profit_stats(df_data)
-            week_data          = make_stats.score_by_week_day(df_data)
-            win_rate = make_stats.get_win_rate(df_data)
-            duration_time      = make_stats.get_transtions_duration(df_data)
-            symbols          = make_stats.get_assets(df_data)
-            transations_type = make_stats.get_operations_type(df_data)
-            lots             = make_stats.get_lot_amount(df_data)
-            df_size                  = make_stats.get_transations_number(df_data)
-            
-            # ----------------- # 
-            
-            # Columns for stats
-            container_first = st.container()
-            left_first, right_first = container_first.columns(2)
-            
-            # Net profit in time
-            with left_first:
-                st.pyplot(make_stats.plot_line(df_data["Net profit"],
-                                                "Transation number", "Net profit", 
-                                                "Net profit in time"))
+                # Columns for stats
+                container_first = st.container()
+                left_first, right_first = container_first.columns(2)
+            
+                # Net profit in time
+                with left_first, instrumentation.stage("chart net_profit"):
+                    st.image(figures["net_profit"], use_column_width=True)
+                
+                # Accumulated net profit    
+                with right_first, instrumentation.stage("chart accumulated_profit"):
+                    st.image(figures["accumulated_profit"], use_column_width=True)
                 
-            # Accumulated net profit    
-            with right_first:
-                st.pyplot(make_stats.plot_line(np.cumsum(df_data["Net profit"]),
-                                                "Transation number", "Accumulated net profit", 
-                                                "Accumulated net profit in time"))
+                container_second = st.container()
+                left_second, right_second = container_second.columns(2)
+            
+                # Balance in time
+                with left_second, instrumentation.stage("chart balance"):
+                    st.image(figures["balance"], use_column_width=True)
+            
+                # Win rate
+                with right_second, instrumentation.stage("chart win_rate"):
+                    st.image(figures["win_rate"], use_column_width=True)
                 
-            # ----------------- # 
+                # Profit by week day
+                with instrumentation.stage("chart week_data"):
+                    st.image(figures["week_data"], use_column_width=True)
+        
+            # ----------------- #
+        
+            elif section == "Durations":
+                with st.spinner("Generating..."):
+                    figures = get_figures(("duration",))
             
-            container_second = st.container()
-            left_second, right_second = container_second.columns(2)
+                # Duration time
+                with instrumentation.stage("chart duration"):
+                    st.image(figures["duration"], use_column_width=True)
+                    st.data_editor(stats["duration_time"], use_container_width=True, hide_index=True, disabled=True)
+        
+            # ----------------- #
+        
+            elif section == "Assets":
+                with st.spinner("Generating..."):
+                    figures = get_figures(("symbols", "transations_type", "lots"))
             
-            # Balance in time
-            with left_second:
-                st.pyplot(make_stats.plot_line(df_data["Balance"],
-                                                "Transation number", "Balance", 
-                                                "Balance value in time"))
+                container_fourth = st.container()
+                left_fourth, mid_fourth, right_fourth = container_fourth.columns(3)  
             
-            # Profit in table
-            with right_second:
-                add_vertical_space(2)
-                st.write("Stats - Net profit")
-                st.data_editor(profit_stats, use_container_width=True, hide_index=True, disabled=True)
-
-                add_vertical_space(0)
-                st.write("Stats - Week net profit")
-                st.data_editor(week_data, use_container_width=True, disabled=True)
-                           
-            # ----------------- # 
-            
-            container_third = st.container()
-            left_third, right_third = container_third.columns(2)
-            
-            # Win rate
-            with left_third:
-                st.pyplot(make_stats.plot_bars(pd.Series(win_rate, index=["Win", "Loss"]),
-                                                "Percent %", "Status", 
-                                                "Win/Loss rate", "h"))
+                top_value = 5
+                # Symbol stats
+                with left_fourth, instrumentation.stage("chart symbols"):
+                    st.image(figures["symbols"], use_column_width=True)
+                    st.data_editor(stats["symbols"].reset_index().rename(columns={"count": "Count"}).iloc[:top_value], 
+                                   use_container_width=True, hide_index=True, disabled=True)
                 
-            # Profit by week day
-            with right_third:
-                st.pyplot(make_stats.plot_bars(week_data[["Min", "Max", "Sum"]],
-                                                "Week day", "Net profit", 
-                                                "Stats - Week net profit", "v"))
+                # Type transation stats
+                with mid_fourth, instrumentation.stage("chart transations_type"):
+                    st.image(figures["transations_type"], use_column_width=True)
+                    st.data_editor(stats["transations_type"].reset_index().rename(columns={"count": "Count"}).iloc[:top_value], 
+                                   use_container_width=True, hide_index=True, disabled=True)
                 
+                # Lots stats
+                with right_fourth, instrumentation.stage("chart lots"):
+                    st.image(figures["lots"], use_column_width=True)
+                    st.data_editor(stats["lots"].reset_index().rename(columns={"count": "Count"}).iloc[:top_value], 
+                                   use_container_width=True, hide_index=True, disabled=True)
+        
             # ----------------- #
+        
+            elif section == "Heatmap":
+                # Drilldown of the aggregate cube - only the roll-up is calculated, not the transactions
+                container_heatmap = st.container()
+                left_heatmap, right_heatmap = container_heatmap.columns([1, 4])
             
-            # Duration time
-            fig_dur, ax_dur = plt.subplots(figsize=(12, 4), dpi=3000)
-            df_data["Deltatime"].plot.bar(ax=ax_dur).grid(True, alpha=0.25)
-            ax_dur.set_title("Time duration on single transation")
-            ax_dur.set_ylabel("Time [minute]")
-            ax_dur.set_xlabel("Transation", labelpad=10)
+                with left_heatmap:
+                    add_vertical_space(2)
+                    heatmap_value = st.selectbox("Heatmap value", ["Sum", "Mean", "Count", "Win rate %", "Min", "Max"])
+                    heatmap_symbols = tuple(st.multiselect("Heatmap symbols", stats["cube"].symbols, placeholder="All symbols"))
+                    heatmap_types = tuple(st.multiselect("Heatmap types", stats["cube"].types, placeholder="All types"))
             
-            # Make space between x ticks
-            if df_size > 50:
-                ax_dur.set_xticks(range(0, df_size, df_size//10))
-            st.pyplot(fig_dur)
-            st.data_editor(duration_time, use_container_width=True, hide_index=True, disabled=True)
+                with right_heatmap, instrumentation.stage("chart heatmap"):
+                    if append_mode:
+                        st.image(report_pipeline.render_heatmap_figure(stats["cube"], heatmap_value, heatmap_symbols,
+                                                                       heatmap_types), use_column_width=True)
+                    else:
+                        st.image(report_pipeline.heatmap_figure_stage(*stage_args, heatmap_value, heatmap_symbols,
+                                                                      heatmap_types), use_column_width=True)
+        
+            # ----------------- #
+        
+            elif section == "Rolling":
+                # Rolling statistics - the window is changed without generating the report again
+                container_rolling = st.container()
+                left_rolling, right_rolling = container_rolling.columns([1, 4])
             
-            st.divider()
+                with left_rolling:
+                    add_vertical_space(2)
+                    window_type = st.radio("Rolling window", ["Transations", "Days"], horizontal=True)
+                    if window_type == "Transations":
+                        window = int(st.number_input("Last transations", min_value=2, value=100, step=10))
+                    else:
+                        window = f"{int(st.number_input('Last days', min_value=1, value=30))}D"
             
+                with right_rolling, instrumentation.stage("chart rolling"):
+                    if append_mode:
+                        st.image(report_pipeline.history_rolling_figure_stage(history["fingerprint"], history, window),
+                                 use_column_width=True)
+                    else:
+                        st.image(report_pipeline.rolling_figure_stage(*stage_args, window), use_column_width=True)
+        
             # ----------------- #
+        
+            elif section == "Filters":
+                # Filters - statistics come from the index, the report is not calculated again
+                if append_mode:
+                    if history.get("index") is None:
+                        with instrumentation.stage("build_trade_index", stats["df_size"]):
+                            history["index"] = TradeIndex.from_frame(history["df_data"])
+                    trade_index = history["index"]
+                else:
+                    with instrumentation.stage("index_stage"):
+                        trade_index = report_pipeline.index_stage(*stage_args)
             
-            container_fourth = st.container()
-            left_fourth, mid_fourth, right_fourth = container_fourth.columns(3)  
+                container_filters = st.container()
+                left_filters, right_filters = container_filters.columns([1, 2])
             
-            top_value = 5
-            # Symbol stats
-            with left_fourth:
-                st.pyplot(make_stats.plot_pie(symbols.iloc[:top_value], "Assets"))
-                st.data_editor(symbols.reset_index().rename(columns={"count": "Count"}).iloc[:top_value], 
-                               use_container_width=True, hide_index=True, disabled=True)
-                
-            # Type transation stats
-            with mid_fourth:
-                st.pyplot(make_stats.plot_pie(transations_type.iloc[:top_value], "Type"))
-                st.data_editor(transations_type.reset_index().rename(columns={"count": "Count"}).iloc[:top_value], 
-                               use_container_width=True, hide_index=True, disabled=True)
-                
-            # Lots stats
-            with right_fourth:
-                st.pyplot(make_stats.plot_pie(lots.iloc[:top_value], "Lots"))
-                st.data_editor(lots.reset_index().rename(columns={"count": "Count"}).iloc[:top_value], 
-                               use_container_width=True, hide_index=True, disabled=True)
-                
-            add_vertical_space(5)
+                with left_filters:
+                    time_range = (None, None)
+                    close_time = trade_index.close_time
+                    if close_time.size and close_time[0] < close_time[-1]:
+                        first_time = pd.Timestamp(close_time[0]).floor("min").to_pydatetime()
+                        last_time = pd.Timestamp(close_time[-1]).ceil("min").to_pydatetime()
+                        time_range = st.slider("Close time", min_value=first_time, max_value=last_time,
+                                               value=(first_time, last_time), step=timedelta(minutes=1),
+                                               format="YYYY-MM-DD HH:mm")
+                    filter_symbols = st.multiselect("Symbols", trade_index.symbols, placeholder="All symbols")
+                    filter_sides = st.multiselect("Type", SIDES, placeholder="Buy and Sell")
+            
+                with right_filters, instrumentation.stage("filters", stats["df_size"]):
+                    st.write("Stats - Filtered transations")
+                    st.dataframe(trade_index.get_filter_stats(*time_range, filter_symbols, filter_sides),
+                                 use_container_width=True, hide_index=True)
+                    st.line_chart(trade_index.get_balance_curve(*time_range, filter_symbols, filter_sides),
+                                  x="Close time", y="Balance", height=250)
+        
+            # ----------------- #
+        
+            elif section == "Monte Carlo":
+                # Monte Carlo simulation - started on demand, results of the same settings are cached
+                container_monte_carlo = st.container()
+                left_monte_carlo, right_monte_carlo = container_monte_carlo.columns([1, 4])
+            
+                with left_monte_carlo:
+                    add_vertical_space(2)
+                    simulations = int(st.number_input("Simulations", min_value=100, max_value=100_000, value=1000, step=100))
+                    simulation_method = st.selectbox("Simulation method", ["bootstrap", "permutation"],
+                                                     help="Draw transactions with replacement or shuffle their order")
+                    ruin_loss = st.slider("Ruin at loss of balance %", min_value=5, max_value=100, value=50) / 100
+                    simulation_seed = int(st.number_input("Seed", min_value=0, value=0))
+                    # Simulation is shown only for the data and settings it was started with
+                    monte_carlo_args = (balance, simulations, simulation_method, ruin_loss, simulation_seed)
+                    monte_carlo_key = (history["fingerprint"] if append_mode else (file_hash, header, date_format),
+                                       monte_carlo_args)
+                    if st.button("Run simulation"):
+                        st.session_state["monte_carlo"] = monte_carlo_key
             
+                with right_monte_carlo:
+                    if st.session_state.get("monte_carlo") == monte_carlo_key and stats["df_size"]:
+                        with st.spinner("Simulating..."), instrumentation.stage("monte_carlo"):
+                            if append_mode:
+                                monte_carlo = report_pipeline.history_monte_carlo_stage(history["fingerprint"], history,
+                                                                                        *monte_carlo_args)
+                            else:
+                                monte_carlo = report_pipeline.monte_carlo_stage(*stage_args[:4], *monte_carlo_args)
+                        st.image(monte_carlo["figure"], use_column_width=True)
+                        st.data_editor(monte_carlo["risk"], use_container_width=True, hide_index=True, disabled=True)
+                        st.data_editor(monte_carlo["stats"], use_container_width=True, disabled=True)
+        
+            # ----------------- #
+        
+            elif section == "Transations":
+                if append_mode:
+                    df_data = history["df_data"]
+                else:
+                    with instrumentation.stage("format_stage", stats["df_size"]):
+                        df_data = report_pipeline.format_stage(*stage_args)
+            
+                # Only one page of rows is sent to the browser
+                container_pages = st.container()
+                left_pages, right_pages = container_pages.columns([1, 4])
+            
+                with left_pages:
+                    page_size = st.selectbox("Rows per page", TABLE_PAGE_SIZES, index=1)
+                    pages_number = max(1, -(-df_data.shape[0] // page_size))
+                    page = int(st.number_input(f"Page (of {pages_number})", min_value=1, max_value=pages_number, value=1))
+                    first_row = (min(page, pages_number) - 1) * page_size
+                    st.caption(f"Rows {min(first_row + 1, df_data.shape[0])}-{min(first_row + page_size, df_data.shape[0])} "
+                               f"of {df_data.shape[0]}")
+            
+                with right_pages, instrumentation.stage("table", page_size):
+                    st.dataframe(df_data.iloc[first_row:first_row + page_size], use_container_width=True, hide_index=True)
+        
+        except QueueFullError:
+            st.error("Server is busy, try again in a moment")
+        
+        add_vertical_space(5)
+        
     else:
-        st.error("No file")
\ No newline at end of file
+        st.error("No file")
+
+
+# Timings of this run in the sidebar
+if profiler.enabled:
+    with timings_panel:
+        st.dataframe(profiler.to_frame().drop(columns="started_at"), use_container_width=True, hide_index=True)
+        st.download_button("Download timings (json)", profiler.to_json(),
+                           file_name="report_timings.json", mime="application/json")
+
+# Memory and queue of the whole server (shared by all sessions)
+with resources_panel:
+    metrics = report_pipeline.resources.get_metrics()
+    st.progress(min(metrics["memory_mb"] / metrics["budget_mb"], 1.0) if metrics["budget_mb"] else 1.0,
+                text=f"Report memory: {metrics['memory_mb']} / {metrics['budget_mb']} MB")
+    st.caption(f"Generating: {metrics['running']} / {metrics['max_generations']}, queued: {metrics['queued']}, "
+               f"cached: {metrics['entries']} (evicted: {metrics['evictions']})")
@@ -1,8 +1,17 @@
 import streamlit as st
+import pandas as pd
 import platform
-from langchain_community.llms import Ollama
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+import uuid
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import AIMessage, HumanMessage
+from llm_cache import ResponseCache
+from llm_gateway import LLMGateway
+from resource_manager import QueueFullError
+from report_context import ContextBuilder, CONTEXT_MAX_TOKENS, NO_REPORT_CONTEXT, estimate_tokens
+import llm_backend
+import report_pipeline
+import instrumentation
+import resource_manager
 
 
 st.set_page_config(
@@ -11,22 +20,84 @@ st.set_page_config(
 )
 
 
+# Stages of the Report page run without its timings and queue placeholder (set by its previous runs)
+instrumentation.activate(None)
+resource_manager.activate_waiter(None)
+
+
+SYSTEM_PROMPT = "You are a humble but very experienced mathematician and have knowledge in the field of finance."
+
+
 ## Preparing AI model
+# One gateway (queue and workers) for all sessions, so the model is never overloaded
+@st.cache_resource
+def load_gateway(backend: str, model: str, url: str):
+    return LLMGateway(llm_backend.get_stream_function(backend, model, url))
+
+# Answers shared by all sessions (memory and disk)
 @st.cache_resource
-def load_llama_model():
-    return Ollama(model="llama2")
+def load_response_cache():
+    return ResponseCache()
 
-# Load llama model
-llm = load_llama_model()
+# Load llama model (or the fake one for tests without Ollama)
+gateway = load_gateway(llm_backend.LLM_BACKEND, llm_backend.LLM_MODEL, llm_backend.OLLAMA_URL)
+model_name = llm_backend.get_model_name()
+response_cache = load_response_cache()
 ai_prompt = ChatPromptTemplate.from_messages([
-    ("system", "You are a humble but very experienced mathematician and have knowledge in the field of finance."),
+    ("system", SYSTEM_PROMPT + "\n\n{context}"),
+    MessagesPlaceholder("history"),
     ("user", "{input}")
 ])
-chain = ai_prompt | llm | StrOutputParser()
+context_builder = ContextBuilder()
+
+# Requests of this session are served in turn with other sessions (a new question cancels the previous one)
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+
+
+## Summary of the last report of this session (built once per dataset, the trade table is never sent)
+def get_report_context() -> str:
+    source = st.session_state.get("report_source")
+    if source is None:
+        return NO_REPORT_CONTEXT
+    
+    if source["mode"] == "history":
+        history = st.session_state.get("history")
+        if history is None:
+            return NO_REPORT_CONTEXT
+        return report_pipeline.get_history_context(history, source["balance"], CONTEXT_MAX_TOKENS)
+    
+    return report_pipeline.context_stage(*source["stage_args"], CONTEXT_MAX_TOKENS)
 
 # Sidebar for current model (only one)
 with st.sidebar:
-    st.text_input("Current model", "llama2", disabled=True)
+    st.text_input("Current model", model_name, disabled=True)
+    
+    # Same question is answered from the cache instead of the model
+    use_cache = st.toggle("Reuse cached answers", value=True)
+    if st.button("Clear answer cache"):
+        response_cache.clear()
+        st.toast("Answer cache cleared")
+    cache_panel = st.container()
+    gateway_panel = st.container()
+    
+    # Statistics of the generated report are added to the prompt
+    use_report = st.toggle("Use my report", value=True, help="Summary of the report generated on the Report page")
+    try:
+        report_context = get_report_context() if use_report else NO_REPORT_CONTEXT
+    
+    except QueueFullError:
+        report_context = NO_REPORT_CONTEXT
+        st.warning("Server is busy, the report is not used in this answer")
+    
+    except report_pipeline.SourceExpiredError:
+        report_context = NO_REPORT_CONTEXT
+        st.warning("Report is no longer cached, generate it again on the Report page")
+    
+    except Exception:
+        report_context = NO_REPORT_CONTEXT
+        st.warning("Summary of the report could not be prepared")
+    with st.expander(f"Report context (~{estimate_tokens(report_context)} tokens)"):
+        st.text(report_context)
     
     
 # Main chat
@@ -51,10 +122,70 @@ if user_prompt := st.chat_input(placeholder="Your question...", max_chars=255):
                                          "content": user_prompt,
                                          "avatar": "😎"})
     
-    ai_response = chain.stream({"input": user_prompt})
+    # Newest messages within the budget (without the greeting and the current question)
+    history = context_builder.truncate_history(st.session_state["messages"][1:-1])
+    chain_input = {
+        "input": user_prompt,
+        "context": report_context,
+        "history": [HumanMessage(msg["content"]) if msg["role"] == "user" else AIMessage(msg["content"])
+                    for msg in history]
+    }
+    
+    prompt = ai_prompt.format(**chain_input)
+    
     with st.chat_message("assistant", avatar="🧠"):
-        ai_response = st.write_stream(ai_response)
+        queue_status = st.empty()
+        
+        # Position in the queue of the model, cleared before the first token
+        def show_queue_position(position: int) -> None:
+            if position:
+                queue_status.caption(f"Waiting for the model - position in queue: {position}")
+            else:
+                queue_status.empty()
+        
+        generate = lambda: gateway.stream(session_id, prompt, on_wait=show_queue_position)
+        if use_cache:
+            cache_key = response_cache.get_key(user_prompt, model_name, SYSTEM_PROMPT, report_context,
+                                               *(f"{msg['role']}: {msg['content']}" for msg in history))
+            ai_response = response_cache.stream(cache_key, generate, model_name)
+        else:
+            ai_response = generate()
+        
+        try:
+            ai_response = st.write_stream(ai_response)
+        except QueueFullError as e:
+            ai_response = None
+            st.error(f"{e}. Try again in a moment.")
+        except (OSError, RuntimeError) as e:
+            ai_response = None
+            st.error(f"The model is not available: {e}")
+
+    # Question without an answer is not kept in the history
+    if ai_response is None:
+        st.session_state["messages"].pop()
+    else:
+        st.session_state["messages"].append({"role": "assistant", 
+                                             "content": ai_response,
+                                             "avatar": "🧠"})
+
+
+# Use of the cache after this run
+with cache_panel:
+    st.caption(f"Cached answers - hits: {response_cache.hits}, misses: {response_cache.misses}")
 
-    st.session_state["messages"].append({"role": "assistant", 
-                                         "content": ai_response,
-                                         "avatar": "🧠"})
+# Load of the model and latency of the requests
+with gateway_panel:
+    state = gateway.get_state()
+    st.caption(f"Model - workers: {state['workers']}, running: {state['running']}, queued: {state['queued']}")
+    df_metrics = gateway.get_metrics()
+    df_session = df_metrics[df_metrics["session_id"] == session_id]
+    if not df_session.empty:
+        last = df_session.iloc[0]
+        col_wait, col_ttft, col_speed = st.columns(3)
+        col_wait.metric("Queue wait", "-" if pd.isna(last["queue_wait"]) else f"{last['queue_wait']:.2f} s")
+        col_ttft.metric("TTFT", "-" if pd.isna(last["ttft"]) else f"{last['ttft']:.2f} s",
+                        help="Time to first token (queue included)")
+        col_speed.metric("Tokens/s", "-" if pd.isna(last["tokens_per_second"]) else f"{last['tokens_per_second']:.1f}")
+    if not df_metrics.empty:
+        with st.expander("Recent requests"):
+            st.dataframe(df_metrics.drop(columns="session_id"), hide_index=True)
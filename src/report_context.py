@@ -0,0 +1,149 @@
+import pandas as pd
+from dataclasses import dataclass
+import math
+import os
+
+
+# Token budgets of the AI-Support prompt (can be changed with environment variables)
+CONTEXT_MAX_TOKENS = int(os.environ.get("STOCK_REPORT_LLM_CONTEXT_TOKENS", 600))
+HISTORY_MAX_TOKENS = int(os.environ.get("STOCK_REPORT_LLM_HISTORY_TOKENS", 800))
+
+# Context used before any report was generated
+NO_REPORT_CONTEXT = "The user has not generated a trading report yet."
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of tokens of llama2 without its tokenizer
+
+    Digits are separate tokens of llama2, other text has about 4 characters per token.
+
+    Args:
+        text (str): text of the prompt
+
+    Returns:
+        int: estimated number of tokens
+    """
+
+    digits = sum(char.isdigit() for char in text)
+    return digits + math.ceil((len(text) - digits) / 4)
+
+
+def format_number(value: float) -> str:
+    """Returns a short text of the number (digits are expensive tokens)
+
+    Args:
+        value (float): number
+
+    Returns:
+        str: number rounded to 2 decimal places without trailing zeros
+    """
+
+    value = round(float(value), 2)
+    return str(int(value)) if value.is_integer() else f"{value:.2f}".rstrip("0")
+
+
+@dataclass
+class ContextBuilder():
+    max_tokens: int = CONTEXT_MAX_TOKENS
+    top_values: int = 5
+
+    def get_lines(self, stats: dict, df_equity: pd.DataFrame, balance: float) -> list[tuple[str, list[str]]]:
+        """Returns lines of the context from the most to the least important
+
+        Args:
+            stats (dict): all statistics of the report (see report_pipeline.get_stats)
+            df_equity (pd.DataFrame): key points of the equity curve (see MakeStats.get_equity_points)
+            balance (float): starting value of account
+
+        Returns:
+            list[tuple[str, list[str]]]: beginning of every line and its items (items which do not fit
+                in the budget are dropped from the end)
+        """
+
+        summary = stats["summary"]
+        profit = stats["profit_stats"].iloc[0]
+        drawdown = stats["drawdown_stats"].iloc[0]
+        duration = stats["duration_time"].iloc[0]
+        win_rate, loss_rate = stats["win_rate"]
+
+        lines = [
+            ("Overview: ", [f"{summary.transations_number} transactions",
+                            f"starting balance {format_number(balance)}",
+                            f"final balance {format_number(balance + summary.profit_sum)}",
+                            f"net profit {format_number(profit['Sum'])}",
+                            f"win rate {format_number(win_rate)}%",
+                            f"loss rate {format_number(loss_rate)}%"]),
+            ("Net profit of a transaction: ", [f"min {format_number(profit['Min'])}",
+                                               f"max {format_number(profit['Max'])}",
+                                               f"mean {format_number(profit['Mean'])}"]),
+            ("Drawdown: ", [f"max {format_number(drawdown['Max drawdown'])} "
+                            f"({format_number(drawdown['Max drawdown %'])}%)",
+                            f"longest {int(drawdown['Longest drawdown'])} transactions"]),
+            ("Balance in time (date balance): ", [f"{pd.Timestamp(time):%Y-%m-%d} {format_number(value)}"
+                                                  for time, value in zip(df_equity["Close time"], df_equity["Balance"])]),
+            ("Net profit by week day (min/max/sum): ", [f"{day} {format_number(row['Min'])}/{format_number(row['Max'])}/"
+                                                        f"{format_number(row['Sum'])}"
+                                                        for (day, row), count in zip(stats["week_data"].iterrows(),
+                                                                                     summary.week_count)
+                                                        if count]),
+            ("Transaction duration in minutes: ", [f"min {format_number(duration['Min'])}",
+                                                   f"max {format_number(duration['Max'])}",
+                                                   f"mean {format_number(duration['Mean'])}"])
+        ]
+
+        # The most frequent values only
+        for title, counts in (("symbols", stats["symbols"]), ("types", stats["transations_type"]),
+                              ("lots", stats["lots"])):
+            lines.append((f"Top {title} (transactions): ", [f"{value} {count}" for value, count
+                                                            in counts.iloc[:self.top_values].items()]))
+
+        return lines
+
+
+    def build(self, stats: dict, df_equity: pd.DataFrame, balance: float) -> str:
+        """Returns a compact summary of the report which fits in the token budget
+
+        Args:
+            stats (dict): all statistics of the report (see report_pipeline.get_stats)
+            df_equity (pd.DataFrame): key points of the equity curve (see MakeStats.get_equity_points)
+            balance (float): starting value of account
+
+        Returns:
+            str: context of the prompt
+        """
+
+        text = "Trading report of the user (rounded):"
+        tokens = estimate_tokens(text)
+
+        # Less important lines (or their last items) are dropped when the budget is used
+        for start, items in self.get_lines(stats, df_equity, balance):
+            line = ""
+            for item in items:
+                candidate = f"{line}, {item}" if line else f"\n{start}{item}"
+                if tokens + estimate_tokens(candidate) > self.max_tokens:
+                    break
+                line = candidate
+            text += line
+            tokens += estimate_tokens(line)
+
+        return text
+
+
+    def truncate_history(self, messages: list[dict], max_tokens: int = HISTORY_MAX_TOKENS) -> list[dict]:
+        """Returns the newest messages of the chat which fit in the token budget
+
+        Args:
+            messages (list[dict]): messages with "role" and "content" from the oldest
+            max_tokens (int, optional): budget of the history. Defaults to HISTORY_MAX_TOKENS.
+
+        Returns:
+            list[dict]: newest messages (a message is never cut, older ones are dropped)
+        """
+
+        tokens = 0
+        for start in range(len(messages) - 1, -1, -1):
+            tokens += estimate_tokens(messages[start]["content"])
+            if tokens > max_tokens:
+                return messages[start + 1:]
+
+        return messages
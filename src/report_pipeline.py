@@ -0,0 +1,791 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import io
+import os
+from data_reader import DataReader, REPORT_COLUMNS, COMPACT_COLUMNS
+from make_stats import MakeStats, ReportSummary, AggregateCube
+from frame_cache import FrameCache
+from figure_renderer import FigureRenderer
+from trade_index import TradeIndex
+from resource_manager import ResourceManager
+from report_context import ContextBuilder
+import instrumentation
+
+
+# Eviction policy of the shared stages (can be changed with environment variables)
+CACHE_MAX_ENTRIES = int(os.environ.get("STOCK_REPORT_CACHE_MAX_ENTRIES", 16))
+CACHE_TTL = int(os.environ.get("STOCK_REPORT_CACHE_TTL", 3600)) # seconds
+
+# Categorical and narrow columns of the trade history (several times less memory)
+COMPACT_FRAMES = os.environ.get("STOCK_REPORT_COMPACT", "1") == "1"
+
+# Columns and types of loaded files (part of the key of the disk cache)
+FRAME_SCHEMA = tuple((REPORT_COLUMNS | COMPACT_COLUMNS if COMPACT_FRAMES else REPORT_COLUMNS).items())
+
+data_reader = DataReader()
+make_stats = MakeStats()
+frame_cache = FrameCache()
+figure_renderer = FigureRenderer()
+# Results of stages shared by all sessions under one memory budget
+resources = ResourceManager(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+
+
+class SourceExpiredError(LookupError):
+    """Raised when a stage has to read a file again, but only its hash was kept"""
+
+
+def get_file_hash(file_bytes: bytes) -> str:
+    """Returns a content hash of the uploaded file
+
+    Args:
+        file_bytes (bytes): content of the uploaded file
+
+    Returns:
+        str: hex digest of the content
+    """
+
+    return hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+
+
+def get_history_fingerprint(fingerprint: str|None, file_hash: str, header: tuple,
+                            date_format: str|None, balance: float) -> str:
+    """Returns a key of the history after appending an export (key of shared stages of the history)
+
+    Args:
+        fingerprint (str | None): key of the history before appending, None for an empty history
+        file_hash (str): content hash of the appended file
+        header (tuple): pairs of user and system column names
+        date_format (str): date format of 'Open time' and 'Close time' columns
+        balance (float): starting value of account
+
+    Returns:
+        str: hex digest of the appended exports in order
+    """
+
+    return hashlib.blake2b(repr((fingerprint, file_hash, header, date_format, balance)).encode(),
+                           digest_size=16).hexdigest()
+
+
+def load_stage(file_hash: str, _file_bytes: bytes, header: tuple, date_format: str|None) -> pd.DataFrame:
+    """Stage - reading the csv file (not cached, only the parsed data frame is kept)
+
+    Args:
+        file_hash (str): content hash of the file
+        _file_bytes (bytes): content of the file
+        header (tuple): pairs of user and system column names
+        date_format (str): date format of 'Open time' and 'Close time' columns
+
+    Returns:
+        pd.DataFrame: loaded data frame (owned by the caller, it is changed by formatting)
+    """
+
+    with instrumentation.stage("load_file_chunked") as stage:
+        df_data = data_reader.load_file_chunked(io.BytesIO(_file_bytes), dict(header), date_format,
+                                                compact=COMPACT_FRAMES)
+        stage.rows = df_data.shape[0]
+
+    return df_data
+
+
+@resources.cached
+def parse_stage(file_hash: str, _file_bytes: bytes, header: tuple, date_format: str|None) -> pd.DataFrame:
+    """Shared stage - reading and formatting of the file without the equity curve
+
+    The starting balance is not part of the key, so changing it does not read the csv file again.
+
+    Args:
+        file_hash (str): content hash of the file
+        _file_bytes (bytes | None): content of the file (not part of the key), None when only
+            cached results can be used
+        header (tuple): pairs of user and system column names
+        date_format (str): date format of 'Open time' and 'Close time' columns
+
+    Raises:
+        SourceExpiredError: when the data frame is not cached and the content of the file is not given
+
+    Returns:
+        pd.DataFrame: formatted data frame with the equity curve of a zero starting balance
+            (also kept in the disk cache, must not be changed)
+    """
+
+    # Parsed data frame from the disk cache skips reading the csv file
+    cache_key = frame_cache.get_key(file_hash, header, date_format, COMPACT_FRAMES, FRAME_SCHEMA)
+    with instrumentation.stage("frame_cache.load") as stage:
+        df_data = frame_cache.load(cache_key)
+        stage.rows = None if df_data is None else df_data.shape[0]
+    if df_data is not None:
+        return df_data
+    if _file_bytes is None:
+        raise SourceExpiredError(f"File {file_hash} is no longer cached")
+
+    df_data = load_stage(file_hash, _file_bytes, header, date_format)
+    with instrumentation.stage("format_data_frame", df_data.shape[0]):
+        df_data = data_reader.format_data_frame(df_data, date_format, 0, compact=COMPACT_FRAMES)
+    with instrumentation.stage("frame_cache.store", df_data.shape[0]):
+        frame_cache.store(cache_key, df_data)
+
+    return df_data
+
+
+@resources.cached
+def format_stage(file_hash: str, _file_bytes: bytes, header: tuple,
+                 date_format: str|None, balance: float) -> pd.DataFrame:
+    """Shared stage - formatted data frame with the equity curve of the starting balance
+
+    Args:
+        file_hash (str): content hash of the file
+        _file_bytes (bytes | None): content of the file (not part of the key), None when only
+            cached results can be used
+        header (tuple): pairs of user and system column names
+        date_format (str): date format of 'Open time' and 'Close time' columns
+        balance (float): starting value of account
+
+    Raises:
+        SourceExpiredError: when the data frame is not cached and the content of the file is not given
+
+    Returns:
+        pd.DataFrame: final version of the data frame (must not be changed)
+    """
+
+    df_parsed = parse_stage(file_hash, _file_bytes, header, date_format)
+
+    # Only the equity curve depends on the balance, other columns are shared with the parsed data frame
+    with instrumentation.stage("set_equity_curve", df_parsed.shape[0]):
+        df_data = df_parsed.copy(deep=False)
+        data_reader.set_equity_curve(df_data, balance, compact=COMPACT_FRAMES)
+
+    return df_data
+
+
+def get_stats(summary: ReportSummary, cube: AggregateCube|None = None) -> dict:
+    """Returns all statistics shown in the report
+
+    Args:
+        summary (ReportSummary): aggregated statistics of the report
+        cube (AggregateCube | None, optional): aggregate cube of the report, tables by day of the week,
+            symbol and type are its roll-ups. Defaults to None.
+
+    Returns:
+        dict: all statistics shown in the report
+    """
+
+    return {
+        "summary" : summary,
+        "cube" : cube,
+        "profit_stats" : summary.get_profit_stats(),
+        "week_data" : summary.score_by_week_day() if cube is None else cube.score_by_week_day(),
+        "win_rate" : summary.get_win_rate(),
+        "duration_time" : summary.get_transtions_duration(),
+        "symbols" : summary.symbols if cube is None else cube.count_by("symbol"),
+        "transations_type" : summary.types if cube is None else cube.count_by("type"),
+        "lots" : summary.lots,
+        "df_size" : summary.transations_number,
+        "drawdown_stats" : summary.get_drawdown_stats()
+    }
+
+
+@resources.cached
+def stats_stage(file_hash: str, _file_bytes: bytes, header: tuple,
+                date_format: str|None, balance: float) -> dict:
+    """Shared stage - statistics of the report
+
+    Args:
+        file_hash (str): content hash of the file
+        _file_bytes (bytes): content of the file (not part of the key)
+        header (tuple): pairs of user and system column names
+        date_format (str): date format of 'Open time' and 'Close time' columns
+        balance (float): starting value of account
+
+    Returns:
+        dict: all statistics shown in the report
+    """
+
+    df_data = format_stage(file_hash, _file_bytes, header, date_format, balance)
+    with instrumentation.stage("get_report_summary", df_data.shape[0]):
+        summary = make_stats.get_report_summary(df_data)
+    with instrumentation.stage("get_aggregate_cube", df_data.shape[0]):
+        cube = make_stats.get_aggregate_cube(df_data)
+
+    # Sections of the page which do not need transactions read only the statistics
+    return get_stats(summary, cube) | {"malformed_rows" : df_data.attrs.get("malformed_rows", [])}
+
+
+def append_stage(history: dict|None, file_hash: str, file_bytes: bytes, header: tuple,
+                 date_format: str|None, balance: float) -> dict:
+    """Stage of the incremental mode - appending an export to the stored history
+
+    Args:
+        history (dict | None): stored history with keys "df_data", "stats", "files", "fingerprint", "index"
+            and "context"
+        file_hash (str): content hash of the file
+        file_bytes (bytes): content of the file
+        header (tuple): pairs of user and system column names
+        date_format (str): date format of 'Open time' and 'Close time' columns
+        balance (float): starting value of account (used only for an empty history)
+
+    Returns:
+        dict: updated history
+    """
+
+    # Export already in the history does not change anything
+    if history is not None and file_hash in history["files"]:
+        return history
+
+    with resources.admit():
+        df_new = load_stage(file_hash, file_bytes, header, date_format)
+    if history is None:
+        with resources.admit(), instrumentation.stage("format_data_frame", df_new.shape[0]):
+            df_data = data_reader.format_data_frame(df_new, date_format, balance, compact=COMPACT_FRAMES)
+        with instrumentation.stage("get_report_summary", df_data.shape[0]):
+            summary = make_stats.get_report_summary(df_data)
+        with instrumentation.stage("get_aggregate_cube", df_data.shape[0]):
+            stats = get_stats(summary, make_stats.get_aggregate_cube(df_data))
+        stats["malformed_rows"] = df_data.attrs.get("malformed_rows", [])
+        return {
+            "df_data" : df_data,
+            "stats" : stats,
+            "files" : {file_hash},
+            "fingerprint" : get_history_fingerprint(None, file_hash, header, date_format, balance),
+            "index" : None,
+            "context" : None
+        }
+
+    # Only new transactions are formatted and aggregated
+    with resources.admit(), instrumentation.stage("append_history", df_new.shape[0]):
+        malformed_rows = df_new.attrs.get("malformed_rows", [])
+        df_data, df_new = data_reader.append_history(history["df_data"], df_new, date_format, balance,
+                                                     COMPACT_FRAMES)
+        # Warnings of the page are about the appended export only
+        df_data.attrs["malformed_rows"] = malformed_rows
+    with instrumentation.stage("update_report_summary", df_new.shape[0]):
+        summary = make_stats.update_report_summary(history["stats"]["summary"], df_new)
+    with instrumentation.stage("update_aggregate_cube", df_new.shape[0]):
+        cube = history["stats"]["cube"].merge(make_stats.get_aggregate_cube(df_new))
+
+    return {
+        "df_data" : df_data,
+        "stats" : get_stats(summary, cube) | {"malformed_rows" : malformed_rows},
+        "files" : history["files"] | {file_hash},
+        # Results of the history stay cached when the export did not add any transaction
+        "fingerprint" : history["fingerprint"] if df_new.shape[0] == 0 else \
+                        get_history_fingerprint(history["fingerprint"], file_hash, header, date_format, balance),
+        "index" : history.get("index") if df_new.shape[0] == 0 else None,
+        "context" : history.get("context") if df_new.shape[0] == 0 else None
+    }
+
+
+def clear_cache() -> None:
+    """Removes all cached stages from memory and disk"""
+
+    resources.clear()
+    frame_cache.clear()
+
+
+def get_chart_jobs(df_data: pd.DataFrame, stats: dict) -> dict[str, tuple[str, tuple, dict]]:
+    """Returns the rendering jobs of all charts of the report
+
+    Args:
+        df_data (pd.DataFrame): final version of the data frame
+        stats (dict): all statistics shown in the report
+
+    Returns:
+        dict[str, tuple[str, tuple, dict]]: name of chart mapped to MakeStats method, args and kwargs
+    """
+
+    top_value = 5
+    net_profit = df_data["Net profit"].to_numpy()
+
+    # Only the data needed by a chart is sent to the rendering process
+    return {
+        "net_profit" : ("plot_line", (net_profit, "Transation number", "Net profit",
+                                      "Net profit in time"), {}),
+        # Min/max decimation keeps the exact drawdown troughs of cumulative series
+        "accumulated_profit" : ("plot_line", (np.cumsum(net_profit), "Transation number", "Accumulated net profit",
+                                              "Accumulated net profit in time"), {"method" : "minmax"}),
+        "balance" : ("plot_line", (df_data["Balance"].to_numpy(), "Transation number", "Balance",
+                                   "Balance value in time"), {"method" : "minmax"}),
+        "win_rate" : ("plot_bars", (pd.Series(stats["win_rate"], index=["Win", "Loss"]),
+                                    "Percent %", "Status", "Win/Loss rate", "h"), {}),
+        "week_data" : ("plot_bars", (stats["week_data"][["Min", "Max", "Sum"]],
+                                     "Week day", "Net profit", "Stats - Week net profit", "v"), {}),
+        "duration" : ("plot_durations", (df_data[["Symbol", "Deltatime"]], top_value), {}),
+        "symbols" : ("plot_pie", (stats["symbols"].iloc[:top_value], "Assets"), {}),
+        "transations_type" : ("plot_pie", (stats["transations_type"].iloc[:top_value], "Type"), {}),
+        "lots" : ("plot_pie", (stats["lots"].iloc[:top_value], "Lots"), {})
+    }
+
+
+def render_figures(df_data: pd.DataFrame, stats: dict, names: tuple|None = None) -> dict[str, bytes]:
+    """Renders charts of the report
+
+    Args:
+        df_data (pd.DataFrame): final version of the data frame
+        stats (dict): all statistics shown in the report
+        names (tuple | None, optional): names of rendered charts, None renders all. Defaults to None.
+
+    Returns:
+        dict[str, bytes]: png images of charts in the report (rendered in parallel)
+    """
+
+    jobs = get_chart_jobs(df_data, stats)
+    if names is not None:
+        jobs = {name: jobs[name] for name in names}
+
+    with instrumentation.stage("render_figures", df_data.shape[0]):
+        return figure_renderer.render(jobs)
+
+
+@resources.cached
+def history_figures_stage(fingerprint: str, _history: dict, names: tuple|None = None) -> dict[str, bytes]:
+    """Shared stage - charts of the stored history
+
+    Args:
+        fingerprint (str): key of the history
+        _history (dict): stored history (not part of the key)
+        names (tuple | None, optional): names of rendered charts (e.g. of one section), None renders all.
+            Defaults to None.
+
+    Returns:
+        dict[str, bytes]: png images of charts in the report
+    """
+
+    return render_figures(_history["df_data"], _history["stats"], names)
+
+
+@resources.cached
+def figures_stage(file_hash: str, _file_bytes: bytes, header: tuple,
+                  date_format: str|None, balance: float, names: tuple|None = None) -> dict[str, bytes]:
+    """Shared stage - charts of the report
+
+    Args:
+        file_hash (str): content hash of the file
+        _file_bytes (bytes): content of the file (not part of the key)
+        header (tuple): pairs of user and system column names
+        date_format (str): date format of 'Open time' and 'Close time' columns
+        balance (float): starting value of account
+        names (tuple | None, optional): names of rendered charts (e.g. of one section), None renders all.
+            Defaults to None.
+
+    Returns:
+        dict[str, bytes]: png images of charts in the report
+    """
+
+    df_data = format_stage(file_hash, _file_bytes, header, date_format, balance)
+    stats = stats_stage(file_hash, _file_bytes, header, date_format, balance)
+
+    return render_figures(df_data, stats, names)
+
+
+@resources.cached
+def index_stage(file_hash: str, _file_bytes: bytes, header: tuple,
+                date_format: str|None, balance: float) -> TradeIndex:
+    """Shared stage - index of the report for filtering
+
+    Args:
+        file_hash (str): content hash of the file
+        _file_bytes (bytes): content of the file (not part of the key)
+        header (tuple): pairs of user and system column names
+        date_format (str): date format of 'Open time' and 'Close time' columns
+        balance (float): starting value of account
+
+    Returns:
+        TradeIndex: index with prefix sums of every symbol and side
+    """
+
+    df_data = format_stage(file_hash, _file_bytes, header, date_format, balance)
+    with instrumentation.stage("build_trade_index", df_data.shape[0]):
+        return TradeIndex.from_frame(df_data)
+
+
+def get_report_context(df_data: pd.DataFrame, stats: dict, balance: float, max_tokens: int) -> str:
+    """Returns a compact summary of the report for the prompt of the AI-Support page
+
+    Args:
+        df_data (pd.DataFrame): final version of the data frame
+        stats (dict): all statistics shown in the report
+        balance (float): starting value of account
+        max_tokens (int): token budget of the summary
+
+    Returns:
+        str: context of the prompt
+    """
+
+    with instrumentation.stage("get_report_context", df_data.shape[0]):
+        df_equity = make_stats.get_equity_points(df_data)
+        return ContextBuilder(max_tokens).build(stats, df_equity, balance)
+
+
+@resources.cached
+def context_stage(file_hash: str, _file_bytes: bytes, header: tuple,
+                  date_format: str|None, balance: float, max_tokens: int) -> str:
+    """Shared stage - summary of the report for the prompt of the AI-Support page
+
+    Args:
+        file_hash (str): content hash of the file
+        _file_bytes (bytes): content of the file (not part of the key)
+        header (tuple): pairs of user and system column names
+        date_format (str): date format of 'Open time' and 'Close time' columns
+        balance (float): starting value of account
+        max_tokens (int): token budget of the summary
+
+    Returns:
+        str: context of the prompt
+    """
+
+    df_data = format_stage(file_hash, _file_bytes, header, date_format, balance)
+    stats = stats_stage(file_hash, _file_bytes, header, date_format, balance)
+
+    return get_report_context(df_data, stats, balance, max_tokens)
+
+
+def get_history_context(history: dict, balance: float, max_tokens: int) -> str:
+    """Returns the summary of the stored history, calculated again only after new transactions
+
+    Args:
+        history (dict): stored history (its "context" is updated)
+        balance (float): starting value of account
+        max_tokens (int): token budget of the summary
+
+    Returns:
+        str: context of the prompt
+    """
+
+    if history.get("context") is None or history["context"][0] != (balance, max_tokens):
+        history["context"] = ((balance, max_tokens),
+                              get_report_context(history["df_data"], history["stats"], balance, max_tokens))
+
+    return history["context"][1]
+
+
+def render_heatmap_figure(cube: AggregateCube, value: str, symbols: tuple, types: tuple) -> bytes:
+    """Renders the heatmap of a statistic by day of the week and hour from the aggregate cube
+
+    Args:
+        cube (AggregateCube): aggregate cube of the report
+        value (str): statistic of the cells (e.g. "Sum" or "Win rate %")
+        symbols (tuple): selected symbols, empty selects all
+        types (tuple): selected types, empty selects all
+
+    Returns:
+        bytes: png image of the chart
+    """
+
+    with instrumentation.stage("render_heatmap_figure"):
+        df_heatmap = cube.get_heatmap(value, list(symbols) or None, list(types) or None)
+        return figure_renderer.render({"heatmap" : ("plot_heatmap", (df_heatmap,
+                                       f"Net profit by day and hour - {value}"), {})})["heatmap"]
+
+
+@resources.cached
+def heatmap_figure_stage(file_hash: str, _file_bytes: bytes, header: tuple, date_format: str|None,
+                         balance: float, value: str, symbols: tuple, types: tuple) -> bytes:
+    """Shared stage - heatmap of a statistic by day of the week and hour
+
+    Args:
+        file_hash (str): content hash of the file
+        _file_bytes (bytes): content of the file (not part of the key)
+        header (tuple): pairs of user and system column names
+        date_format (str): date format of 'Open time' and 'Close time' columns
+        balance (float): starting value of account
+        value (str): statistic of the cells (e.g. "Sum" or "Win rate %")
+        symbols (tuple): selected symbols, empty selects all
+        types (tuple): selected types, empty selects all
+
+    Returns:
+        bytes: png image of the chart
+    """
+
+    stats = stats_stage(file_hash, _file_bytes, header, date_format, balance)
+
+    return render_heatmap_figure(stats["cube"], value, symbols, types)
+
+
+@resources.cached
+def monte_carlo_stage(file_hash: str, _file_bytes: bytes, header: tuple, date_format: str|None,
+                      balance: float, simulations: int, method: str, ruin_loss: float, seed: int) -> dict:
+    """Shared stage - Monte Carlo simulation of the history
+
+    Args:
+        file_hash (str): content hash of the file
+        _file_bytes (bytes): content of the file (not part of the key)
+        header (tuple): pairs of user and system column names
+        date_format (str): date format of 'Open time' and 'Close time' columns
+        balance (float): starting value of account
+        simulations (int): number of simulations
+        method (str): "bootstrap" or "permutation"
+        ruin_loss (float): lost part of the starting balance treated as ruin
+        seed (int): seed of the simulation
+
+    Returns:
+        dict: percentiles of results ("stats"), risk of ruin ("risk") and chart of percentile bands ("figure")
+    """
+
+    df_data = format_stage(file_hash, _file_bytes, header, date_format, balance)
+
+    return simulate_monte_carlo(df_data, balance, simulations, method, ruin_loss, seed)
+
+
+@resources.cached
+def history_monte_carlo_stage(fingerprint: str, _history: dict, balance: float, simulations: int,
+                              method: str, ruin_loss: float, seed: int) -> dict:
+    """Shared stage - Monte Carlo simulation of the stored history
+
+    Args:
+        fingerprint (str): key of the history
+        _history (dict): stored history (not part of the key)
+        balance (float): starting value of account
+        simulations (int): number of simulations
+        method (str): "bootstrap" or "permutation"
+        ruin_loss (float): lost part of the starting balance treated as ruin
+        seed (int): seed of the simulation
+
+    Returns:
+        dict: percentiles of results ("stats"), risk of ruin ("risk") and chart of percentile bands ("figure")
+    """
+
+    return simulate_monte_carlo(_history["df_data"], balance, simulations, method, ruin_loss, seed)
+
+
+def simulate_monte_carlo(df_data: pd.DataFrame, balance: float, simulations: int, method: str,
+                         ruin_loss: float, seed: int) -> dict:
+    """Runs Monte Carlo simulation of the history and renders its chart
+
+    Args:
+        df_data (pd.DataFrame): final version of the data frame
+        balance (float): starting value of account
+        simulations (int): number of simulations
+        method (str): "bootstrap" or "permutation"
+        ruin_loss (float): lost part of the starting balance treated as ruin
+        seed (int): seed of the simulation
+
+    Returns:
+        dict: percentiles of results ("stats"), risk of ruin ("risk") and chart of percentile bands ("figure")
+    """
+
+    # Chunks of simulations are spread over the pool of rendering processes
+    executor = figure_renderer.get_executor() if figure_renderer.max_workers > 1 else None
+    with instrumentation.stage("simulate_monte_carlo", df_data.shape[0] * simulations):
+        result = make_stats.simulate_monte_carlo(df_data["Net profit"].to_numpy(), balance, simulations,
+                                                 method, seed, ruin_loss, executor)
+
+    df_bands = result.get_bands()
+    history_balance = balance + np.cumsum(df_data["Net profit"].to_numpy(dtype=np.float64))
+    with instrumentation.stage("render_monte_carlo_figure"):
+        figure = figure_renderer.render({"monte_carlo" : ("plot_monte_carlo", (df_bands,
+                                         history_balance[df_bands.index.to_numpy() - 1],
+                                         f"Monte Carlo - {simulations} simulations ({method})"), {})})["monte_carlo"]
+
+    return {"stats" : result.get_stats(), "risk" : result.get_risk(), "figure" : figure}
+
+
+def get_window_title(window: int|str) -> str:
+    """Returns a readable description of the rolling window
+
+    Args:
+        window (int | str): number of last transactions or time offset (e.g. "30D")
+
+    Returns:
+        str: description of the window
+    """
+
+    if isinstance(window, int):
+        return f"last {window} transactions"
+
+    return f"last {pd.Timedelta(window)}"
+
+
+def render_rolling_figure(df_data: pd.DataFrame, window: int|str) -> bytes:
+    """Renders the chart of rolling statistics
+
+    Args:
+        df_data (pd.DataFrame): final version of the data frame
+        window (int | str): number of last transactions or time offset on 'Close time' (e.g. "30D")
+
+    Returns:
+        bytes: png image of the chart
+    """
+
+    with instrumentation.stage("get_rolling_stats", df_data.shape[0]):
+        df_rolling = make_stats.get_rolling_stats(df_data, window)
+    with instrumentation.stage("render_rolling_figure", df_data.shape[0]):
+        return figure_renderer.render({"rolling" : ("plot_rolling_stats", (df_rolling,
+                                       f"Rolling statistics - {get_window_title(window)}"), {})})["rolling"]
+
+
+@resources.cached
+def rolling_figure_stage(file_hash: str, _file_bytes: bytes, header: tuple,
+                         date_format: str|None, balance: float, window: int|str) -> bytes:
+    """Shared stage - chart of rolling statistics
+
+    Args:
+        file_hash (str): content hash of the file
+        _file_bytes (bytes): content of the file (not part of the key)
+        header (tuple): pairs of user and system column names
+        date_format (str): date format of 'Open time' and 'Close time' columns
+        balance (float): starting value of account
+        window (int | str): number of last transactions or time offset on 'Close time' (e.g. "30D")
+
+    Returns:
+        bytes: png image of the chart
+    """
+
+    df_data = format_stage(file_hash, _file_bytes, header, date_format, balance)
+
+    return render_rolling_figure(df_data, window)
+
+
+@resources.cached
+def history_rolling_figure_stage(fingerprint: str, _history: dict, window: int|str) -> bytes:
+    """Shared stage - chart of rolling statistics of the stored history
+
+    Args:
+        fingerprint (str): key of the history
+        _history (dict): stored history (not part of the key)
+        window (int | str): number of last transactions or time offset on 'Close time' (e.g. "30D")
+
+    Returns:
+        bytes: png image of the chart
+    """
+
+    return render_rolling_figure(_history["df_data"], window)
+
+
+def get_account_names(paths: list[str]) -> dict[str, str]:
+    """Returns unique account names (file names without extension) for the paths
+
+    Args:
+        paths (list[str]): paths or names of csv files
+
+    Returns:
+        dict[str, str]: path mapped to account name
+    """
+
+    names = {}
+    used = set()
+    for path in paths:
+        name = base_name = os.path.splitext(os.path.basename(path))[0]
+        number = 1
+        while name in used:
+            number += 1
+            name = f"{base_name}_{number}"
+        used.add(name)
+        names[path] = name
+
+    return names
+
+
+@resources.cached
+def accounts_stage(files: tuple, _files_bytes: tuple, header: tuple,
+                   date_format: str|None, balance: float) -> dict:
+    """Shared stage - comparison of many accounts computed in one grouped pass
+
+    Args:
+        files (tuple): pairs of account name and content hash of its file
+        _files_bytes (tuple): contents of the files in the same order (not part of the key)
+        header (tuple): pairs of user and system column names
+        date_format (str): date format of 'Open time' and 'Close time' columns
+        balance (float): starting value of every account
+
+    Returns:
+        dict: joined data frame ("df_data"), combined equity curve ("df_equity"), statistics of every
+            account ("accounts"), statistics of the portfolio ("combined") and malformed rows of accounts
+    """
+
+    # Every file is formatted (and cached) on its own, so one new export does not format the others again
+    frames = [format_stage(file_hash, file_bytes, header, date_format, balance)
+              for (_, file_hash), file_bytes in zip(files, _files_bytes)]
+    accounts = [account for account, _ in files]
+
+    with instrumentation.stage("concat_accounts") as stage:
+        df_data = data_reader.concat_accounts(frames, accounts)
+        stage.rows = df_data.shape[0]
+    with instrumentation.stage("get_combined_equity_curve", df_data.shape[0]):
+        df_equity = data_reader.get_combined_equity_curve(df_data, balance)
+    with instrumentation.stage("get_account_summaries", df_data.shape[0]):
+        summaries = make_stats.get_account_summaries(df_data)
+        combined = make_stats.get_combined_summary(list(summaries.values()), df_equity)
+
+    return {
+        "df_data" : df_data,
+        "df_equity" : df_equity,
+        "accounts" : {account: get_stats(summary) for account, summary in summaries.items()},
+        "combined" : get_stats(combined),
+        "malformed_rows" : {account: frame.attrs.get("malformed_rows", []) for account, frame in zip(accounts, frames)}
+    }
+
+
+def get_accounts_table(accounts: dict) -> pd.DataFrame:
+    """Returns the main statistics of accounts side by side
+
+    Args:
+        accounts (dict): name of account (or portfolio) mapped to all its statistics
+
+    Returns:
+        pd.DataFrame: one row per account
+    """
+
+    rows = {}
+    for account, stats in accounts.items():
+        profit_stats = stats["profit_stats"].iloc[0]
+        drawdown_stats = stats["drawdown_stats"].iloc[0]
+        win_rate, loss_rate = stats["win_rate"]
+        rows[account] = {
+            "Transations" : stats["df_size"],
+            "Net profit" : profit_stats["Sum"],
+            "Mean" : profit_stats["Mean"],
+            "Min" : profit_stats["Min"],
+            "Max" : profit_stats["Max"],
+            "Win rate %" : win_rate,
+            "Loss rate %" : loss_rate,
+            "Mean duration [minute]" : stats["duration_time"].iloc[0]["Mean"],
+            "Max drawdown" : drawdown_stats["Max drawdown"],
+            "Max drawdown %" : drawdown_stats["Max drawdown %"],
+            "Longest drawdown" : int(drawdown_stats["Longest drawdown"])
+        }
+
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis("Account")
+
+
+def get_accounts_week_table(accounts: dict) -> pd.DataFrame:
+    """Returns the net profit by day of the week of accounts side by side
+
+    Args:
+        accounts (dict): name of account (or portfolio) mapped to all its statistics
+
+    Returns:
+        pd.DataFrame: days of the week in rows, accounts in columns
+    """
+
+    return pd.DataFrame({account: stats["week_data"]["Sum"] for account, stats in accounts.items()})
+
+
+@resources.cached
+def accounts_figures_stage(files: tuple, _files_bytes: tuple, header: tuple,
+                           date_format: str|None, balance: float) -> dict[str, bytes]:
+    """Shared stage - charts of the accounts comparison
+
+    Args:
+        files (tuple): pairs of account name and content hash of its file
+        _files_bytes (tuple): contents of the files in the same order (not part of the key)
+        header (tuple): pairs of user and system column names
+        date_format (str): date format of 'Open time' and 'Close time' columns
+        balance (float): starting value of every account
+
+    Returns:
+        dict[str, bytes]: png images of all charts of the comparison
+    """
+
+    result = accounts_stage(files, _files_bytes, header, date_format, balance)
+    win_rate = pd.DataFrame({account: stats["win_rate"] for account, stats in result["accounts"].items()},
+                            index=["Win", "Loss"]).T
+
+    jobs = {
+        "equity" : ("plot_equity_curves", (result["df_equity"], "Balance of accounts in time"), {}),
+        "week_data" : ("plot_bars", (get_accounts_week_table(result["accounts"]),
+                                     "Week day", "Net profit", "Week net profit by account", "v"), {}),
+        "win_rate" : ("plot_bars", (win_rate, "Percent %", "Account", "Win/Loss rate by account", "h"), {})
+    }
+
+    with instrumentation.stage("render_figures", result["df_data"].shape[0]):
+        return figure_renderer.render(jobs)
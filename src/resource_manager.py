@@ -0,0 +1,326 @@
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass, field, fields, is_dataclass
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Hashable, Iterator
+import functools
+import inspect
+import itertools
+import os
+import sys
+import threading
+import time
+
+
+# Limits shared by all sessions of the server (can be changed with environment variables)
+MEMORY_BUDGET = int(os.environ.get("STOCK_REPORT_MEMORY_BUDGET_MB", 1024)) * 1024**2
+MAX_GENERATIONS = int(os.environ.get("STOCK_REPORT_MAX_GENERATIONS", 2))
+MAX_QUEUE = int(os.environ.get("STOCK_REPORT_MAX_QUEUE", 16))
+
+# Interval of refreshing the position of a waiting session
+WAIT_INTERVAL = 0.5 # seconds
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the queue of report generations is full"""
+
+
+def get_size(value: object) -> int:
+    """Returns an estimated memory size of a cached value
+
+    Args:
+        value (object): data frame, array, bytes, dataclass or container of them
+
+    Returns:
+        int: size in bytes
+    """
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True, index=True).sum()) if isinstance(value, pd.DataFrame) \
+               else int(value.memory_usage(deep=True, index=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(get_size(item) for item in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return sum(get_size(item) for item in value)
+    if is_dataclass(value):
+        return sum(get_size(getattr(value, item.name)) for item in fields(value))
+
+    return sys.getsizeof(value)
+
+
+@dataclass(slots=True)
+class CacheEntry():
+    value: object
+    size: int # bytes
+    created_at: float # monotonic time
+
+
+@dataclass(slots=True)
+class Loading():
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    value: object = None # created value (also when it is too large to be kept)
+    users: int = 0 # sessions asking for the value (waiting for a place or for the lock)
+
+
+# Callback of the current script run showing the position in the queue (streamlit runs every session in its own thread)
+current_waiter: ContextVar[Callable[[int], None] | None] = ContextVar("current_waiter", default=None)
+
+
+def activate_waiter(waiter: Callable[[int], None] | None) -> None:
+    """Sets the callback called with the position of the waiting generation in the current thread
+
+    Args:
+        waiter (Callable[[int], None] | None): callback (position 0 means the generation started)
+            or None to wait silently
+    """
+
+    current_waiter.set(waiter)
+
+
+@dataclass
+class ResourceManager():
+    memory_budget: int = MEMORY_BUDGET # bytes
+    max_generations: int = MAX_GENERATIONS
+    max_queue: int = MAX_QUEUE
+    max_entries: int | None = None # per stage (first part of the key)
+    ttl: float | None = None # seconds
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    _entries: OrderedDict = field(default_factory=OrderedDict, repr=False)
+    _memory: int = field(default=0, repr=False)
+    _loading: dict[Hashable, Loading] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _condition: threading.Condition = field(default_factory=threading.Condition, repr=False)
+    _queue: deque = field(default_factory=deque, repr=False)
+    _tickets: Iterator[int] = field(default_factory=itertools.count, repr=False)
+    _running: int = field(default=0, repr=False)
+    _local: threading.local = field(default_factory=threading.local, repr=False)
+
+    def get(self, key: Hashable) -> object | None:
+        """Returns a cached value and marks it as recently used
+
+        Args:
+            key (Hashable): key of the value
+
+        Returns:
+            object | None: shared value (must not be changed) or None if it is not cached
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl is not None and time.monotonic() - entry.created_at > self.ttl:
+                self._memory -= self._entries.pop(key).size
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+
+    def put(self, key: Hashable, value: object, size: int | None = None) -> None:
+        """Saves a value and evicts the least recently used values above the memory budget
+
+        Args:
+            key (Hashable): key of the value
+            value (object): value shared by all sessions
+            size (int | None, optional): size in bytes, None estimates it. Defaults to None.
+        """
+
+        size = get_size(value) if size is None else size
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self._memory -= old_entry.size
+
+            # Value larger than the whole budget is returned to the session but not kept
+            if size <= self.memory_budget:
+                self._entries[key] = CacheEntry(value, size, time.monotonic())
+                self._memory += size
+
+            # Least recently used values of the same stage (keys are ordered from the oldest use)
+            if self.max_entries is not None and isinstance(key, tuple):
+                stage_keys = [item for item in self._entries if isinstance(item, tuple) and item[0] == key[0]]
+                for old_key in stage_keys[:max(0, len(stage_keys) - self.max_entries)]:
+                    self._memory -= self._entries.pop(old_key).size
+                    self.evictions += 1
+
+            while self._memory > self.memory_budget:
+                _, entry = self._entries.popitem(last=False)
+                self._memory -= entry.size
+                self.evictions += 1
+
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], object]) -> object:
+        """Returns a cached value or creates it once for all sessions asking for the same key
+
+        Args:
+            key (Hashable): key of the value (e.g. stage with the content hash of the file)
+            factory (Callable[[], object]): function creating the value (runs as an admitted generation)
+
+        Raises:
+            QueueFullError: when the queue of waiting generations is full
+
+        Returns:
+            object: shared value (must not be changed)
+        """
+
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        # Other sessions wait for the value being created instead of creating a copy
+        with self._lock:
+            loading = self._loading.setdefault(key, Loading())
+            loading.users += 1
+
+        try:
+            # Place is taken before the lock of the key, so a waiting session never blocks a running generation
+            with self.admit(), loading.lock:
+                # Value created while waiting is also handed over when it was too large to be kept
+                if loading.value is not None:
+                    with self._lock:
+                        self.hits += 1
+                    return loading.value
+                value = self.get(key)
+                if value is not None:
+                    return value
+
+                with self._lock:
+                    self.misses += 1
+                value = factory()
+                self.put(key, value)
+                loading.value = value
+
+        finally:
+            with self._lock:
+                loading.users -= 1
+                if not loading.users:
+                    self._loading.pop(key, None)
+
+        return value
+
+
+    def cached(self, function: Callable) -> Callable:
+        """Decorator of a shared stage - the result is created once and returned to all sessions
+
+        Arguments starting with "_" are not part of the key (e.g. content of the file next to its hash).
+
+        Args:
+            function (Callable): stage with hashable arguments
+
+        Returns:
+            Callable: stage returning shared results (must not be changed)
+        """
+
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            key = (function.__name__,) + tuple(value for name, value in arguments.arguments.items()
+                                               if not name.startswith("_"))
+            return self.get_or_create(key, lambda: function(*args, **kwargs))
+
+        return wrapper
+
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        """Runs a heavy generation when one of the limited places is free (first come, first served)
+
+        Nested generations of the same thread use the place of the outer one.
+
+        Raises:
+            QueueFullError: when the queue of waiting generations is full
+        """
+
+        if getattr(self._local, "depth", 0):
+            self._local.depth += 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+
+        waiter = current_waiter.get()
+        with self._condition:
+            if len(self._queue) >= self.max_queue and self._running >= self.max_generations:
+                raise QueueFullError(f"Queue of report generations is full ({self.max_queue} waiting)")
+            ticket = next(self._tickets)
+            self._queue.append(ticket)
+
+        # Waiter writes to the page of its session, so it is called without holding the queue
+        position = None
+        admitted = False
+        try:
+            while not admitted:
+                with self._condition:
+                    if self._queue[0] == ticket and self._running < self.max_generations:
+                        self._queue.popleft()
+                        self._running += 1
+                        self._condition.notify_all()
+                        admitted = True
+                        continue
+                    new_position = self._queue.index(ticket) + 1
+                    if new_position == position or waiter is None:
+                        self._condition.wait(WAIT_INTERVAL)
+                        continue
+                position = new_position
+                waiter(position)
+        finally:
+            if not admitted:
+                with self._condition:
+                    self._queue.remove(ticket)
+                    self._condition.notify_all()
+
+        if waiter is not None:
+            waiter(0)
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            with self._condition:
+                self._running -= 1
+                self._condition.notify_all()
+
+
+    def clear(self) -> None:
+        """Removes all cached values (values used by sessions are freed when the sessions drop them)"""
+
+        with self._lock:
+            self._entries.clear()
+            self._memory = 0
+
+
+    def get_metrics(self) -> dict:
+        """Returns the current state of the manager
+
+        Returns:
+            dict: used memory and budget in MB, number of cached values, hits, misses, evictions,
+                running and queued generations
+        """
+
+        with self._lock:
+            metrics = {
+                "memory_mb" : round(self._memory / 1024**2, 1),
+                "budget_mb" : round(self.memory_budget / 1024**2, 1),
+                "entries" : len(self._entries),
+                "hits" : self.hits,
+                "misses" : self.misses,
+                "evictions" : self.evictions
+            }
+        with self._condition:
+            metrics |= {"running" : self._running, "queued" : len(self._queue),
+                        "max_generations" : self.max_generations}
+
+        return metrics
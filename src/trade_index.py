@@ -0,0 +1,179 @@
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass
+from make_stats import BLANK_LABEL
+
+
+# Sides of the transaction (code 0 - buy, 1 - sell)
+SIDES = ["Buy", "Sell"]
+
+
+@dataclass
+class TradeIndex():
+    close_time: np.ndarray # int64 nanoseconds, sorted
+    balance_before: np.ndarray # balance of the account before every transaction
+    symbols: list[str]
+    keys: np.ndarray # group * size + position, sorted
+    net_prefix: np.ndarray # prefix sums in the order of keys (with leading 0)
+    win_prefix: np.ndarray
+    win_profit_prefix: np.ndarray
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "TradeIndex":
+        """Builds the index of a formatted data frame
+
+        Args:
+            df (pd.DataFrame): final version of the data frame (sorted by 'Close time')
+
+        Returns:
+            TradeIndex: index with prefix sums of every symbol and side
+        """
+
+        size = df.shape[0]
+        net_profit = df["Net profit"].to_numpy(dtype=np.float64)
+
+        # Empty symbols and types are groups of their own (code -1 would drop them from every statistic)
+        symbol_codes, symbols = pd.factorize(df["Symbol"], sort=True, use_na_sentinel=False)
+        type_codes, types = pd.factorize(df["Type"], use_na_sentinel=False)
+        # Side is decided on unique types only (same rule as get_unique_operation_types)
+        type_sides = np.array([int("sell" in str(operation).lower()) for operation in types], dtype=np.int64)
+        sides = type_sides[type_codes]
+
+        # Every symbol and side is a group, rows of a group are kept in order of closing
+        groups = symbol_codes.astype(np.int64) * len(SIDES) + sides
+        keys = groups * size + np.arange(size)
+        order = np.argsort(keys, kind="stable")
+
+        def prefix(values: np.ndarray) -> np.ndarray:
+            return np.concatenate([[0.0], np.cumsum(values[order], dtype=np.float64)])
+
+        return cls(
+            close_time = df["Close time"].to_numpy(dtype="datetime64[ns]").view(np.int64),
+            balance_before = df["Balance"].to_numpy(dtype=np.float64) - net_profit,
+            symbols = [BLANK_LABEL if pd.isna(symbol) else str(symbol) for symbol in np.asarray(symbols, dtype=object)],
+            keys = keys[order],
+            net_prefix = prefix(net_profit),
+            win_prefix = prefix((net_profit >= 0).astype(np.float64)),
+            win_profit_prefix = prefix(np.where(net_profit >= 0, net_profit, 0.0))
+        )
+
+
+    def get_range(self, start: pd.Timestamp | None, end: pd.Timestamp | None) -> tuple[int, int]:
+        """Returns positions of transactions closed in the time range (binary search)
+
+        Args:
+            start (pd.Timestamp | None): first moment of the range, None is the beginning of the history
+            end (pd.Timestamp | None): last moment of the range, None is the end of the history
+
+        Returns:
+            tuple[int, int]: first position and position after the last transaction
+        """
+
+        low = 0 if start is None else int(np.searchsorted(self.close_time, pd.Timestamp(start).value, side="left"))
+        high = self.close_time.size if end is None else \
+               int(np.searchsorted(self.close_time, pd.Timestamp(end).value, side="right"))
+
+        return low, max(low, high)
+
+
+    def get_groups(self, symbols: list[str] | None, sides: list[str] | None) -> np.ndarray:
+        """Returns codes of groups selected by the filters
+
+        Args:
+            symbols (list[str] | None): selected symbols, None or empty selects all
+            sides (list[str] | None): selected sides ("Buy", "Sell"), None or empty selects all
+
+        Returns:
+            np.ndarray: codes of selected groups
+        """
+
+        symbol_codes = np.arange(len(self.symbols)) if not symbols else \
+                       np.flatnonzero(np.isin(self.symbols, symbols))
+        side_codes = np.arange(len(SIDES)) if not sides else np.flatnonzero(np.isin(SIDES, sides))
+
+        return (symbol_codes[:, None] * len(SIDES) + side_codes[None, :]).ravel()
+
+
+    def get_bounds(self, groups: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """Returns indexes of prefix sums of groups at positions of the history
+
+        Args:
+            groups (np.ndarray): codes of groups
+            positions (np.ndarray): positions in the history
+
+        Returns:
+            np.ndarray: index of prefix sums for every group (rows) and position (columns)
+        """
+
+        size = self.close_time.size
+        return np.searchsorted(self.keys, groups[:, None] * size + positions[None, :], side="left")
+
+
+    def get_filter_stats(self, start: pd.Timestamp | None = None, end: pd.Timestamp | None = None,
+                         symbols: list[str] | None = None, sides: list[str] | None = None) -> pd.DataFrame:
+        """Returns statistics of filtered transactions from differences of prefix sums
+
+        Args:
+            start (pd.Timestamp | None, optional): first moment of the range. Defaults to None.
+            end (pd.Timestamp | None, optional): last moment of the range. Defaults to None.
+            symbols (list[str] | None, optional): selected symbols (all if empty). Defaults to None.
+            sides (list[str] | None, optional): selected sides (all if empty). Defaults to None.
+
+        Returns:
+            pd.DataFrame: data frame with stats of filtered transactions
+        """
+
+        low, high = self.get_range(start, end)
+        bounds = self.get_bounds(self.get_groups(symbols, sides), np.array([low, high]))
+        first, last = bounds[:, 0], bounds[:, 1]
+
+        trades = int((last - first).sum())
+        net_profit = float((self.net_prefix[last] - self.net_prefix[first]).sum())
+        wins = int(round((self.win_prefix[last] - self.win_prefix[first]).sum()))
+        win_profit = float((self.win_profit_prefix[last] - self.win_profit_prefix[first]).sum())
+        loss_profit = net_profit - win_profit
+        losses = trades - wins
+
+        return pd.DataFrame({
+            "Transations" : trades,
+            "Net profit" : round(net_profit, 2),
+            "Mean" : round(net_profit/trades, 2) if trades else np.nan,
+            "Win rate %" : round(wins/trades*100, 2) if trades else np.nan,
+            "Average win" : round(win_profit/wins, 2) if wins else np.nan,
+            "Average loss" : round(loss_profit/losses, 2) if losses else np.nan,
+            "Profit factor" : round(win_profit/-loss_profit, 2) if loss_profit < 0 else np.nan
+        }, index=[0])
+
+
+    def get_balance_curve(self, start: pd.Timestamp | None = None, end: pd.Timestamp | None = None,
+                          symbols: list[str] | None = None, sides: list[str] | None = None,
+                          points: int = 1500) -> pd.DataFrame:
+        """Returns the balance curve of filtered transactions at evenly spaced transactions
+
+        Balance starts from the balance of the account before the range and changes only
+        with the filtered transactions.
+
+        Args:
+            start (pd.Timestamp | None, optional): first moment of the range. Defaults to None.
+            end (pd.Timestamp | None, optional): last moment of the range. Defaults to None.
+            symbols (list[str] | None, optional): selected symbols (all if empty). Defaults to None.
+            sides (list[str] | None, optional): selected sides (all if empty). Defaults to None.
+            points (int, optional): maximum number of points of the curve. Defaults to 1500.
+
+        Returns:
+            pd.DataFrame: 'Close time' and 'Balance' after the sampled transactions
+        """
+
+        low, high = self.get_range(start, end)
+        if high == low:
+            return pd.DataFrame({"Close time" : pd.Series(dtype="datetime64[ns]"), "Balance" : pd.Series(dtype=np.float64)})
+
+        # Balance after a transaction is the sum of prefix sums of all selected groups at its position
+        positions = np.unique(np.linspace(low, high - 1, min(points, high - low)).astype(np.int64))
+        bounds = self.get_bounds(self.get_groups(symbols, sides), np.concatenate([[low], positions + 1]))
+        profit = (self.net_prefix[bounds[:, 1:]] - self.net_prefix[bounds[:, :1]]).sum(axis=0)
+
+        return pd.DataFrame({
+            "Close time" : self.close_time[positions].view("datetime64[ns]"),
+            "Balance" : self.balance_before[low] + profit
+        })
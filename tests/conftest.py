@@ -0,0 +1,6 @@
+import os
+import sys
+
+
+# Modules of the app are imported from the flat src directory (like streamlit run from src)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,21 @@
+import io
+import pytest
+from data_reader import DataReader
+
+
+CSV = """Symbol;Position;Type;Lots;Open time;Close time;Net profit
+US100;1;SELL;2.0;01.01.2015 00:09:33;01.01.2015 02:39:48;4.74
+EURUSD;2;BUY;1.0;01.01.2015 00:19:02;;-69.09
+EURUSD;3;SELL;1.0;01.01.2015 01:19:02;01.01.2015 03:51:20;10.0
+"""
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_blank_date_is_dropped_as_malformed(compact):
+    reader = DataReader()
+    df = reader.load_file_chunked(io.StringIO(CSV), {}, None, compact=compact)
+    df = reader.format_data_frame(df, df.attrs["date_format"], 1000, compact=compact)
+
+    assert df.attrs["malformed_rows"] == [1]
+    assert df["Position"].tolist() == [1, 3]
+    assert df["Balance"].iloc[-1] == pytest.approx(1014.74)
@@ -0,0 +1,96 @@
+import os
+import time
+import pytest
+from llm_backend import stream_fake
+from llm_cache import ResponseCache, normalize_prompt
+
+
+@pytest.fixture
+def cache(tmp_path) -> ResponseCache:
+    return ResponseCache(cache_dir=str(tmp_path), replay_delay=0)
+
+
+def ask(cache: ResponseCache, prompt: str) -> tuple[str, int]:
+    """Streams an answer of the fake model through the cache
+
+    Returns:
+        tuple[str, int]: answer and number of calls of the model
+    """
+
+    calls = []
+
+    def generate():
+        calls.append(prompt)
+        return stream_fake(prompt, delay=0)
+
+    answer = "".join(cache.stream(cache.get_key(prompt, "fake", "system"), generate, "fake"))
+    return answer, len(calls)
+
+
+def test_second_question_is_a_hit(cache):
+    first, first_calls = ask(cache, "What is a drawdown?")
+    second, second_calls = ask(cache, "What is a drawdown?")
+
+    assert (first_calls, second_calls) == (1, 0)
+    assert second == first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_normalized_prompts_share_the_answer(cache):
+    assert normalize_prompt("  What IS a\tdrawdown? ") == "what is a drawdown?"
+
+    ask(cache, "What is a drawdown?")
+    _, calls = ask(cache, "  what IS a   drawdown? ")
+
+    assert calls == 0
+
+
+def test_other_model_or_context_is_a_miss(cache):
+    keys = {cache.get_key("question", "fake", "system"), cache.get_key("question", "llama2", "system"),
+            cache.get_key("question", "fake", "system", "report")}
+
+    assert len(keys) == 3
+
+
+def test_answer_is_read_from_disk(cache, tmp_path):
+    answer, _ = ask(cache, "What is a drawdown?")
+
+    other = ResponseCache(cache_dir=str(tmp_path), replay_delay=0)
+    assert "".join(other.stream(other.get_key("What is a drawdown?", "fake", "system"),
+                                lambda: pytest.fail("model must not be called"))) == answer
+
+
+def test_unfinished_stream_is_not_saved(cache):
+    key = cache.get_key("question", "fake", "system")
+    stream = cache.stream(key, lambda: stream_fake("question", delay=0))
+    next(stream)
+    stream.close()
+
+    assert cache.get(key) is None
+    assert not os.listdir(cache.cache_dir)
+
+
+def test_expired_answer_is_removed(cache):
+    key = cache.get_key("question", "fake", "system")
+    cache.put(key, "old answer")
+    cache.ttl = 0
+    time.sleep(0.01)
+
+    assert cache.get(key) is None
+    assert not os.path.exists(cache.get_path(key))
+
+
+def test_disk_is_pruned_from_least_recently_used(cache):
+    keys = [cache.get_key(f"question {number}", "fake", "system") for number in range(3)]
+    for number, key in enumerate(keys):
+        cache.put(key, "answer " * 100)
+        # Modification times are distinct even on file systems with a coarse clock
+        os.utime(cache.get_path(key), (time.time() - 10 + number, time.time() - 10 + number))
+    cache.load(keys[0])
+
+    # Files differ by a few bytes (time of creation), so the budget fits exactly the two newest ones
+    kept = [keys[0], keys[2]]
+    cache.max_bytes = sum(os.path.getsize(cache.get_path(key)) for key in kept)
+    cache.evict()
+
+    assert sorted(os.listdir(cache.cache_dir)) == sorted(f"{key}.json" for key in kept)
@@ -0,0 +1,144 @@
+import threading
+import time
+import pytest
+import llm_backend
+import ollama_stub
+from llm_gateway import LLMGateway
+from resource_manager import QueueFullError
+
+
+TOKEN_DELAY = 0.01
+FIRST_TOKEN_DELAY = 0.2
+
+
+@pytest.fixture(scope="module")
+def ollama_url() -> str:
+    server = ollama_stub.start_server(port=0, token_delay=TOKEN_DELAY, first_token_delay=FIRST_TOKEN_DELAY)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def gateway(ollama_url) -> LLMGateway:
+    return LLMGateway(llm_backend.get_stream_function("ollama", "llama2", ollama_url), workers=1)
+
+
+def wait_until_idle(gateway: LLMGateway, timeout: float = 10) -> None:
+    """Waits until no request is running or queued"""
+
+    deadline = time.monotonic() + timeout
+    while gateway.get_state()["running"] or gateway.get_state()["queued"]:
+        assert time.monotonic() < deadline, "gateway did not finish its requests"
+        time.sleep(0.01)
+
+
+def test_answer_is_streamed_from_ollama(gateway):
+    answer = "".join(gateway.stream("a", "System: be short\nHuman: hello"))
+
+    assert answer.startswith("Human: hello - ")
+    assert answer.endswith(ollama_stub.STUB_ANSWER)
+
+
+def test_sessions_are_served_in_turn(gateway):
+    # First session holds the only worker, the others wait in the order of their questions
+    running = gateway.submit("a", "first")
+    while running.metrics.started_at is None:
+        time.sleep(0.01)
+    waiting = [gateway.submit(session_id, session_id) for session_id in ("b", "c", "d")]
+
+    assert [gateway.get_position(request) for request in waiting] == [1, 2, 3]
+    assert gateway.get_position(running) == 0
+
+    wait_until_idle(gateway)
+    started = sorted([running] + waiting, key=lambda request: request.metrics.started_at)
+    assert [request.metrics.session_id for request in started] == ["a", "b", "c", "d"]
+
+
+def test_new_question_cancels_the_previous_one(gateway):
+    first = gateway.submit("a", "first")
+    second = gateway.submit("a", "second")
+    wait_until_idle(gateway)
+
+    assert (first.metrics.status, second.metrics.status) == ("cancelled", "done")
+
+
+def test_closed_stream_cancels_the_request(gateway):
+    stream = gateway.stream("a", "hello")
+    next(stream)
+    stream.close()
+    wait_until_idle(gateway)
+
+    metrics = gateway.get_metrics("a").iloc[0]
+    assert metrics["status"] == "cancelled"
+    assert metrics["tokens"] < len(ollama_stub.STUB_ANSWER.split())
+
+
+def test_cancel_before_first_token_frees_the_worker():
+    server = ollama_stub.start_server(port=0, token_delay=TOKEN_DELAY, first_token_delay=5)
+    try:
+        gateway = LLMGateway(llm_backend.get_stream_function("ollama", "llama2",
+                                                             f"http://127.0.0.1:{server.server_address[1]}"), workers=1)
+        slow = gateway.submit("a", "slow")
+        while slow.metrics.started_at is None:
+            time.sleep(0.01)
+        cancelled_at = time.monotonic()
+        gateway.cancel(slow)
+        wait_until_idle(gateway, timeout=2)
+
+        assert time.monotonic() - cancelled_at < 1
+        assert slow.metrics.status == "cancelled"
+    finally:
+        server.shutdown()
+
+
+def test_metrics_of_queue_wait_ttft_and_speed(gateway):
+    first = gateway.submit("a", "first")
+    second = gateway.submit("b", "second")
+    wait_until_idle(gateway)
+
+    metrics = gateway.get_metrics().set_index("session_id")
+    assert metrics.loc["a", "queue_wait"] < FIRST_TOKEN_DELAY
+    assert metrics.loc["a", "ttft"] >= FIRST_TOKEN_DELAY
+    # Second question waited for the whole first answer
+    assert metrics.loc["b", "queue_wait"] >= first.metrics.finished_at - first.metrics.queued_at - 0.05
+    assert metrics.loc["b", "ttft"] >= metrics.loc["b", "queue_wait"] + FIRST_TOKEN_DELAY
+    assert metrics.loc["b", "tokens"] == second.metrics.tokens > 1
+    assert 0 < metrics.loc["b", "tokens_per_second"] <= 1 / TOKEN_DELAY * 1.5
+
+
+def test_full_queue_is_rejected(ollama_url):
+    gateway = LLMGateway(llm_backend.get_stream_function("ollama", "llama2", ollama_url), workers=1, max_queue=1)
+    gateway.submit("a", "running")
+    while gateway.get_state()["running"] == 0:
+        time.sleep(0.01)
+    gateway.submit("b", "waiting")
+
+    with pytest.raises(QueueFullError):
+        gateway.submit("c", "rejected")
+    gateway.cancel_session("a")
+    gateway.cancel_session("b")
+
+
+def test_error_of_ollama_is_raised(ollama_url):
+    gateway = LLMGateway(llm_backend.get_stream_function("ollama", "missing-model", ollama_url), workers=1)
+
+    with pytest.raises(RuntimeError, match="not found"):
+        list(gateway.stream("a", "hello"))
+    assert gateway.get_metrics("a").iloc[0]["status"] == "error"
+
+
+def test_fake_backend_streams_through_the_queue():
+    gateway = LLMGateway(lambda prompt: llm_backend.stream_fake(prompt, delay=0), workers=2)
+    answers = {}
+
+    def ask(session_id: str) -> None:
+        answers[session_id] = "".join(gateway.stream(session_id, "same question"))
+
+    threads = [threading.Thread(target=ask, args=(session_id,)) for session_id in "abc"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(answers.values())) == 1
+    assert (gateway.get_metrics()["status"] == "done").all()
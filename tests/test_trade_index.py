@@ -0,0 +1,24 @@
+import io
+from data_reader import DataReader
+from make_stats import MakeStats, BLANK_LABEL
+from trade_index import TradeIndex
+
+
+CSV = """Symbol;Position;Type;Lots;Open time;Close time;Net profit
+US100;1;SELL;2.0;01.01.2015 00:09:33;01.01.2015 02:39:48;4.74
+;2;BUY;1.0;01.01.2015 00:19:02;01.01.2015 02:50:00;-69.09
+EURUSD;3;;1.0;01.01.2015 01:19:02;01.01.2015 03:51:20;10.0
+"""
+
+
+def test_blank_symbols_and_types_are_kept():
+    reader = DataReader()
+    df = reader.format_data_frame(reader.load_file_chunked(io.StringIO(CSV), {}, None), None, 1000)
+    trade_index = TradeIndex.from_frame(df)
+    summary = MakeStats().get_report_summary(df)
+
+    assert BLANK_LABEL in trade_index.symbols
+    stats = trade_index.get_filter_stats().iloc[0]
+    assert stats["Transations"] == summary.transations_number == 3
+    assert stats["Net profit"] == round(summary.profit_sum, 2)
+    assert trade_index.get_filter_stats(symbols=[BLANK_LABEL]).iloc[0]["Transations"] == 1